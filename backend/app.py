@@ -0,0 +1,166 @@
+"""
+Фабрика приложения.
+
+create_app(settings) собирает FastAPI-приложение: роутеры импортируются
+внутри фабрики после configure(settings), необязательные подсистемы (ИИ,
+автоматизации) только когда включены. Подключение к MongoDB создается при
+первом запросе к базе (backend.database).
+"""
+
+from fastapi import FastAPI, APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.middleware.cors import CORSMiddleware
+from typing import Dict, List, Optional, Tuple
+import importlib
+import logging
+import time
+
+from backend import database
+from backend.settings import Settings, configure, get_settings
+from backend.utils.metrics import MetricsMiddleware, metrics_registry, pool_stats
+from backend.utils.profiling import ProfilingMiddleware, profile_store
+from backend.utils.query_stats import query_monitor
+from backend.utils.read_routing import read_router
+
+logger = logging.getLogger(__name__)
+
+# (модуль роутера, флаг в Settings, при котором он подключается)
+ROUTERS: List[Tuple[str, Optional[str]]] = [
+    ("backend.routers.clients", None),
+    ("backend.routers.messages", None),
+    ("backend.routers.attention", None),
+    ("backend.routers.integrations", None),
+    ("backend.routers.ai_assistant", "ai_enabled"),
+    ("backend.routers.automation", "automation_enabled"),
+    ("backend.routers.export", None),
+    ("backend.routers.imports", None),
+    ("backend.routers.analytics", None),
+    ("backend.routers.admin", None),
+]
+
+
+def create_app(settings: Optional[Settings] = None, client=None) -> FastAPI:
+    """
+    client подменяет Motor (например, MemoryClient), иначе клиент
+    создается лениво по settings.mongo_url
+    """
+    settings = settings or get_settings()
+    configure(settings)
+    if client is not None:
+        database.set_client(client)
+    database.configure_partitions(settings)
+    read_router.configure(settings.read_preferences, settings.read_your_writes_seconds)
+
+    app = FastAPI(
+        title="Leadgram CRM API",
+        description="Telegram WebApp CRM для продавцов",
+        version="1.0.0",
+    )
+
+    # Префикс для API
+    api_router = APIRouter(prefix="/api")
+
+    # Health-check
+    @api_router.get("/")
+    async def root():
+        return {"message": "Leadgram CRM API v1.0.0", "status": "running"}
+
+    @api_router.get("/health")
+    async def health_check():
+        started = time.perf_counter()
+        try:
+            await database.db.command("ping")
+        except Exception as e:
+            logger.error(f"Health check: MongoDB недоступна: {e}")
+            return JSONResponse(
+                status_code=503,
+                content={"status": "unhealthy", "database": "unavailable"},
+            )
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+            "pool": pool_stats.snapshot(),
+        }
+
+    # Подключение роутеров
+    modules: Dict[str, object] = {}
+    for module_name, flag in ROUTERS:
+        if flag and not getattr(settings, flag):
+            continue
+        module = importlib.import_module(module_name)
+        modules[module_name.rsplit(".", 1)[-1]] = module
+        api_router.include_router(module.router)
+
+    app.include_router(api_router)
+
+    # Метрики в формате Prometheus, вне /api и без авторизации
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(
+            metrics_registry.render(), media_type="text/plain; version=0.0.4"
+        )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=list(settings.cors_origins),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Профилирование по запросу администратора (X-Profile: 1)
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+
+    # Метрики добавляются последними, чтобы замер включал CORS
+    app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
+    # Индексы, от которых зависят запросы сервисов (в каждом разделе)
+    @app.on_event("startup")
+    async def ensure_indexes():
+        for _ in database.each_partition():
+            await modules["clients"].lead_scoring_service.ensure_indexes()
+            await modules["imports"].import_service.ensure_indexes()
+            await modules["analytics"].rollup_service.ensure_indexes()
+            await modules["analytics"].response_metrics_service.ensure_indexes()
+            await modules["messages"].deduplicator.ensure_indexes()
+            await modules["integrations"].webhook_limiter.ensure_indexes()
+
+    # Закрепления продавцов за разделами
+    @app.on_event("startup")
+    async def load_partition_overrides():
+        router = database.get_router()
+        if router is not None:
+            await router.load_overrides()
+
+    # Explain медленных запросов выполняется через основной клиент
+    @app.on_event("startup")
+    async def start_query_monitor():
+        query_monitor.attach(database.get_client(), settings.slow_query_ms)
+
+    # Опрос ботов Telegram без публичного webhook'а
+    @app.on_event("startup")
+    async def start_telegram_polling():
+        if settings.telegram_polling:
+            modules["integrations"].telegram_poller.start()
+
+    # Продолжение импортов, прерванных перезапуском
+    @app.on_event("startup")
+    async def resume_imports():
+        await modules["imports"].import_service.resume_interrupted()
+
+    # Закрытие MongoDB при завершении
+    @app.on_event("shutdown")
+    async def shutdown_db_client():
+        if "ai_assistant" in modules:
+            await modules["ai_assistant"].suggestion_service.close()
+            await modules["ai_assistant"].inference_scheduler.close()
+        await modules["imports"].import_service.close()
+        await modules["integrations"].telegram_poller.close()
+        # Отложенная активность клиентов записывается до закрытия клиента
+        if modules["clients"].activity_buffer:
+            await modules["clients"].activity_buffer.close()
+        database.close_client()
+
+    return app
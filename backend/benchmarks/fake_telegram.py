@@ -0,0 +1,123 @@
+"""
+Локальная имитация Telegram Bot API (getUpdates) для тестов и замеров.
+
+FakeBotAPI.app - ASGI-приложение: его можно подключить к httpx через
+ASGITransport или запустить uvicorn'ом. Как и настоящий API:
+- getUpdates ждет новых обновлений до timeout секунд (long polling);
+- offset подтверждает обновления с меньшим update_id, они удаляются;
+- неизвестный токен - 401, параллельный getUpdates того же бота - 409.
+
+Запуск отдельно: uvicorn backend.benchmarks.fake_telegram:app --port 8081
+(токены создаются при первом send_message через POST /fake/{token}/send).
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+
+class _Bot:
+    def __init__(self):
+        self.updates: List[Dict] = []
+        self.next_update_id = 1
+        self.next_message_id: Dict[int, int] = {}
+        self.polling = False
+        self.changed = asyncio.Event()
+
+
+class FakeBotAPI:
+    def __init__(self, auto_create: bool = False):
+        self.bots: Dict[str, _Bot] = {}
+        self.auto_create = auto_create
+        self.requests = 0
+        self.app = self._build_app()
+
+    def add_bot(self, token: str) -> None:
+        self.bots.setdefault(token, _Bot())
+
+    def send_message(
+        self,
+        token: str,
+        chat_id: int,
+        text: str,
+        first_name: str = "Покупатель",
+        date: Optional[int] = None,
+    ) -> Dict:
+        """Сообщение покупателя боту; возвращает созданное обновление"""
+        self.add_bot(token)
+        bot = self.bots[token]
+        message_id = bot.next_message_id.get(chat_id, 1)
+        bot.next_message_id[chat_id] = message_id + 1
+        update = {
+            "update_id": bot.next_update_id,
+            "message": {
+                "message_id": message_id,
+                "from": {"id": chat_id, "is_bot": False, "first_name": first_name},
+                "chat": {"id": chat_id, "type": "private", "first_name": first_name},
+                "date": int(date if date is not None else time.time()),
+                "text": text,
+            },
+        }
+        bot.next_update_id += 1
+        bot.updates.append(update)
+        bot.changed.set()
+        return update
+
+    async def get_updates(
+        self, token: str, offset: Optional[int], limit: int, timeout: float
+    ) -> JSONResponse:
+        self.requests += 1
+        bot = self.bots.get(token)
+        if bot is None:
+            if not self.auto_create:
+                return _error(401, "Unauthorized")
+            self.add_bot(token)
+            bot = self.bots[token]
+        if bot.polling:
+            return _error(409, "Conflict: terminated by other getUpdates request")
+
+        if offset is not None:
+            bot.updates = [u for u in bot.updates if u["update_id"] >= offset]
+        bot.polling = True
+        try:
+            if not bot.updates and timeout > 0:
+                bot.changed.clear()
+                try:
+                    await asyncio.wait_for(bot.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            bot.polling = False
+        return JSONResponse({"ok": True, "result": bot.updates[: max(1, limit)]})
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/bot{token}/getUpdates")
+        async def get_updates(token: str, request: Request):
+            params = await request.json() if await request.body() else {}
+            return await self.get_updates(
+                token,
+                params.get("offset"),
+                int(params.get("limit", 100)),
+                float(params.get("timeout", 0)),
+            )
+
+        @app.post("/fake/{token}/send")
+        async def send(token: str, request: Request):
+            params = await request.json()
+            return self.send_message(token, int(params["chat_id"]), params["text"])
+
+        return app
+
+
+def _error(code: int, description: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=code,
+        content={"ok": False, "error_code": code, "description": description},
+    )
+
+
+app = FakeBotAPI(auto_create=True).app
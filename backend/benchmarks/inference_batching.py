@@ -0,0 +1,78 @@
+"""
+Сравнение прямых вызовов модели и микро-батчинга через InferenceScheduler.
+
+Запуск: python -m backend.benchmarks.inference_batching --requests 500
+"""
+
+import argparse
+import asyncio
+import time
+
+from backend.services.ai_backend import AIPrompt, AITask, LocalTemplateBackend
+from backend.services.inference_scheduler import InferenceScheduler
+
+
+def make_prompts(count: int, users: int):
+    return [
+        AIPrompt(
+            task=AITask.CUSTOM_RESPONSE,
+            text=f"Какая цена? #{i}",
+            user_id=str(i % users),
+        )
+        for i in range(count)
+    ]
+
+
+async def run_direct(backend: LocalTemplateBackend, prompts, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(prompt):
+        async with semaphore:
+            await backend.complete_batch([prompt])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(p) for p in prompts))
+    return time.perf_counter() - started
+
+
+async def run_batched(scheduler: InferenceScheduler, prompts) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(scheduler.submit(p) for p in prompts))
+    elapsed = time.perf_counter() - started
+    await scheduler.close()
+    return elapsed
+
+
+async def main(args) -> None:
+    prompts = make_prompts(args.requests, args.users)
+
+    direct_backend = LocalTemplateBackend(args.overhead_ms / 1000, args.item_ms / 1000)
+    direct = await run_direct(direct_backend, prompts, args.concurrency)
+
+    batched_backend = LocalTemplateBackend(args.overhead_ms / 1000, args.item_ms / 1000)
+    scheduler = InferenceScheduler(
+        batched_backend,
+        max_batch_size=args.batch_size,
+        max_wait_ms=args.wait_ms,
+        max_queue_depth=args.requests,
+        max_concurrent_batches=args.concurrency,
+    )
+    batched = await run_batched(scheduler, prompts)
+
+    print(f"direct:  {args.requests / direct:8.1f} req/s, calls={direct_backend.calls}")
+    print(
+        f"batched: {args.requests / batched:8.1f} req/s, calls={batched_backend.calls}, "
+        f"avg batch={scheduler.stats()['avg_batch_size']:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=5)
+    parser.add_argument("--overhead-ms", type=float, default=20)
+    parser.add_argument("--item-ms", type=float, default=0.5)
+    asyncio.run(main(parser.parse_args()))
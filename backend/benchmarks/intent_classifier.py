@@ -0,0 +1,52 @@
+"""
+Точность и пропускная способность IntentClassifier.
+
+Запуск: python -m backend.benchmarks.intent_classifier --messages 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.services.intent_classifier import IntentClassifier, load_training_data
+
+
+def holdout_accuracy(texts, labels, every: int = 5) -> float:
+    """Каждый every-й пример откладывается для проверки"""
+    train = [i for i in range(len(texts)) if i % every]
+    test = [i for i in range(len(texts)) if not i % every]
+
+    classifier = IntentClassifier.train(
+        [texts[i] for i in train], [labels[i] for i in train]
+    )
+    predicted = classifier.classify_batch([texts[i] for i in test])
+    return float(np.mean([p == labels[i] for p, i in zip(predicted, test)]))
+
+
+def throughput(classifier: IntentClassifier, texts, count: int, repeat: int) -> float:
+    batch = [texts[i % len(texts)] + f" #{i}" for i in range(count)]
+    classifier.classify_batch(batch[:100])  # прогрев
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        classifier.classify_batch(batch)
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def main(args) -> None:
+    texts, labels = load_training_data()
+    print(f"holdout accuracy: {holdout_accuracy(texts, labels):.3f}")
+
+    classifier = IntentClassifier.train(texts, labels)
+    rate = throughput(classifier, texts, args.messages, args.repeat)
+    print(f"classify_batch:   {rate:,.0f} messages/s ({args.messages} per call)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
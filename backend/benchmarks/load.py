@@ -0,0 +1,190 @@
+"""
+Нагрузочный тест всего HTTP-стека в одном процессе.
+
+Приложение из create_app() вызывается напрямую через ASGI-транспорт httpx, без
+сети. Виртуальные продавцы проходят сценарий: дашборд, счетчик
+непрочитанных, открытие чата, ответ, поиск. Запросы проходят через
+авторизацию Telegram WebApp, зависимости FastAPI и модели ответов.
+
+По умолчанию данные лежат в памяти (backend.utils.memory), с --mongo-url
+используется временная база локального mongod.
+
+Запуск: python -m backend.benchmarks.load --users 20 --clients 200 --concurrency 1,8,32
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from backend.benchmarks.services import BOT_TOKEN, signed_init_data
+from backend.settings import Settings
+from backend.synthetic_data import generate_user, user_ids
+from backend.utils.memory import MemoryClient
+
+SEARCH_TERMS = ["цена", "доставка", "встретиться", "состояние"]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(
+        self, http: httpx.AsyncClient, name: str, method: str, url: str, **kwargs
+    ):
+        started = time.perf_counter()
+        response = await http.request(method, url, **kwargs)
+        self.samples[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> str:
+        total = sum(len(s) for s in self.samples.values())
+        lines = [
+            f"  throughput: {total / elapsed:8.1f} req/s ({total} requests in {elapsed:.1f} s)"
+        ]
+        for name, samples in sorted(self.samples.items()):
+            p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+            lines.append(
+                f"  {name:32s} n={len(samples):6d}  p50={p50:7.2f}ms  p95={p95:7.2f}ms"
+                f"  p99={p99:7.2f}ms  errors={self.errors[name]}"
+            )
+        return "\n".join(lines)
+
+
+async def seller_session(
+    http: httpx.AsyncClient, recorder: LatencyRecorder, user_id: str, rng: random.Random
+) -> None:
+    """Один заход продавца в приложение"""
+    headers = {"X-Telegram-Init-Data": signed_init_data(user_id)}
+
+    async def call(name, method, url, **kwargs):
+        return await recorder.request(
+            http, name, method, url, headers=headers, **kwargs
+        )
+
+    await call("GET /clients/dashboard", "GET", "/api/clients/dashboard")
+    await call("GET /attention/summary", "GET", "/api/attention/summary")
+    await call("GET /messages/unread-count", "GET", "/api/messages/unread-count")
+
+    clients = (
+        await call("GET /clients/", "GET", "/api/clients/", params={"limit": 20})
+    ).json()
+    if clients:
+        client = rng.choice(clients)
+        await call(
+            "GET /messages/client/{id}", "GET", f"/api/messages/client/{client['id']}"
+        )
+        await call(
+            "POST /messages/respond",
+            "POST",
+            "/api/messages/respond",
+            json={
+                "client_id": client["id"],
+                "content": "Здравствуйте! Да, еще в продаже.",
+            },
+        )
+
+    await call("GET /messages/unread-count", "GET", "/api/messages/unread-count")
+    await call(
+        "GET /messages/search",
+        "GET",
+        "/api/messages/search",
+        params={"query": rng.choice(SEARCH_TERMS)},
+    )
+
+
+async def run_level(
+    app, sellers: List[str], concurrency: int, sessions: int, seed: int
+) -> str:
+    recorder = LatencyRecorder()
+    rng = random.Random(seed)
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(sessions):
+        queue.put_nowait(rng.choice(sellers))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as http:
+
+        async def worker(worker_id: int):
+            worker_rng = random.Random(seed * 1000 + worker_id)
+            while not queue.empty():
+                await seller_session(http, recorder, queue.get_nowait(), worker_rng)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return recorder.report(elapsed)
+
+
+async def load_dataset(
+    db, sellers: List[str], clients: int, messages: float, seed: int
+) -> None:
+    now = datetime.utcnow()
+    for user_id in sellers:
+        dataset = generate_user(user_id, clients, messages, seed, now=now)
+        for name in ("listings", "clients", "messages"):
+            documents = getattr(dataset, name)
+            if documents:
+                await db[name].insert_many(documents)
+
+
+async def main(args) -> None:
+    db_name = f"leadgram_load_{os.getpid()}"
+    os.environ.update({"ENVIRONMENT": "load", "TELEGRAM_BOT_TOKEN": BOT_TOKEN})
+
+    # Токен бота читается при импорте зависимостей, поэтому импорт после env
+    from backend import database
+    from backend.app import create_app
+
+    settings = Settings(mongo_url=args.mongo_url or "mongodb://memory", db_name=db_name)
+    # Без --mongo-url все сервисы работают с общим хранилищем в памяти
+    app = create_app(settings, client=None if args.mongo_url else MemoryClient())
+    db_client = database.get_client()
+
+    # Лог каждого запроса исказил бы замеры
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    db = db_client[db_name]
+    sellers = user_ids(args.users, args.seed)
+    await load_dataset(db, sellers, args.clients, args.messages, args.seed)
+    backend = "mongo" if args.mongo_url else "memory"
+    print(f"dataset: {args.users} sellers x {args.clients} clients ({backend})")
+
+    await app.router.startup()
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            print(f"\nconcurrency={concurrency}")
+            print(await run_level(app, sellers, concurrency, args.sessions, args.seed))
+    finally:
+        if args.mongo_url:
+            await db_client.drop_database(db_name)
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=200, help="клиентов у продавца")
+    parser.add_argument(
+        "--messages", type=float, default=10, help="среднее сообщений на клиента"
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=200, help="сессий на каждый уровень"
+    )
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL"))
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,136 @@
+"""
+Время холодного старта: импорт приложения, create_app(), startup-хуки
+и первый запрос. Каждый замер выполняется в новом интерпретаторе, чтобы
+модули не были уже загружены. Конфигурации: full (все подсистемы) и
+core (без ИИ и автоматизаций).
+
+Результаты, как и в benchmarks.services, хранятся в baselines.json
+относительно скорости машины.
+
+Запуск:
+    python -m backend.benchmarks.startup --runs 5
+    python -m backend.benchmarks.startup --save-baseline
+    python -m backend.benchmarks.startup --check
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+CONFIGS = {
+    "full": {"ai_enabled": True, "automation_enabled": True},
+    "core": {"ai_enabled": False, "automation_enabled": False},
+}
+PHASES = ("import", "create_app", "startup", "first_request")
+
+
+def child(config: str) -> None:
+    """Один холодный старт; результат печатается в stdout как JSON"""
+    import asyncio
+
+    os.environ["ENVIRONMENT"] = "development"
+    timings = {}
+    started = time.perf_counter()
+    from backend.app import create_app
+    from backend.settings import Settings
+    from backend.utils.memory import MemoryClient
+
+    timings["import"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    settings = Settings(
+        mongo_url="mongodb://memory", db_name="startup_bench", **CONFIGS[config]
+    )
+    app = create_app(settings, client=MemoryClient())
+    timings["create_app"] = time.perf_counter() - started
+
+    async def run():
+        import httpx
+
+        started = time.perf_counter()
+        await app.router.startup()
+        timings["startup"] = time.perf_counter() - started
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://s") as http:
+            started = time.perf_counter()
+            response = await http.get("/api/clients/dashboard")
+            timings["first_request"] = time.perf_counter() - started
+            response.raise_for_status()
+        await app.router.shutdown()
+
+    asyncio.run(run())
+    print(json.dumps(timings))
+
+
+def measure(config: str, runs: int) -> Dict[str, float]:
+    """Медиана по запускам, секунды на фазу"""
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.startup", "--child", config],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for phase in PHASES:
+            samples[phase].append(timings[phase])
+    return {phase: statistics.median(values) for phase, values in samples.items()}
+
+
+def main(args) -> int:
+    from backend.benchmarks.services import BASELINE_PATH, calibrate, compare
+
+    speed = statistics.median(calibrate(0.05) for _ in range(5))
+    relative = {}
+    for config in CONFIGS:
+        timings = measure(config, args.runs)
+        total = sum(timings.values())
+        print(
+            f"{config:5s} "
+            + "  ".join(f"{phase}={timings[phase] * 1000:7.1f}ms" for phase in PHASES)
+            + f"  total={total * 1000:7.1f}ms"
+        )
+        # Как и у микробенчмарков: больше - лучше, в единицах калибровки
+        for phase in ("import", "first_request"):
+            relative[f"startup:{config}:{phase}"] = 1 / timings[phase] / speed
+        relative[f"startup:{config}:total"] = 1 / total / speed
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    if args.save_baseline:
+        baseline.update({key: round(value, 6) for key, value in relative.items()})
+        BASELINE_PATH.write_text(
+            json.dumps(dict(sorted(baseline.items())), indent=2) + "\n"
+        )
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+    if args.check:
+        regressions = compare(relative, baseline, args.threshold)
+        for key, slowdown in regressions.items():
+            print(f"REGRESSION {key}: {slowdown * 100:.0f}% slower than baseline")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=list(CONFIGS), help=argparse.SUPPRESS)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.4, help="допустимое замедление"
+    )
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        sys.exit(0)
+    sys.exit(main(args))
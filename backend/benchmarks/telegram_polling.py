@@ -0,0 +1,78 @@
+"""
+Пропускная способность приема Telegram через long polling.
+
+Боты с накопленными сообщениями опрашиваются TelegramPoller'ом через
+локальную имитацию Bot API (FakeBotAPI) и пишутся в хранилище в памяти.
+Запуск: python -m backend.benchmarks.telegram_polling --bots 50 --messages 200
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from backend.benchmarks.fake_telegram import FakeBotAPI
+from backend.services.deduplication import MessageDeduplicator
+from backend.services.telegram_ingest import TelegramIngestService
+from backend.services.telegram_polling import TelegramPoller
+from backend.utils.memory import MemoryDatabase
+
+
+async def main(args) -> None:
+    api = FakeBotAPI()
+    db = MemoryDatabase()
+    # Индексы, которые приложение создает при старте
+    await MessageDeduplicator(db.messages).ensure_indexes()
+    await db.clients.create_index([("user_id", 1), ("external_id", 1)])
+    integrations = []
+    for bot in range(args.bots):
+        token = f"bot-{bot}"
+        api.add_bot(token)
+        for i in range(args.messages):
+            api.send_message(token, 1000 + i % args.chats, f"Сообщение {i}")
+        integration = {
+            "id": f"i{bot}",
+            "type": "telegram",
+            "status": "active",
+            "config": {"mode": "polling", "bot_token": token},
+            "user_id": str(bot % args.users),
+        }
+        await db.integrations.insert_one(dict(integration))
+        integrations.append(integration)
+
+    poller = TelegramPoller(
+        db.integrations,
+        TelegramIngestService(db.clients, db.messages),
+        api_url="http://fake",
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        http=httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app)),
+    )
+
+    async def drain(integration):
+        while await poller.poll_once(integration, timeout=0):
+            pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(drain(i) for i in integrations))
+    elapsed = time.perf_counter() - started
+    await poller.close()
+
+    total = args.bots * args.messages
+    stored = await db.messages.count_documents({})
+    print(
+        f"{total / elapsed:8.1f} msg/s, messages={stored}/{total}, "
+        f"polls={poller.stats()['polls']}, api requests={api.requests}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
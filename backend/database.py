@@ -0,0 +1,153 @@
+"""
+Ленивое подключение к MongoDB.
+
+Один клиент Motor на процесс создается при первом обращении к коллекции,
+а не при импорте модулей, поэтому роутеры и сервисы импортируются без
+MONGO_URL и без сети. Роутеры держат ссылки на LazyCollection, которые
+разрешаются в настоящие коллекции при первом вызове.
+
+Вместо MongoDB можно выбрать другое хранилище через STORAGE: memory
+(backend.utils.memory, для разработки) или sqlite (backend.utils.sqlite,
+для инсталляций одного продавца). Сервисы при этом не меняются.
+
+С PARTITIONS коллекции разрешаются через PartitionRouter при каждом
+обращении - в раздел продавца текущего запроса
+(backend.utils.partitioning).
+
+Чтения аналитики направляются на вторичные узлы по политикам
+backend.utils.read_routing.
+"""
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from backend.settings import Settings, get_settings
+from backend.utils.metrics import pool_stats
+from backend.utils.partitioning import Partition, PartitionRouter
+from backend.utils.query_stats import query_monitor
+from backend.utils.read_routing import read_router
+
+_client = None
+_router: Optional[PartitionRouter] = None
+
+
+def set_client(client) -> None:
+    """Подменяет клиента (например, хранилищем в памяти для тестов и бенчмарков)"""
+    global _client
+    _client = client
+    db.reset()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        settings = get_settings()
+        if settings.storage == "memory":
+            from backend.utils.memory import MemoryClient
+
+            _client = MemoryClient()
+        elif settings.storage == "sqlite":
+            from backend.utils.sqlite import SQLiteClient
+
+            _client = SQLiteClient(settings.sqlite_path)
+        else:
+            _client = AsyncIOMotorClient(
+                settings.mongo_url, event_listeners=[pool_stats, query_monitor]
+            )
+    return _client
+
+
+def get_database():
+    return get_client()[get_settings().db_name]
+
+
+def set_router(router: Optional[PartitionRouter]) -> None:
+    global _router
+    _router = router
+    db.reset()
+
+
+def get_router() -> Optional[PartitionRouter]:
+    return _router
+
+
+def configure_partitions(settings: Settings) -> None:
+    """Роутер по разделам из settings.partitions (имя, MongoDB URL)"""
+    if not settings.partitions:
+        set_router(None)
+        return
+    partitions = []
+    for name, url in settings.partitions:
+        db_name = urlparse(url).path.lstrip("/") or settings.db_name
+        client = (
+            get_client()
+            if url == settings.mongo_url
+            else AsyncIOMotorClient(url, event_listeners=[pool_stats, query_monitor])
+        )
+        partitions.append(Partition(name, client, db_name))
+    set_router(PartitionRouter(partitions))
+
+
+def each_partition() -> Iterator[Optional[str]]:
+    """Для служебных операций (индексы): по разу в каждом разделе"""
+    if _router is None:
+        yield None
+    else:
+        yield from _router.each_partition()
+
+
+def close_client() -> None:
+    global _client, _router
+    if _router is not None:
+        _router.close()
+        _router = None
+    if _client is not None:
+        _client.close()
+        _client = None
+    db.reset()
+
+
+class LazyCollection:
+    __slots__ = ("name", "_collection")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collection = None
+
+    def __getattr__(self, attr: str):
+        if _router is not None:
+            collection = _router.collection(self.name)
+        else:
+            if self._collection is None:
+                self._collection = get_database()[self.name]
+            collection = self._collection
+        # Read preference по методу сервиса (backend.utils.read_routing)
+        return getattr(read_router.route(collection, attr), attr)
+
+
+class LazyDatabase:
+    def __init__(self):
+        self._collections: Dict[str, LazyCollection] = {}
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = LazyCollection(name)
+        return collection
+
+    async def command(self, *args, **kwargs):
+        return await get_database().command(*args, **kwargs)
+
+    def reset(self) -> None:
+        """Коллекции заново привяжутся к текущему клиенту при следующем вызове"""
+        for collection in self._collections.values():
+            collection._collection = None
+
+
+db = LazyDatabase()
@@ -17,6 +17,11 @@ class MessageSource(str, Enum):
     OLX = "olx"
 
 
+class ClientOrder(str, Enum):
+    RECENT = "recent"
+    PRIORITY = "priority"
+
+
 class Client(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -25,10 +30,12 @@ class Client(BaseModel):
     status: ClientStatus = ClientStatus.NEW
     listing_id: Optional[str] = None
     listing_title: Optional[str] = None
+    external_id: Optional[str] = None  # ID контакта во внешней системе
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     last_message_at: Optional[datetime] = None
     messages_count: int = 0
+    score: float = 0.0  # Приоритет лида, см. LeadScoringService
     user_id: str  # Telegram user ID владельца
 
 
@@ -38,6 +45,7 @@ class ClientCreate(BaseModel):
     source: MessageSource
     listing_id: Optional[str] = None
     listing_title: Optional[str] = None
+    external_id: Optional[str] = None
 
 
 class ClientUpdate(BaseModel):
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from backend.models.message import MessageCreate
+import uuid
+
+
+class ImportKind(str, Enum):
+    CLIENTS = "clients"
+    MESSAGES = "messages"
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    JSONL = "jsonl"
+
+
+class ImportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: ImportKind
+    format: ImportFormat
+    status: ImportStatus = ImportStatus.PENDING
+    filename: Optional[str] = None
+    file_path: str
+    rows_processed: int = 0  # Чекпоинт: сколько строк файла уже обработано
+    rows_written: int = 0
+    rows_failed: int = 0
+    errors: List[ImportRowError] = []  # Последние ошибки валидации
+    last_error: Optional[str] = None
+    lease_until: Optional[datetime] = None  # Задача занята воркером до этого времени
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    user_id: str  # Telegram user ID владельца
+
+
+class MessageImportRow(MessageCreate):
+    timestamp: Optional[datetime] = None
+    external_id: Optional[str] = None
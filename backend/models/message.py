@@ -10,6 +10,15 @@ class MessageType(str, Enum):
     OUTGOING = "outgoing"
 
 
+class MessageIntent(str, Enum):
+    PRICE = "price"
+    MEETING = "meeting"
+    CONDITION = "condition"
+    AVAILABILITY = "availability"
+    DELIVERY = "delivery"
+    OTHER = "other"
+
+
 class Message(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_id: str
@@ -18,6 +27,9 @@ class Message(BaseModel):
     source: str  # telegram, whatsapp, olx
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     is_read: bool = False
+    external_id: Optional[str] = None  # ID сообщения во внешней системе
+    # Интеграция, из которой пришло сообщение; вместе с external_id уникальна
+    integration_id: Optional[str] = None
     user_id: str  # Telegram user ID владельца
 
 
@@ -26,6 +38,9 @@ class MessageCreate(BaseModel):
     content: str
     message_type: MessageType
     source: str
+    # Ключ идемпотентности для повторно доставленных сообщений интеграций
+    external_id: Optional[str] = None
+    integration_id: Optional[str] = None
 
 
 class MessageResponse(BaseModel):
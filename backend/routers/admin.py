@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Dict, List, Literal
+import asyncio
+from backend.database import get_router
+from backend.utils.dependencies import require_admin
+from backend.utils.profiling import profile_store
+from backend.utils.query_stats import query_monitor
+
+router = APIRouter(
+    prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)]
+)
+
+# Фоновые переносы продавцов между разделами
+migration_tasks: Dict[str, asyncio.Task] = {}
+
+
+@router.get("/queries")
+async def get_query_stats(
+    sort: Literal["total_ms", "max_ms", "count", "documents", "slow"] = Query(
+        "total_ms"
+    ),
+    limit: int = Query(50, ge=1, le=500),
+) -> List[Dict]:
+    """Самые тяжелые формы запросов к MongoDB с методом сервиса, который их выполняет"""
+    return query_monitor.top(sort, limit)
+
+
+@router.delete("/queries")
+async def reset_query_stats() -> Dict:
+    """Сбросить накопленную статистику запросов"""
+    query_monitor.reset()
+    return {"success": True}
+
+
+@router.get("/profiles")
+async def get_profiles() -> List[Dict]:
+    """Последние профили запросов, снятые с заголовком X-Profile: 1"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str) -> Dict:
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {
+        **profile.summary(),
+        "db_calls": profile.db_calls,
+        "top_stacks": profile.stacks.most_common(20),
+    }
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def get_profile_folded(profile_id: str) -> str:
+    """Свернутые стеки: flamegraph.pl или speedscope.app"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.folded()
+
+
+def _partition_router():
+    partition_router = get_router()
+    if partition_router is None:
+        raise HTTPException(status_code=404, detail="Partitioning is not configured")
+    return partition_router
+
+
+@router.get("/partitions")
+async def get_partitions() -> Dict:
+    """Разделы, закрепления и текущие переносы продавцов"""
+    partition_router = _partition_router()
+    return {
+        "home": partition_router.home,
+        "partitions": list(partition_router.partitions),
+        "overrides": partition_router.overrides,
+        "migrations": {
+            user_id: {"source": m.source, "target": m.target}
+            for user_id, m in partition_router.migrations.items()
+        },
+    }
+
+
+@router.get("/partitions/users/{user_id}")
+async def get_user_partition(user_id: str) -> Dict:
+    return {"user_id": user_id, "partition": _partition_router().partition_for(user_id)}
+
+
+@router.post("/partitions/users/{user_id}/migrate", status_code=202)
+async def migrate_user(user_id: str, target: str = Query(...)) -> Dict:
+    """Запускает перенос продавца в раздел target (двойная запись и переключение)"""
+    partition_router = _partition_router()
+    if target not in partition_router.partitions:
+        raise HTTPException(status_code=400, detail="Unknown partition")
+    task = migration_tasks.get(user_id)
+    if (task and not task.done()) or user_id in partition_router.migrations:
+        raise HTTPException(status_code=409, detail="Migration already in progress")
+
+    task = asyncio.get_running_loop().create_task(
+        partition_router.migrate(user_id, target)
+    )
+    migration_tasks[user_id] = task
+    task.add_done_callback(lambda _: migration_tasks.pop(user_id, None))
+    return {"user_id": user_id, "target": target, "status": "started"}
@@ -1,16 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, List, Any
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Any, Optional
+from pydantic import BaseModel, Field
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from backend.services.ai_backend import AIPrompt, AITask, LocalTemplateBackend
+from backend.services.intent_classifier import get_intent_classifier
+from backend.services.listing_analysis import analyze_listings, listing_report
+from backend.services.inference_scheduler import InferenceScheduler, QueueFullError
+from backend.services.suggestion_service import SuggestionService
+from backend.database import db
+from backend.settings import get_settings
+import asyncio
+import json
 
 router = APIRouter(prefix="/ai", tags=["ai-assistant"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
+settings = get_settings()
+inference_scheduler = InferenceScheduler(
+    LocalTemplateBackend(),
+    max_batch_size=settings.ai_batch_size,
+    max_wait_ms=settings.ai_batch_wait_ms,
+    max_queue_depth=settings.ai_queue_depth,
+    timeout_seconds=settings.ai_timeout_seconds,
+)
+suggestion_service = SuggestionService(
+    db.messages,
+    inference_scheduler,
+    debounce_seconds=settings.ai_suggest_debounce_seconds,
+    classifier=get_intent_classifier(),
+)
 
 
 class AIRequest(BaseModel):
@@ -33,6 +51,31 @@ class ListingAnalysisRequest(BaseModel):
     listing_text: str
 
 
+class ListingBatchItem(BaseModel):
+    listing_id: str
+    listing_text: str
+    category: Optional[str] = None
+    price: Optional[float] = None
+
+
+class ListingBatchRequest(BaseModel):
+    listings: List[ListingBatchItem] = Field(..., min_length=1, max_length=1000)
+
+
+async def run_inference(prompt: AIPrompt) -> AIResponse:
+    """Выполняет запрос через общий планировщик батчей"""
+    try:
+        completion = await inference_scheduler.submit(prompt)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="AI assistant is overloaded")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="AI assistant timed out")
+
+    return AIResponse(
+        response=completion.response, suggestions=completion.suggestions
+    )
+
+
 @router.post("/suggest-response", response_model=AIResponse)
 async def suggest_response(
     request: ResponseSuggestionRequest, user_id: str = Depends(get_user_id)
@@ -44,21 +87,15 @@ async def suggest_response(
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
 
-    # Получаем последние сообщения
-    messages = (
-        await db.messages.find({"client_id": request.client_id, "user_id": user_id})
-        .sort("timestamp", -1)
-        .limit(10)
-        .to_list(length=10)
-    )
-
-    # Пока что возвращаем заглушку
-    # В будущем здесь будет интеграция с OpenAI API
-    suggestions = [
-        "Спасибо за ваш интерес! Товар все еще доступен.",
-        "Да, можем встретиться для осмотра. Когда вам удобно?",
-        "Цена обсуждается. Готовы рассмотреть разумные предложения.",
-    ]
+    # Подсказки обычно уже сгенерированы в фоне при входящем сообщении
+    try:
+        suggestions = await suggestion_service.get_suggestions(
+            request.client_id, user_id
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="AI assistant is overloaded")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="AI assistant timed out")
 
     return AIResponse(response=suggestions[0], suggestions=suggestions)
 
@@ -74,16 +111,12 @@ async def get_close_deal_tips(
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
 
-    # Пока что возвращаем заглушку
-    tips = [
-        "Создайте ощущение срочности: 'Завтра уезжаю, можем встретиться сегодня?'",
-        "Предложите небольшую скидку при быстром решении",
-        "Покажите заинтересованность других покупателей",
-        "Подчеркните уникальные преимущества товара",
-    ]
-
-    return AIResponse(
-        response="Вот несколько советов для закрытия сделки:", suggestions=tips
+    return await run_inference(
+        AIPrompt(
+            task=AITask.CLOSE_DEAL_TIPS,
+            history=request.conversation_history,
+            user_id=user_id,
+        )
     )
 
 
@@ -93,17 +126,29 @@ async def analyze_listing(
 ) -> AIResponse:
     """Анализ объявления и предложения по улучшению"""
 
-    # Пока что возвращаем заглушку
-    # В будущем здесь будет анализ текста через AI
-    analysis = "Объявление выглядит хорошо, но можно улучшить:"
-    suggestions = [
-        "Добавьте больше фотографий товара",
-        "Укажите точное местоположение",
-        "Добавьте информацию о состоянии товара",
-        "Используйте более привлекательные ключевые слова",
-    ]
+    return await run_inference(
+        AIPrompt(
+            task=AITask.ANALYZE_LISTING, text=request.listing_text, user_id=user_id
+        )
+    )
+
+
+@router.post("/analyze-listings/batch")
+async def analyze_listings_batch(
+    request: ListingBatchRequest, user_id: str = Depends(get_user_id)
+) -> StreamingResponse:
+    """Пакетный анализ объявлений, результат отдается потоком NDJSON"""
 
-    return AIResponse(response=analysis, suggestions=suggestions)
+    # Признаки считаются одним проходом по всему пакету вне event loop
+    items = [item.model_dump() for item in request.listings]
+    frame = await asyncio.to_thread(analyze_listings, items)
+
+    def stream_report(chunk_size: int = 100):
+        for start in range(0, len(frame), chunk_size):
+            for row in listing_report(frame.iloc[start : start + chunk_size]):
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream_report(), media_type="application/x-ndjson")
 
 
 @router.post("/generate-response")
@@ -112,23 +157,11 @@ async def generate_custom_response(
 ) -> Dict[str, str]:
     """Генерация кастомного ответа по запросу"""
 
-    # Пока что возвращаем заглушку
-    # В будущем здесь будет полноценная интеграция с OpenAI
-
-    prompt = request.prompt.lower()
-
-    if "цена" in prompt or "стоимость" in prompt:
-        response = "Цена указана в объявлении. Готовы рассмотреть разумные предложения."
-    elif "встреча" in prompt or "посмотреть" in prompt:
-        response = "Конечно! Могу показать товар. Когда вам будет удобно встретиться?"
-    elif "состояние" in prompt or "качество" in prompt:
-        response = "Товар в отличном состоянии, готов к использованию."
-    else:
-        response = (
-            "Спасибо за интерес к объявлению! Готов ответить на все ваши вопросы."
-        )
+    result = await run_inference(
+        AIPrompt(task=AITask.CUSTOM_RESPONSE, text=request.prompt, user_id=user_id)
+    )
 
-    return {"response": response}
+    return {"response": result.response}
 
 
 @router.get("/settings")
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from backend.services.rollup_service import RollupService, RollupInterval
+from backend.services.response_metrics import ResponseMetricsService
+from backend.utils.dependencies import get_user_id
+from backend.database import db
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+rollup_service = RollupService(db.rollups_hourly, db.clients, db.messages)
+response_metrics_service = ResponseMetricsService(
+    db.response_latency, db.messages, db.clients, db.listings
+)
+
+
+@router.get("/timeseries")
+async def get_timeseries(
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    interval: RollupInterval = Query(RollupInterval.DAY),
+    source: Optional[str] = Query(None),
+    user_id: str = Depends(get_user_id),
+) -> List[Dict]:
+    """Сообщения и лиды по периодам (по умолчанию за последние 30 дней)"""
+    date_to = date_to or datetime.utcnow()
+    date_from = date_from or date_to - timedelta(days=30)
+    try:
+        return await rollup_service.timeseries(
+            user_id, date_from, date_to, interval, source
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/rebuild")
+async def rebuild_rollups(user_id: str = Depends(get_user_id)):
+    """Пересчитать агрегаты из истории сообщений и клиентов"""
+    buckets = await rollup_service.rebuild(user_id)
+    return {"buckets": buckets}
+
+
+@router.get("/response-time")
+async def get_response_time(
+    listing_id: Optional[str] = Query(None),
+    days: int = Query(30, ge=1, le=365),
+    user_id: str = Depends(get_user_id),
+) -> Dict[str, Dict]:
+    """Медиана и p90 времени ответа: по всем чатам или по объявлению"""
+    return await response_metrics_service.get_latency(user_id, listing_id, days)
@@ -2,15 +2,10 @@ from fastapi import APIRouter, Depends
 from typing import List, Dict
 from backend.services.attention_service import AttentionService
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from backend.database import db
 
 router = APIRouter(prefix="/attention", tags=["attention"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
 attention_service = AttentionService(db.clients, db.messages, db.listings)
 
 
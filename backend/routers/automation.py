@@ -2,17 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict, Any
 from backend.models.automation import Automation, AutomationCreate, AutomationUpdate
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
+from backend.services.intent_classifier import get_intent_classifier
+from backend.database import db
 import os
 import requests
 
 router = APIRouter(prefix="/automation", tags=["automation"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
-
 
 @router.get("/", response_model=List[Automation])
 async def get_automations(user_id: str = Depends(get_user_id)) -> List[Automation]:
@@ -122,10 +118,15 @@ async def test_automation(
     if automation is None:
         raise HTTPException(status_code=404, detail="Automation not found")
 
-    # Имитация теста
+    # Проверяем условия на тестовом сообщении
+    message = str(test_data.get("test_message", test_data.get("message", "")))
+    intent = get_intent_classifier().classify(message, min_confidence=0.5)
+    matched = conditions_match(automation.get("conditions", {}), message, intent)
+
     return {
         "message": f"Automation '{automation['name']}' tested successfully",
-        "test_result": "passed",
+        "test_result": "passed" if matched else "conditions_not_met",
+        "intent": intent,
         "test_data": test_data,
     }
 
@@ -163,7 +164,7 @@ async def get_automation_templates() -> List[Dict[str, Any]]:
             "name": "Помощь в переговорах по цене",
             "description": "Автоматически отвечает на вопросы о цене",
             "trigger": "new_message",
-            "conditions": {"contains": ["цена", "сколько", "стоимость"]},
+            "conditions": {"intents": ["price"]},
             "actions": [
                 {
                     "type": "send_message",
@@ -176,6 +177,19 @@ async def get_automation_templates() -> List[Dict[str, Any]]:
     return templates
 
 
+def conditions_match(conditions: Dict[str, Any], message: str, intent: str) -> bool:
+    """Проверка условий автоматизации для входящего сообщения"""
+    intents = conditions.get("intents")
+    if intents and intent not in intents:
+        return False
+
+    keywords = conditions.get("contains")
+    if keywords and not any(word.lower() in message.lower() for word in keywords):
+        return False
+
+    return True
+
+
 async def trigger_n8n_workflow(workflow_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """Запуск n8n workflow"""
     # Здесь должна быть интеграция с n8n
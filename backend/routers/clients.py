@@ -1,18 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
-from backend.models.client import Client, ClientCreate, ClientUpdate, ClientStatus
+from backend.models.client import (
+    Client,
+    ClientCreate,
+    ClientUpdate,
+    ClientStatus,
+    ClientOrder,
+)
+from backend.services.activity_buffer import ActivityBuffer
 from backend.services.client_service import ClientService
+from backend.services.lead_scoring import LeadScoringService
+from backend.services.intent_classifier import get_intent_classifier
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from backend.routers.analytics import rollup_service
+from backend.utils.metrics import metrics_registry
+from backend.database import db
+from backend.settings import get_settings
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
-client_service = ClientService(db.clients)
+# Общий буфер активности: пишут сообщения, сбрасывают чтения клиентов
+activity_buffer = None
+if get_settings().activity_flush_ms > 0:
+    activity_buffer = ActivityBuffer(
+        db.clients,
+        get_settings().activity_flush_ms,
+        get_settings().activity_max_pending,
+    )
+    metrics_registry.register_collector(activity_buffer.render)
+
+client_service = ClientService(db.clients, rollup_service, activity_buffer)
+lead_scoring_service = LeadScoringService(
+    db.clients, db.messages, db.listings, get_intent_classifier(), activity_buffer
+)
 
 
 @router.get("/", response_model=List[Client])
@@ -21,9 +41,10 @@ async def get_clients(
     status: Optional[ClientStatus] = Query(None),
     source: Optional[str] = Query(None),
     limit: int = Query(50, le=100),
+    order: ClientOrder = Query(ClientOrder.RECENT),
 ):
     """Получить список клиентов с фильтрацией"""
-    return await client_service.get_clients(user_id, status, source, limit)
+    return await client_service.get_clients(user_id, status, source, limit, order)
 
 
 @router.get("/recent", response_model=List[Client])
@@ -40,6 +61,13 @@ async def get_dashboard_stats(user_id: str = Depends(get_user_id)):
     return await client_service.get_dashboard_stats(user_id)
 
 
+@router.post("/rescore")
+async def rescore_clients(user_id: str = Depends(get_user_id)):
+    """Пересчитать приоритет всех клиентов"""
+    updated = await lead_scoring_service.rescore_user(user_id)
+    return {"updated": updated}
+
+
 @router.post("/", response_model=Client)
 async def create_client(client_data: ClientCreate, user_id: str = Depends(get_user_id)):
     """Создать нового клиента"""
@@ -84,4 +112,6 @@ async def close_client(client_id: str, user_id: str = Depends(get_user_id)):
     client = await client_service.update_client(client_id, user_id, update_data)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
+
+    await lead_scoring_service.rescore_client(client_id, user_id)
     return {"message": "Client closed successfully"}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+from backend.services.export_service import ExportService, ExportFormat, MEDIA_TYPES
+from backend.utils.dependencies import get_user_id
+from backend.database import db
+import importlib.util
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+export_service = ExportService({"clients": db.clients, "messages": db.messages})
+
+
+class ExportKind(str, Enum):
+    CLIENTS = "clients"
+    MESSAGES = "messages"
+
+
+@router.get("/{kind}")
+async def export_collection(
+    kind: ExportKind,
+    format: ExportFormat = Query(ExportFormat.CSV),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    source: Optional[str] = Query(None),
+    user_id: str = Depends(get_user_id),
+) -> StreamingResponse:
+    """Выгрузить клиентов или сообщения в CSV, NDJSON или Parquet"""
+    if format == ExportFormat.PARQUET and not importlib.util.find_spec("pyarrow"):
+        raise HTTPException(
+            status_code=400, detail="Parquet export requires pyarrow to be installed"
+        )
+
+    stream = export_service.stream(
+        kind.value, user_id, format, date_from, date_to, source
+    )
+    filename = f"{kind.value}.{format.value}"
+
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from typing import List, Optional
+from pathlib import Path
+from backend.models.import_job import ImportJob, ImportKind, ImportFormat
+from backend.services.import_service import ImportService
+from backend.routers.analytics import rollup_service
+from backend.utils.dependencies import get_user_id
+from backend.database import db
+from backend.settings import get_settings
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+import_service = ImportService(
+    db.import_jobs,
+    db.clients,
+    db.messages,
+    get_settings().import_dir,
+    chunk_size=get_settings().import_chunk_size,
+    rollup_service=rollup_service,
+)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@router.post("/{kind}", response_model=ImportJob)
+async def create_import(
+    kind: ImportKind,
+    file: UploadFile = File(...),
+    format: Optional[ImportFormat] = Query(None),
+    user_id: str = Depends(get_user_id),
+) -> ImportJob:
+    """Загрузить CSV/JSONL файл и запустить импорт"""
+    if format is None:
+        extension = Path(file.filename or "").suffix.lower().lstrip(".")
+        if extension in ("jsonl", "ndjson"):
+            format = ImportFormat.JSONL
+        elif extension == "csv":
+            format = ImportFormat.CSV
+        else:
+            raise HTTPException(status_code=400, detail="Unknown file format")
+
+    async def read_chunks():
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+    return await import_service.create_job(
+        user_id, kind, format, read_chunks(), file.filename
+    )
+
+
+@router.get("/jobs", response_model=List[ImportJob])
+async def get_import_jobs(
+    user_id: str = Depends(get_user_id), limit: int = Query(20, le=100)
+) -> List[ImportJob]:
+    """Получить список задач импорта"""
+    return await import_service.get_jobs(user_id, limit)
+
+
+@router.get("/jobs/{job_id}", response_model=ImportJob)
+async def get_import_job(job_id: str, user_id: str = Depends(get_user_id)) -> ImportJob:
+    """Получить прогресс задачи импорта"""
+    job = await import_service.get_job(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/resume", response_model=ImportJob)
+async def resume_import_job(
+    job_id: str, user_id: str = Depends(get_user_id)
+) -> ImportJob:
+    """Продолжить задачу импорта с последнего чекпоинта"""
+    job = await import_service.get_job(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if not Path(job.file_path).exists():
+        raise HTTPException(
+            status_code=409, detail="Import file is no longer available"
+        )
+
+    import_service.start(job_id, user_id)
+    return job
@@ -1,22 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import List, Dict, Any
+from fastapi.responses import JSONResponse
+from typing import List, Dict, Any, Optional
 from backend.models.integration import Integration, IntegrationCreate, IntegrationUpdate
 from backend.models.message import MessageCreate
-from backend.services.message_service import MessageService
+from backend.services.message_service import DuplicateMessageError, MessageService
 from backend.services.client_service import ClientService
+from backend.services.telegram_ingest import TelegramIngestService
+from backend.services.telegram_polling import TelegramPoller
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from backend.utils.metrics import metrics_registry
+from backend.utils.partitioning import bind_user
+from backend.utils.rate_limit import Limit, MemoryRateLimiter, SharedRateLimiter
+from backend.routers.analytics import rollup_service
+from backend.routers.messages import deduplicator
+from backend.database import db
+from backend.settings import get_settings
 import json
+import math
+
+# Подсказки ИИ подключаются, только если подсистема включена
+suggestion_service = None
+if get_settings().ai_enabled:
+    from backend.routers.ai_assistant import suggestion_service
 
 router = APIRouter(prefix="/integrations", tags=["integrations"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
-message_service = MessageService(db.messages)
-client_service = ClientService(db.clients)
+message_service = MessageService(
+    db.messages, suggestion_service, rollup_service, deduplicator=deduplicator
+)
+client_service = ClientService(db.clients, rollup_service)
+telegram_ingest_service = TelegramIngestService(
+    db.clients, db.messages, deduplicator, rollup_service
+)
+# Опрос запускается при старте приложения, если включен TELEGRAM_POLLING
+telegram_poller = TelegramPoller(
+    db.integrations,
+    telegram_ingest_service,
+    api_url=get_settings().telegram_api_url,
+    timeout_seconds=get_settings().telegram_poll_timeout,
+    concurrency=get_settings().telegram_poll_concurrency,
+)
+metrics_registry.register_collector(telegram_poller.render)
+
+# Одна интеграция не должна забирать воркер у остальных продавцов
+if get_settings().rate_limit_store == "shared":
+    webhook_limiter = SharedRateLimiter(db.rate_limits)
+else:
+    webhook_limiter = MemoryRateLimiter()
+metrics_registry.register_collector(webhook_limiter.render)
 
 
 @router.get("/", response_model=List[Integration])
@@ -85,21 +116,81 @@ async def handle_webhook(integration_id: str, request: Request) -> Dict[str, str
     if not integration:
         raise HTTPException(status_code=404, detail="Integration not found")
 
-    if integration["type"] == "telegram":
-        await handle_telegram_webhook(body, integration["user_id"])
-    elif integration["type"] == "whatsapp":
-        await handle_whatsapp_webhook(body, integration["user_id"])
-    elif integration["type"] == "olx":
-        await handle_olx_webhook(body, integration["user_id"])
+    # Дальше webhook работает с данными продавца интеграции
+    bind_user(integration["user_id"])
+
+    retry_after = await webhook_limiter.acquire(webhook_limits(integration))
+    if retry_after:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many webhooks"},
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    # Повторная доставка отсекается до обработки
+    external_id = external_message_id(integration["type"], body)
+    if external_id and await message_service.is_duplicate(integration_id, external_id):
+        return {"message": "Duplicate webhook ignored"}
+
+    try:
+        if integration["type"] == "telegram":
+            await handle_telegram_webhook(body, integration)
+        elif integration["type"] == "whatsapp":
+            await handle_whatsapp_webhook(body, integration["user_id"])
+        elif integration["type"] == "olx":
+            await handle_olx_webhook(body, integration["user_id"])
+    except DuplicateMessageError:
+        # Повтор пришел в другой воркер: его отсек уникальный индекс
+        return {"message": "Duplicate webhook ignored"}
 
     return {"message": "Webhook processed successfully"}
 
 
-async def handle_telegram_webhook(data: Dict[str, Any], user_id: str) -> None:
-    """Обработка webhook от Telegram"""
-    # Здесь логика обработки сообщений из Telegram
-    # Это заглушка для демонстрации
-    pass
+def webhook_limits(integration: Dict[str, Any]) -> List[Any]:
+    """Корзины webhook'а: интеграция (лимит из config["rate_limit"]) и продавец"""
+    settings = get_settings()
+    config = (integration.get("config") or {}).get("rate_limit") or {}
+    try:
+        integration_limit = Limit(
+            float(config.get("per_second", settings.webhook_rate_limit)),
+            int(config.get("burst", settings.webhook_burst)),
+        )
+    except (TypeError, ValueError):
+        # Ошибка в конфигурации не должна отключать лимит
+        integration_limit = Limit(settings.webhook_rate_limit, settings.webhook_burst)
+    return [
+        ("integration", f"integration:{integration['id']}", integration_limit),
+        (
+            "user",
+            f"user:{integration['user_id']}",
+            Limit(settings.user_webhook_rate_limit, settings.user_webhook_burst),
+        ),
+    ]
+
+
+def external_message_id(integration_type: str, data: Dict[str, Any]) -> Optional[str]:
+    """ID сообщения во внешней системе - ключ идемпотентности webhook'а"""
+    try:
+        if integration_type == "telegram":
+            message = data.get("message") or data.get("edited_message") or {}
+            if "message_id" in message:
+                # message_id уникален только в пределах чата
+                return f"{message['chat']['id']}:{message['message_id']}"
+        elif integration_type == "whatsapp":
+            value = data["entry"][0]["changes"][0]["value"]
+            return str(value["messages"][0]["id"])
+        elif integration_type == "olx":
+            message = data.get("message") or {}
+            if message.get("id") is not None:
+                return str(message["id"])
+    except (KeyError, IndexError, TypeError):
+        return None
+    return None
+
+
+async def handle_telegram_webhook(data: Dict[str, Any], integration: Dict[str, Any]) -> None:
+    """Обработка webhook от Telegram: тот же разбор, что и при опросе getUpdates"""
+    await telegram_ingest_service.ingest(integration, [data])
 
 
 async def handle_whatsapp_webhook(data: Dict[str, Any], user_id: str) -> None:
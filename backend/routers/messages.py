@@ -1,20 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from backend.models.message import Message, MessageCreate, MessageResponse
-from backend.services.message_service import MessageService
+from backend.services.deduplication import MessageDeduplicator
+from backend.services.message_service import DuplicateMessageError, MessageService
 from backend.services.client_service import ClientService
 from backend.utils.dependencies import get_user_id
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from backend.routers.clients import activity_buffer, lead_scoring_service
+from backend.routers.analytics import rollup_service, response_metrics_service
+from backend.utils.metrics import metrics_registry
+from backend.database import db
+from backend.settings import get_settings
+
+# Подсказки ИИ подключаются, только если подсистема включена
+suggestion_service = None
+if get_settings().ai_enabled:
+    from backend.routers.ai_assistant import suggestion_service
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
-# Подключение к базе данных
-mongo_url = os.environ["MONGO_URL"]
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ["DB_NAME"]]
-message_service = MessageService(db.messages)
-client_service = ClientService(db.clients)
+# Фильтр повторов общий для сообщений из API и webhook'ов интеграций
+deduplicator = MessageDeduplicator(db.messages)
+metrics_registry.register_collector(deduplicator.render)
+
+message_service = MessageService(
+    db.messages,
+    suggestion_service,
+    rollup_service,
+    response_metrics_service,
+    deduplicator,
+)
+client_service = ClientService(db.clients, activity_buffer=activity_buffer)
 
 
 @router.get("/", response_model=List[Message])
@@ -55,10 +70,20 @@ async def create_message(
     message_data: MessageCreate, user_id: str = Depends(get_user_id)
 ):
     """Создать новое сообщение (обычно от webhook)"""
-    message = await message_service.create_message(message_data, user_id)
-
-    # Обновляем информацию о клиенте
+    # Повторная доставка не должна создавать сообщение и увеличивать счетчик
+    if message_data.integration_id and message_data.external_id:
+        if await message_service.is_duplicate(
+            message_data.integration_id, message_data.external_id
+        ):
+            raise HTTPException(status_code=409, detail="Message already received")
+    try:
+        message = await message_service.create_message(message_data, user_id)
+    except DuplicateMessageError:
+        raise HTTPException(status_code=409, detail="Message already received")
+
+    # Обновляем информацию о клиенте и его приоритет
     await client_service.update_last_message(message_data.client_id, user_id)
+    await lead_scoring_service.rescore_client(message_data.client_id, user_id)
 
     return message
 
@@ -76,8 +101,9 @@ async def send_response(
     # Отправляем ответ
     message = await message_service.send_response(response_data, user_id)
 
-    # Обновляем информацию о клиенте
+    # Обновляем информацию о клиенте и его приоритет
     await client_service.update_last_message(response_data.client_id, user_id)
+    await lead_scoring_service.rescore_client(response_data.client_id, user_id)
 
     return message
 
@@ -0,0 +1,220 @@
+"""
+Отложенная запись активности клиентов (write-behind).
+
+Каждое сообщение обновляет документ клиента: last_message_at, updated_at
+и messages_count. Серия из 20 сообщений в чате - 20 записей в один
+документ. ActivityBuffer копит активность по клиенту в течение окна
+flush_ms и записывает ее одним bulk_write: $max для времени и суммарный
+$inc для счетчика, поэтому порядок и повтор сброса не искажают значения.
+
+Сброс происходит по окну, при max_pending клиентах в буфере и при
+остановке приложения. Чтения, которым нужны точные значения, вызывают
+flush() для продавца или клиента либо накладывают несброшенную
+активность на прочитанный документ (apply).
+"""
+
+from backend.utils.metrics import Histogram, LATENCY_BUCKETS
+from backend.utils.motor import MotorCollection
+from backend.utils.partitioning import current_partition_key
+from dataclasses import dataclass
+from datetime import datetime
+from pymongo import UpdateOne
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Activity:
+    last_message_at: datetime
+    count: int
+    # time.monotonic() первой несброшенной записи - для задержки сброса
+    since: float
+
+
+class ActivityBuffer:
+    def __init__(
+        self,
+        collection: MotorCollection,
+        flush_ms: float = 250.0,
+        max_pending: int = 1000,
+    ):
+        self.collection = collection
+        self.flush_seconds = flush_ms / 1000
+        self.max_pending = max_pending
+
+        # (user_id, client_id) -> накопленная активность
+        self._pending: Dict[Tuple[str, str], _Activity] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._writes: Set[asyncio.Task] = set()
+        self.flush_lag = Histogram(LATENCY_BUCKETS)
+        self._stats: Dict[str, int] = {
+            "recorded": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed": 0,
+        }
+
+    async def record(
+        self, client_id: str, user_id: str, at: Optional[datetime] = None
+    ) -> None:
+        """Добавляет сообщение клиента в буфер"""
+        at = at or datetime.utcnow()
+        key = (user_id, client_id)
+        activity = self._pending.get(key)
+        if activity is None:
+            self._pending[key] = _Activity(at, 1, time.monotonic())
+        else:
+            activity.last_message_at = max(activity.last_message_at, at)
+            activity.count += 1
+        self._stats["recorded"] += 1
+
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def apply(self, document: Dict) -> Dict:
+        """Накладывает несброшенную активность на прочитанный документ клиента"""
+        activity = self._pending.get((document["user_id"], document["id"]))
+        if activity is not None:
+            for field in ("last_message_at", "updated_at"):
+                current = document.get(field)
+                if current is None or current < activity.last_message_at:
+                    document[field] = activity.last_message_at
+            document["messages_count"] = (
+                document.get("messages_count", 0) + activity.count
+            )
+        return document
+
+    async def flush(
+        self, user_id: Optional[str] = None, client_id: Optional[str] = None
+    ) -> int:
+        """
+        Записывает накопленную активность (всю, продавца или клиента) и
+        дожидается уже начатых сбросов; возвращает число клиентов
+        """
+        keys = [
+            key
+            for key in self._pending
+            if (user_id is None or key[0] == user_id)
+            and (client_id is None or key[1] == client_id)
+        ]
+        taken = {key: self._pending.pop(key) for key in keys}
+
+        by_user: Dict[str, List[UpdateOne]] = {}
+        for (owner, client), activity in taken.items():
+            by_user.setdefault(owner, []).append(
+                UpdateOne(
+                    {"id": client, "user_id": owner},
+                    {
+                        "$max": {
+                            "last_message_at": activity.last_message_at,
+                            "updated_at": activity.last_message_at,
+                        },
+                        "$inc": {"messages_count": activity.count},
+                    },
+                )
+            )
+
+        loop = asyncio.get_running_loop()
+        for owner, requests in by_user.items():
+            task = loop.create_task(self._write(owner, requests, taken))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+        # Сброс, начатый таймером, тоже должен завершиться до точного чтения.
+        # asyncio.wait не отменяет запись, если отменят ожидающий запрос
+        if self._writes:
+            await asyncio.wait(list(self._writes))
+        return len(taken)
+
+    async def _write(
+        self,
+        user_id: str,
+        requests: List[UpdateOne],
+        taken: Dict[Tuple[str, str], _Activity],
+    ) -> None:
+        # Задача сброса работает с разделом продавца, а не того запроса,
+        # который ее запустил
+        token = current_partition_key.set(user_id)
+        try:
+            await self.collection.bulk_write(requests, ordered=False)
+        except Exception as e:
+            logger.warning(
+                f"Сброс активности {len(requests)} клиентов продавца {user_id} "
+                f"не удался: {e}"
+            )
+            self._stats["failed"] += len(requests)
+            # Активность возвращается в буфер до следующего сброса
+            for (owner, client), activity in taken.items():
+                if owner == user_id:
+                    self._merge((owner, client), activity)
+            return
+        finally:
+            current_partition_key.reset(token)
+
+        now = time.monotonic()
+        self._stats["flushes"] += 1
+        self._stats["written"] += len(requests)
+        for (owner, _), activity in taken.items():
+            if owner == user_id:
+                self.flush_lag.observe(now - activity.since)
+
+    def _merge(self, key: Tuple[str, str], activity: _Activity) -> None:
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = activity
+        else:
+            current.last_message_at = max(
+                current.last_message_at, activity.last_message_at
+            )
+            current.count += activity.count
+            current.since = min(current.since, activity.since)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_seconds)
+        # Последующие record() запускают новый таймер
+        self._timer = None
+        await self.flush()
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._pending)}
+
+    async def close(self) -> None:
+        """Сбрасывает буфер при остановке приложения"""
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+        if self._pending:
+            logger.error(
+                f"При остановке не записана активность {len(self._pending)} клиентов"
+            )
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP client_activity_pending Clients with buffered activity",
+            "# TYPE client_activity_pending gauge",
+            f"client_activity_pending {len(self._pending)}",
+            "# HELP client_activity_writes_total Buffered activity writes by result",
+            "# TYPE client_activity_writes_total counter",
+            f'client_activity_writes_total{{result="recorded"}} {self._stats["recorded"]}',
+            f'client_activity_writes_total{{result="written"}} {self._stats["written"]}',
+            f'client_activity_writes_total{{result="failed"}} {self._stats["failed"]}',
+            "# HELP client_activity_flush_lag_seconds Time from first buffered message to write",
+            "# TYPE client_activity_flush_lag_seconds histogram",
+        ]
+        lines.extend(
+            self.flush_lag.render(
+                "client_activity_flush_lag_seconds", 'collection="clients"'
+            )
+        )
+        return lines
@@ -0,0 +1,165 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Protocol
+from enum import Enum
+from backend.models.message import MessageIntent
+from backend.services.intent_classifier import IntentClassifier, get_intent_classifier
+from backend.services.listing_analysis import analyze_listings, listing_report
+import asyncio
+
+
+class AITask(str, Enum):
+    SUGGEST_RESPONSE = "suggest_response"
+    CLOSE_DEAL_TIPS = "close_deal_tips"
+    ANALYZE_LISTING = "analyze_listing"
+    CUSTOM_RESPONSE = "custom_response"
+
+
+class AIPrompt(BaseModel):
+    task: AITask
+    text: str = ""  # Последнее сообщение, текст объявления или промпт
+    history: List[str] = []
+    user_id: str = ""
+    intent: Optional[MessageIntent] = None
+
+
+class AICompletion(BaseModel):
+    response: str
+    suggestions: List[str] = []
+
+
+class AIBackend(Protocol):
+    async def complete_batch(self, prompts: List[AIPrompt]) -> List[AICompletion]: ...
+
+
+class LocalTemplateBackend:
+    """
+    Локальный детерминированный бэкенд без сетевых вызовов: шаблоны
+    ответов выбираются по намерению из IntentClassifier. Задержки
+    call_overhead_seconds/item_seconds имитируют стоимость вызова модели
+    для тестов и бенчмарков батчинга.
+    """
+
+    GREETING = "Спасибо за ваш интерес! Товар все еще доступен."
+    MEETING = "Да, можем встретиться для осмотра. Когда вам удобно?"
+    PRICE = "Цена обсуждается. Готовы рассмотреть разумные предложения."
+
+    SUGGESTIONS_BY_INTENT = {
+        MessageIntent.PRICE: PRICE,
+        MessageIntent.MEETING: MEETING,
+        MessageIntent.CONDITION: "Товар в хорошем состоянии, могу прислать дополнительные фото.",
+        MessageIntent.AVAILABILITY: "Да, товар еще доступен.",
+        MessageIntent.DELIVERY: "Можем отправить почтой или курьером, доставку оплачивает покупатель.",
+    }
+
+    CUSTOM_RESPONSES = {
+        MessageIntent.PRICE: "Цена указана в объявлении. Готовы рассмотреть разумные предложения.",
+        MessageIntent.MEETING: "Конечно! Могу показать товар. Когда вам будет удобно встретиться?",
+        MessageIntent.CONDITION: "Товар в отличном состоянии, готов к использованию.",
+        MessageIntent.AVAILABILITY: "Да, объявление актуально, товар в наличии.",
+        MessageIntent.DELIVERY: "Возможна отправка почтой или курьером, стоимость доставки уточню.",
+        MessageIntent.OTHER: "Спасибо за интерес к объявлению! Готов ответить на все ваши вопросы.",
+    }
+
+    # Ниже этой уверенности намерение считаем нераспознанным
+    MIN_INTENT_CONFIDENCE = 0.5
+    INTENT_TASKS = (AITask.SUGGEST_RESPONSE, AITask.CUSTOM_RESPONSE)
+
+    CLOSE_DEAL_TIPS = [
+        "Создайте ощущение срочности: 'Завтра уезжаю, можем встретиться сегодня?'",
+        "Предложите небольшую скидку при быстром решении",
+        "Покажите заинтересованность других покупателей",
+        "Подчеркните уникальные преимущества товара",
+    ]
+
+    def __init__(
+        self,
+        call_overhead_seconds: float = 0.0,
+        item_seconds: float = 0.0,
+        classifier: Optional[IntentClassifier] = None,
+    ):
+        self.call_overhead_seconds = call_overhead_seconds
+        self.item_seconds = item_seconds
+        self.classifier = classifier or get_intent_classifier()
+        self.calls = 0
+
+    async def complete_batch(self, prompts: List[AIPrompt]) -> List[AICompletion]:
+        self.calls += 1
+
+        delay = self.call_overhead_seconds + self.item_seconds * len(prompts)
+        if delay:
+            await asyncio.sleep(delay)
+
+        # Намерения для всего пакета одним вызовом классификатора
+        needs_intent = [
+            p.intent is None and p.task in self.INTENT_TASKS for p in prompts
+        ]
+        predicted = iter(
+            self.classifier.classify_batch(
+                [p.text for p, needed in zip(prompts, needs_intent) if needed],
+                self.MIN_INTENT_CONFIDENCE,
+            )
+        )
+        intents = [
+            (
+                MessageIntent(next(predicted))
+                if needed
+                else p.intent or MessageIntent.OTHER
+            )
+            for p, needed in zip(prompts, needs_intent)
+        ]
+
+        # Объявления из пакета анализируются одним проходом в отдельном потоке
+        listing_prompts = [p for p in prompts if p.task == AITask.ANALYZE_LISTING]
+        reports = iter([])
+        if listing_prompts:
+            items = [
+                {"listing_id": str(i), "listing_text": p.text}
+                for i, p in enumerate(listing_prompts)
+            ]
+            frame = await asyncio.to_thread(analyze_listings, items)
+            reports = iter(listing_report(frame))
+
+        return [
+            (
+                self._analyze_listing(next(reports))
+                if p.task == AITask.ANALYZE_LISTING
+                else self._complete(p, intent)
+            )
+            for p, intent in zip(prompts, intents)
+        ]
+
+    def _complete(self, prompt: AIPrompt, intent: MessageIntent) -> AICompletion:
+        if prompt.task == AITask.SUGGEST_RESPONSE:
+            suggestions = self._suggest_responses(intent)
+            return AICompletion(response=suggestions[0], suggestions=suggestions)
+
+        if prompt.task == AITask.CLOSE_DEAL_TIPS:
+            return AICompletion(
+                response="Вот несколько советов для закрытия сделки:",
+                suggestions=list(self.CLOSE_DEAL_TIPS),
+            )
+
+        return AICompletion(response=self.CUSTOM_RESPONSES[intent])
+
+    def _analyze_listing(self, report: Dict) -> AICompletion:
+        if not report["suggestions"]:
+            return AICompletion(
+                response=f"Объявление выглядит хорошо ({report['score']:.0f}/100)"
+            )
+
+        return AICompletion(
+            response=f"Оценка объявления {report['score']:.0f}/100, можно улучшить:",
+            suggestions=report["suggestions"],
+        )
+
+    def _suggest_responses(self, intent: MessageIntent) -> List[str]:
+        suggestions = [self.GREETING, self.MEETING, self.PRICE]
+
+        # Самый подходящий вариант ставим первым
+        best = self.SUGGESTIONS_BY_INTENT.get(intent)
+        if best:
+            if best in suggestions:
+                suggestions.remove(best)
+            suggestions.insert(0, best)
+
+        return suggestions[:3]
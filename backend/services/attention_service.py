@@ -1,9 +1,11 @@
 from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
 from typing import List, Dict
 from backend.models.message import MessageType
 from datetime import datetime, timedelta
 
 
+@track_queries
 class AttentionService:
     def __init__(
         self,
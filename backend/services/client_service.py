@@ -1,16 +1,43 @@
 from backend.utils.motor import MotorCollection
-from backend.models.client import Client, ClientCreate, ClientUpdate, ClientStatus
+from backend.utils.query_stats import track_queries
+from backend.models.client import (
+    Client,
+    ClientCreate,
+    ClientUpdate,
+    ClientStatus,
+    ClientOrder,
+)
+from backend.services.activity_buffer import ActivityBuffer
+from backend.services.rollup_service import RollupService
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
 
 
+@track_queries
 class ClientService:
-    def __init__(self, collection: MotorCollection):
+    def __init__(
+        self,
+        collection: MotorCollection,
+        rollup_service: Optional[RollupService] = None,
+        activity_buffer: Optional[ActivityBuffer] = None,
+    ):
         self.collection = collection
+        self.rollup_service = rollup_service
+        # Без буфера активность пишется в документ клиента сразу
+        self.activity_buffer = activity_buffer
+
+    async def _sync_activity(self, user_id: str, client_id: Optional[str] = None):
+        """Сбрасывает отложенную активность перед чтением точных значений"""
+        if self.activity_buffer:
+            await self.activity_buffer.flush(user_id, client_id)
 
     async def create_client(self, client_data: ClientCreate, user_id: str) -> Client:
         client = Client(**client_data.model_dump(), user_id=user_id)
-        await self.collection.insert_one(client.model_dump())
+        document = client.model_dump()
+        await self.collection.insert_one(document)
+
+        if self.rollup_service:
+            await self.rollup_service.record_new_clients([document])
         return client
 
     async def get_clients(
@@ -19,19 +46,24 @@ class ClientService:
         status: Optional[ClientStatus] = None,
         source: Optional[str] = None,
         limit: int = 50,
+        order: ClientOrder = ClientOrder.RECENT,
     ) -> List[Client]:
         filter_query = {"user_id": user_id}
+        await self._sync_activity(user_id)
 
         if status:
             filter_query["status"] = status
         if source:
             filter_query["source"] = source
 
-        cursor = self.collection.find(filter_query).sort("updated_at", -1).limit(limit)
+        # Для priority сортировка идет по индексу (user_id, score)
+        sort_field = "score" if order == ClientOrder.PRIORITY else "updated_at"
+        cursor = self.collection.find(filter_query).sort(sort_field, -1).limit(limit)
         clients = await cursor.to_list(length=limit)
         return [Client(**client) for client in clients]
 
     async def get_client(self, client_id: str, user_id: str) -> Optional[Client]:
+        await self._sync_activity(user_id, client_id)
         client = await self.collection.find_one({"id": client_id, "user_id": user_id})
         return Client(**client) if client else None
 
@@ -43,16 +75,29 @@ class ClientService:
         }
         update_dict["updated_at"] = datetime.utcnow()
 
+        # Для агрегатов важен только переход в closed, а не повторное закрытие
+        closing = (
+            self.rollup_service is not None
+            and update_data.status == ClientStatus.CLOSED
+        )
+        previous = await self.get_client(client_id, user_id) if closing else None
+
         result = await self.collection.update_one(
             {"id": client_id, "user_id": user_id}, {"$set": update_dict}
         )
 
         if result.modified_count:
-            return await self.get_client(client_id, user_id)
+            client = await self.get_client(client_id, user_id)
+            if previous and previous.status != ClientStatus.CLOSED and client:
+                await self.rollup_service.record_closed(client.model_dump())
+            return client
         return None
 
     async def update_last_message(self, client_id: str, user_id: str):
         """Обновляет время последнего сообщения и счетчик"""
+        if self.activity_buffer:
+            await self.activity_buffer.record(client_id, user_id)
+            return
         await self.collection.update_one(
             {"id": client_id, "user_id": user_id},
             {
@@ -66,6 +111,7 @@ class ClientService:
 
     async def get_recent_chats(self, user_id: str, limit: int = 10) -> List[Client]:
         """Получает последние активные чаты"""
+        await self._sync_activity(user_id)
         cursor = (
             self.collection.find(
                 {"user_id": user_id, "last_message_at": {"$exists": True}}
@@ -79,6 +125,7 @@ class ClientService:
 
     async def get_dashboard_stats(self, user_id: str) -> Dict:
         """Получает статистику для дашборда"""
+        await self._sync_activity(user_id)
         now = datetime.utcnow()
         day_ago = now - timedelta(hours=24)
 
@@ -0,0 +1,127 @@
+"""
+Идемпотентный прием сообщений из интеграций.
+
+Telegram и WhatsApp повторяют webhook при таймауте, поэтому сообщение
+интеграции идентифицируется парой (integration_id, external_id) с
+уникальным индексом в messages. Перед индексом стоит фильтр Блума
+воркера: промах фильтра означает, что воркер этот ключ не видел, и
+сообщение сразу пишется без предварительного чтения. Попадание
+проверяется точечным запросом по индексу - ложное срабатывание фильтра
+не должно терять сообщение клиента. Повторы, пришедшие в другой воркер
+или после перезапуска, отсекает уникальный индекс при вставке.
+
+Фильтр ротируется: при заполнении текущего он становится предыдущим, и
+проверяются оба - память ограничена, недавние ключи не забываются.
+"""
+
+from backend.utils.motor import MotorCollection
+from typing import Dict, List
+import hashlib
+import math
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Двойное хеширование: k позиций из двух 64-битных хешей
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class MessageDeduplicator:
+    def __init__(
+        self,
+        collection: MotorCollection,
+        capacity: int = 500_000,
+        error_rate: float = 0.001,
+    ):
+        self.collection = collection
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(1, error_rate)
+        self.results: Dict[str, int] = {
+            "new": 0,
+            "filter": 0,
+            "index": 0,
+            "false_positive": 0,
+        }
+
+    async def ensure_indexes(self) -> None:
+        """Уникальность сообщения интеграции; импортированные не затрагиваются"""
+        await self.collection.create_index(
+            [("integration_id", 1), ("external_id", 1)],
+            unique=True,
+            partialFilterExpression={
+                "integration_id": {"$type": "string"},
+                "external_id": {"$type": "string"},
+            },
+        )
+
+    @staticmethod
+    def _key(integration_id: str, external_id: str) -> str:
+        return f"{integration_id}\x00{external_id}"
+
+    def _maybe_seen(self, key: str) -> bool:
+        return key in self._current or key in self._previous
+
+    async def is_duplicate(self, integration_id: str, external_id: str) -> bool:
+        """Проверка до обработки: чтение из базы только при попадании фильтра"""
+        if not self._maybe_seen(self._key(integration_id, external_id)):
+            self.results["new"] += 1
+            return False
+
+        existing = await self.collection.find_one(
+            {"integration_id": integration_id, "external_id": external_id},
+            {"_id": 1},
+        )
+        if existing is None:
+            self.results["false_positive"] += 1
+            return False
+        self.results["filter"] += 1
+        return True
+
+    def remember(self, integration_id: str, external_id: str) -> None:
+        """Ключ сохраненного сообщения (или отсеченного индексом повтора)"""
+        if self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        self._current.add(self._key(integration_id, external_id))
+
+    def index_hit(self, integration_id: str, external_id: str) -> None:
+        """Повтор, который фильтр пропустил, отсек уникальный индекс"""
+        self.results["index"] += 1
+        self.remember(integration_id, external_id)
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP message_dedupe_total Integration message dedupe checks by result",
+            "# TYPE message_dedupe_total counter",
+        ]
+        for result, count in self.results.items():
+            lines.append(f'message_dedupe_total{{result="{result}"}} {count}')
+        lines += [
+            "# HELP message_dedupe_filter_keys Keys in the current Bloom filter",
+            "# TYPE message_dedupe_filter_keys gauge",
+            f"message_dedupe_filter_keys {self._current.count}",
+        ]
+        return lines
@@ -0,0 +1,234 @@
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from backend.models.client import Client
+from backend.models.message import Message
+from pydantic import BaseModel
+from typing import AsyncIterator, Dict, List, Optional, Type, get_args
+from datetime import datetime
+from enum import Enum
+import csv
+import io
+import json
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+# Для каждой коллекции: модель строк и поле даты для фильтрации
+EXPORT_SCHEMAS: Dict[str, tuple] = {
+    "clients": (Client, "created_at"),
+    "messages": (Message, "timestamp"),
+}
+
+
+@track_queries
+class ExportService:
+    """Потоковая выгрузка коллекций с постоянным расходом памяти"""
+
+    def __init__(self, collections: Dict[str, MotorCollection], batch_size: int = 1000):
+        self.collections = collections
+        self.batch_size = batch_size
+
+    async def stream(
+        self,
+        kind: str,
+        user_id: str,
+        export_format: ExportFormat,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        source: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        model, date_field = EXPORT_SCHEMAS[kind]
+
+        filter_query: Dict = {"user_id": user_id}
+        if source:
+            filter_query["source"] = source
+        if date_from or date_to:
+            filter_query[date_field] = {}
+            if date_from:
+                filter_query[date_field]["$gte"] = date_from
+            if date_to:
+                filter_query[date_field]["$lt"] = date_to
+
+        cursor = (
+            self.collections[kind]
+            .find(filter_query, {"_id": 0})
+            .sort(date_field, 1)
+            .batch_size(self.batch_size)
+        )
+
+        writer = _WRITERS[export_format](model)
+        async for batch in self._batches(cursor):
+            chunk = writer.write(batch)
+            if chunk:
+                yield chunk
+
+        tail = writer.close()
+        if tail:
+            yield tail
+
+    async def _batches(self, cursor) -> AsyncIterator[List[Dict]]:
+        batch: List[Dict] = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class _CSVWriter:
+    def __init__(self, model: Type[BaseModel]):
+        self.columns = list(model.model_fields)
+        self._header_written = False
+
+    def write(self, batch: List[Dict]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, self.columns, extrasaction="ignore")
+        if not self._header_written:
+            writer.writeheader()
+            self._header_written = True
+        for document in batch:
+            writer.writerow({k: _plain(document.get(k)) for k in self.columns})
+        return buffer.getvalue().encode()
+
+    def close(self) -> bytes:
+        # Пустая выгрузка все равно содержит заголовок
+        return b"" if self._header_written else self.write([])
+
+
+class _NDJSONWriter:
+    def __init__(self, model: Type[BaseModel]):
+        self.columns = list(model.model_fields)
+
+    def write(self, batch: List[Dict]) -> bytes:
+        lines = [
+            json.dumps(
+                {k: _plain(document.get(k)) for k in self.columns}, ensure_ascii=False
+            )
+            for document in batch
+        ]
+        return ("\n".join(lines) + "\n").encode() if lines else b""
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ChunkSink:
+    """Файловый объект для ParquetWriter: отдает накопленные байты по частям"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _ParquetWriter:
+    """Каждая пачка документов становится отдельной row group"""
+
+    def __init__(self, model: Type[BaseModel]):
+        import pyarrow as pa  # опциональная зависимость
+
+        self.columns = list(model.model_fields)
+        self.schema = pa.schema(
+            [
+                (name, _arrow_type(field.annotation))
+                for name, field in model.model_fields.items()
+            ]
+        )
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    def write(self, batch: List[Dict]) -> bytes:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        frame = pd.DataFrame(
+            [
+                {k: _plain_scalar(document.get(k)) for k in self.columns}
+                for document in batch
+            ],
+            columns=self.columns,
+        )
+        table = pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._sink, self.schema)
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        if self._writer is None:
+            # Пустая выгрузка: файл только со схемой
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self._sink, self.schema)
+        self._writer.close()
+        return self._sink.drain()
+
+
+def _plain_scalar(value):
+    """Как _plain, но даты остаются датами для колонок timestamp"""
+    return value if isinstance(value, datetime) else _plain(value)
+
+
+def _arrow_type(annotation):
+    import pyarrow as pa
+
+    types = [t for t in (get_args(annotation) or (annotation,)) if t is not type(None)]
+    base = types[0] if types else str
+
+    if base is datetime:
+        return pa.timestamp("us")
+    if base is bool:
+        return pa.bool_()
+    if base is int:
+        return pa.int64()
+    if base is float:
+        return pa.float64()
+    return pa.string()
+
+
+_WRITERS = {
+    ExportFormat.CSV: _CSVWriter,
+    ExportFormat.NDJSON: _NDJSONWriter,
+    ExportFormat.PARQUET: _ParquetWriter,
+}
@@ -0,0 +1,418 @@
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from backend.utils.partitioning import bind_user
+from backend.models.client import Client, ClientCreate
+from backend.models.message import Message
+from backend.services.rollup_service import RollupService
+from backend.models.import_job import (
+    ImportJob,
+    ImportKind,
+    ImportFormat,
+    ImportStatus,
+    MessageImportRow,
+)
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import csv
+import itertools
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_ERRORS = 100
+
+
+@track_queries
+class ImportService:
+    """
+    Потоковый импорт клиентов и сообщений из CSV/JSONL.
+    Файл читается построчно и пишется пачками по chunk_size строк;
+    после каждой пачки в задаче сохраняется чекпоинт для продолжения.
+    """
+
+    def __init__(
+        self,
+        job_collection: MotorCollection,
+        client_collection: MotorCollection,
+        message_collection: MotorCollection,
+        upload_dir: Path,
+        chunk_size: int = 1000,
+        lease_seconds: float = 60.0,
+        rollup_service: Optional[RollupService] = None,
+    ):
+        self.job_collection = job_collection
+        self.client_collection = client_collection
+        self.message_collection = message_collection
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.rollup_service = rollup_service
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_indexes(self) -> None:
+        """Индексы для дедупликации импортируемых записей"""
+        has_external_id = {"external_id": {"$type": "string"}}
+        await self.client_collection.create_index(
+            [("user_id", 1), ("external_id", 1)],
+            partialFilterExpression=has_external_id,
+        )
+        await self.client_collection.create_index([("user_id", 1), ("phone", 1)])
+        await self.message_collection.create_index(
+            [("user_id", 1), ("external_id", 1)],
+            partialFilterExpression=has_external_id,
+        )
+
+    async def create_job(
+        self,
+        user_id: str,
+        kind: ImportKind,
+        import_format: ImportFormat,
+        chunks: AsyncIterator[bytes],
+        filename: Optional[str] = None,
+    ) -> ImportJob:
+        """Сохраняет загружаемый файл на диск и запускает задачу импорта"""
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        job = ImportJob(
+            kind=kind,
+            format=import_format,
+            filename=filename,
+            file_path="",
+            user_id=user_id,
+        )
+        job.file_path = str(self.upload_dir / f"{job.id}.{import_format.value}")
+
+        with open(job.file_path, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+
+        await self.job_collection.insert_one(job.model_dump())
+        self.start(job.id, user_id)
+        return job
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[ImportJob]:
+        job = await self.job_collection.find_one({"id": job_id, "user_id": user_id})
+        return ImportJob(**job) if job else None
+
+    async def get_jobs(self, user_id: str, limit: int = 20) -> List[ImportJob]:
+        cursor = (
+            self.job_collection.find({"user_id": user_id})
+            .sort("created_at", -1)
+            .limit(limit)
+        )
+        jobs = await cursor.to_list(length=limit)
+        return [ImportJob(**job) for job in jobs]
+
+    def start(self, job_id: str, user_id: str) -> bool:
+        """Запускает (или продолжает с чекпоинта) задачу в фоне"""
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            return False
+
+        task = asyncio.get_running_loop().create_task(self.run(job_id, user_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return True
+
+    async def resume_interrupted(self) -> int:
+        """Продолжает прерванные задачи; задачи с действующей арендой пропускаются"""
+        jobs = await self.job_collection.find(
+            {
+                "status": {
+                    "$in": [ImportStatus.PENDING.value, ImportStatus.RUNNING.value]
+                }
+            }
+        ).to_list(length=None)
+        for job in jobs:
+            self.start(job["id"], job["user_id"])
+        return len(jobs)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, job_id: str, user_id: str) -> None:
+        # Задача работает в разделе данных продавца, в том числе после рестарта
+        bind_user(user_id)
+        job = await self.get_job(job_id, user_id)
+        if job is None or job.status == ImportStatus.COMPLETED:
+            return
+
+        # Аренда задачи: другой воркер не возьмет ее, пока аренда не истекла
+        now = datetime.utcnow()
+        claimed = await self.job_collection.update_one(
+            {
+                "id": job_id,
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {
+                "$set": {
+                    "status": ImportStatus.RUNNING.value,
+                    "lease_until": self._lease_deadline(),
+                    "updated_at": now,
+                }
+            },
+        )
+        if not claimed.modified_count:
+            return
+
+        try:
+            rows = _read_rows(Path(job.file_path), job.format)
+            rows = itertools.islice(rows, job.rows_processed, None)
+            row_number = job.rows_processed
+
+            while True:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+
+                numbered = list(enumerate(chunk, start=row_number + 1))
+                row_number += len(chunk)
+
+                if job.kind == ImportKind.CLIENTS:
+                    written, errors = await self._import_clients(numbered, user_id)
+                else:
+                    written, errors = await self._import_messages(numbered, user_id)
+
+                await self._checkpoint(job_id, row_number, written, errors)
+
+            await self._update_job(
+                job_id,
+                {
+                    "status": ImportStatus.COMPLETED.value,
+                    "finished_at": datetime.utcnow(),
+                    "lease_until": None,
+                },
+            )
+            Path(job.file_path).unlink(missing_ok=True)
+        except asyncio.CancelledError:
+            # Задача останется в статусе running и продолжится при следующем старте
+            raise
+        except Exception as e:
+            logger.warning(f"Import job {job_id} failed: {e}")
+            await self._update_job(
+                job_id,
+                {
+                    "status": ImportStatus.FAILED.value,
+                    "last_error": str(e),
+                    "lease_until": None,
+                },
+            )
+
+    async def _import_clients(
+        self, rows: List[Tuple[int, Dict]], user_id: str
+    ) -> Tuple[int, List[Dict]]:
+        requests = []
+        request_rows = []
+        clients = []
+        errors = []
+
+        for number, row in rows:
+            try:
+                data = ClientCreate(**_clean(row))
+            except (ValidationError, ValueError) as e:
+                errors.append({"row": number, "error": _short_error(e)})
+                continue
+
+            request_rows.append(number)
+
+            client = Client(**data.model_dump(), user_id=user_id).model_dump()
+            clients.append(client)
+
+            # Дедупликация по внешнему ID, затем по телефону
+            if data.external_id:
+                key = {"user_id": user_id, "external_id": data.external_id}
+            elif data.phone:
+                key = {"user_id": user_id, "phone": data.phone}
+            else:
+                requests.append(InsertOne(client))
+                continue
+
+            fields = {k: v for k, v in data.model_dump().items() if v is not None}
+            fields["updated_at"] = client["updated_at"]
+            on_insert = {k: v for k, v in client.items() if k not in fields}
+            requests.append(
+                UpdateOne(key, {"$set": fields, "$setOnInsert": on_insert}, upsert=True)
+            )
+
+        written, write_errors, inserted = await self._bulk_write(
+            self.client_collection, requests, request_rows
+        )
+        if self.rollup_service and inserted:
+            await self.rollup_service.record_new_clients(
+                [clients[i] for i in sorted(inserted)]
+            )
+        return written, errors + write_errors
+
+    async def _import_messages(
+        self, rows: List[Tuple[int, Dict]], user_id: str
+    ) -> Tuple[int, List[Dict]]:
+        requests = []
+        request_rows = []
+        messages = []
+        errors = []
+
+        for number, row in rows:
+            try:
+                data = MessageImportRow(**_clean(row))
+            except (ValidationError, ValueError) as e:
+                errors.append({"row": number, "error": _short_error(e)})
+                continue
+
+            message = Message(
+                **data.model_dump(exclude_none=True), user_id=user_id
+            ).model_dump()
+            messages.append(message)
+            request_rows.append(number)
+
+            if data.external_id:
+                # Повторный импорт того же сообщения ничего не меняет
+                requests.append(
+                    UpdateOne(
+                        {"user_id": user_id, "external_id": data.external_id},
+                        {"$setOnInsert": message},
+                        upsert=True,
+                    )
+                )
+            else:
+                requests.append(InsertOne(message))
+
+        written, write_errors, inserted = await self._bulk_write(
+            self.message_collection, requests, request_rows
+        )
+        new_messages = [messages[i] for i in sorted(inserted)]
+        await self._update_client_activity(new_messages, user_id)
+        if self.rollup_service and new_messages:
+            await self.rollup_service.record_messages(new_messages)
+        return written, errors + write_errors
+
+    async def _update_client_activity(self, messages: List[Dict], user_id: str) -> None:
+        """Счетчики и время последнего сообщения клиентов одним bulk_write"""
+        activity: Dict[str, Tuple[int, datetime]] = {}
+        for message in messages:
+            count, last_at = activity.get(
+                message["client_id"], (0, message["timestamp"])
+            )
+            activity[message["client_id"]] = (
+                count + 1,
+                max(last_at, message["timestamp"]),
+            )
+
+        requests = [
+            UpdateOne(
+                {"id": client_id, "user_id": user_id},
+                {
+                    "$inc": {"messages_count": count},
+                    "$max": {"last_message_at": last_at, "updated_at": last_at},
+                },
+            )
+            for client_id, (count, last_at) in activity.items()
+        ]
+        if requests:
+            await self.client_collection.bulk_write(requests, ordered=False)
+
+    async def _bulk_write(
+        self, collection: MotorCollection, requests: List, request_rows: List[int]
+    ) -> Tuple[int, List[Dict], set]:
+        """
+        Неупорядоченная запись пачки. Возвращает число записанных документов,
+        ошибки по строкам файла и индексы операций, создавших новый документ.
+        """
+        if not requests:
+            return 0, [], set()
+
+        try:
+            result = await collection.bulk_write(requests, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+
+        write_errors = details.get("writeErrors", [])
+        failed = {error["index"] for error in write_errors}
+        inserted = {
+            i
+            for i, request in enumerate(requests)
+            if isinstance(request, InsertOne) and i not in failed
+        }
+        inserted |= {upsert["index"] for upsert in details.get("upserted", [])}
+
+        written = (
+            details.get("nInserted", 0)
+            + details.get("nUpserted", 0)
+            + details.get("nModified", 0)
+        )
+        errors = [
+            {"row": request_rows[error["index"]], "error": error.get("errmsg", "")}
+            for error in write_errors
+        ]
+        return written, errors, inserted
+
+    async def _checkpoint(
+        self, job_id: str, rows_processed: int, written: int, errors: List[Dict]
+    ) -> None:
+        update: Dict = {
+            "$set": {
+                "rows_processed": rows_processed,
+                "lease_until": self._lease_deadline(),
+                "updated_at": datetime.utcnow(),
+            },
+            "$inc": {"rows_written": written, "rows_failed": len(errors)},
+        }
+        if errors:
+            update["$push"] = {
+                "errors": {
+                    "$each": errors[-MAX_STORED_ERRORS:],
+                    "$slice": -MAX_STORED_ERRORS,
+                }
+            }
+        await self.job_collection.update_one({"id": job_id}, update)
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def _update_job(self, job_id: str, fields: Dict) -> None:
+        fields["updated_at"] = datetime.utcnow()
+        await self.job_collection.update_one({"id": job_id}, {"$set": fields})
+
+
+def _read_rows(path: Path, import_format: ImportFormat) -> Iterator[Dict]:
+    """Построчное чтение файла; в памяти держится только текущая строка"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if import_format == ImportFormat.CSV:
+            yield from csv.DictReader(f)
+            return
+
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = {_PARSE_ERROR: f"Invalid JSON: {e}"}
+            yield row if isinstance(row, dict) else {_PARSE_ERROR: "Expected object"}
+
+
+_PARSE_ERROR = "__parse_error__"
+
+
+def _clean(row: Dict) -> Dict:
+    """Пустые ячейки CSV считаются отсутствующими значениями"""
+    if _PARSE_ERROR in row:
+        raise ValueError(row[_PARSE_ERROR])
+    return {k: v for k, v in row.items() if k and v not in ("", None)}
+
+
+def _short_error(error: Exception) -> str:
+    if not isinstance(error, ValidationError):
+        return str(error)
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
@@ -0,0 +1,179 @@
+from backend.services.ai_backend import AIBackend, AIPrompt, AICompletion
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Очередь инференса переполнена"""
+
+
+class InferenceScheduler:
+    """
+    Микро-батчинг запросов к модели: копит запросы до max_wait_ms или
+    max_batch_size штук, выполняет их одним вызовом бэкенда и раздает
+    результаты. Пакет собирается по очереди из очередей пользователей,
+    чтобы один активный продавец не вытеснял остальных.
+    """
+
+    def __init__(
+        self,
+        backend: AIBackend,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        max_queue_depth: int = 1000,
+        timeout_seconds: float = 30.0,
+        max_concurrent_batches: int = 2,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.max_queue_depth = max_queue_depth
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queues: "OrderedDict[str, Deque[Tuple[AIPrompt, asyncio.Future]]]" = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self._stats: Dict[str, int] = {
+            "batches": 0,
+            "items": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "failed": 0,
+        }
+
+    async def submit(self, prompt: AIPrompt) -> AICompletion:
+        """Ставит запрос в очередь и ждет результат пакета"""
+        if self._size >= self.max_queue_depth:
+            self._stats["rejected"] += 1
+            raise QueueFullError("Inference queue is full")
+
+        self._ensure_worker()
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(prompt.user_id, deque()).append((prompt, future))
+        self._size += 1
+        self._wakeup.set()
+
+        try:
+            return await asyncio.wait_for(future, self.timeout_seconds)
+        except asyncio.TimeoutError:
+            # Отмененный future будет пропущен при сборке пакета
+            self._stats["timed_out"] += 1
+            raise
+
+    async def complete_batch(self, prompts: List[AIPrompt]) -> List[AICompletion]:
+        """Совместимость с AIBackend: планировщик можно передать вместо бэкенда"""
+        return list(await asyncio.gather(*(self.submit(p) for p in prompts)))
+
+    def queue_depth(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, float]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "queue_depth": self._size,
+            "avg_batch_size": self._stats["items"] / batches if batches else 0.0,
+        }
+
+    async def close(self) -> None:
+        """Останавливает обработку и отменяет ожидающие запросы"""
+        tasks = list(self._running)
+        if self._worker:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for queue in self._queues.values():
+            for _, future in queue:
+                if not future.done():
+                    future.cancel()
+        self._queues.clear()
+        self._size = 0
+        self._worker = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self._wakeup.wait()
+
+            # Окно сбора пакета
+            deadline = loop.time() + self.max_wait_seconds
+            while self._size < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            batch = self._take_batch()
+            if not self._size:
+                self._wakeup.clear()
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = loop.create_task(self._execute(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    def _take_batch(self) -> List[Tuple[AIPrompt, asyncio.Future]]:
+        """Берет по одному запросу от каждого пользователя по кругу"""
+        batch: List[Tuple[AIPrompt, asyncio.Future]] = []
+
+        while self._queues and len(batch) < self.max_batch_size:
+            user_id, queue = next(iter(self._queues.items()))
+            prompt, future = queue.popleft()
+            self._size -= 1
+
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+
+            if not future.done():
+                batch.append((prompt, future))
+
+        return batch
+
+    async def _execute(self, batch: List[Tuple[AIPrompt, asyncio.Future]]) -> None:
+        try:
+            results = await self.backend.complete_batch([p for p, _ in batch])
+        except Exception as e:
+            logger.warning(f"Inference batch of {len(batch)} failed: {e}")
+            self._stats["failed"] += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self._stats["batches"] += 1
+        self._stats["items"] += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,193 @@
+from backend.models.message import MessageIntent
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import csv
+import os
+import re
+
+import numpy as np
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "intents.csv"
+
+_NON_LETTERS = re.compile(r"[^0-9a-zа-я]+")
+_HASH_MULTIPLIER = np.uint64(1000003)
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, ё -> е, все кроме букв и цифр -> пробел"""
+    text = text.lower().replace("ё", "е")
+    return " " + _NON_LETTERS.sub(" ", text).strip() + " "
+
+
+class IntentClassifier:
+    """
+    Наивный байесовский классификатор намерений по хэшированным
+    символьным n-граммам. Веса хранятся в NumPy-массивах, признаки для
+    всего пакета считаются одним проходом без циклов по текстам.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        feature_log_prob: np.ndarray,
+        class_log_prior: np.ndarray,
+        ngram_range: Tuple[int, int] = (3, 5),
+    ):
+        self.labels = list(labels)
+        self.feature_log_prob = feature_log_prob.astype(np.float32)
+        self.class_log_prior = class_log_prior.astype(np.float32)
+        self.ngram_range = ngram_range
+        self.n_features = feature_log_prob.shape[0]
+        self._label_array = np.array(self.labels, dtype=object)
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        n_features: int = 2**16,
+        alpha: float = 0.1,
+        ngram_range: Tuple[int, int] = (3, 5),
+    ) -> "IntentClassifier":
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        y = np.array([class_index[label] for label in labels], dtype=np.int64)
+
+        features, doc_ids = hash_ngrams(texts, n_features, ngram_range)
+
+        counts = np.zeros((n_features, len(classes)), dtype=np.float64)
+        np.add.at(counts, (features, y[doc_ids]), 1.0)
+
+        smoothed = counts + alpha
+        feature_log_prob = np.log(smoothed / smoothed.sum(axis=0, keepdims=True))
+        class_log_prior = np.log(np.bincount(y, minlength=len(classes)) / len(y))
+
+        return cls(classes, feature_log_prob, class_log_prior, ngram_range)
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentClassifier":
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            [str(label) for label in data["labels"]],
+            data["feature_log_prob"],
+            data["class_log_prior"],
+            tuple(int(n) for n in data["ngram_range"]),
+        )
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            feature_log_prob=self.feature_log_prob,
+            class_log_prior=self.class_log_prior,
+            ngram_range=np.array(self.ngram_range),
+        )
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Вероятности классов, массив (len(texts), len(labels))"""
+        scores = np.tile(self.class_log_prior, (len(texts), 1))
+        if not len(texts):
+            return scores
+
+        features, doc_ids = hash_ngrams(texts, self.n_features, self.ngram_range)
+        if len(features):
+            # doc_ids отсортированы, поэтому суммируем сегменты через reduceat
+            weights = self.feature_log_prob[features]
+            starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+            scores[doc_ids[starts]] += np.add.reduceat(weights, starts, axis=0)
+
+        scores -= scores.max(axis=1, keepdims=True)
+        proba = np.exp(scores)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def classify_batch(
+        self, texts: Sequence[str], min_confidence: float = 0.0
+    ) -> List[str]:
+        """Метки намерений для пакета сообщений"""
+        proba = self.predict_proba(texts)
+        if not len(proba):
+            return []
+
+        best = proba.argmax(axis=1)
+        labels = self._label_array[best]
+        if min_confidence > 0:
+            uncertain = proba[np.arange(len(best)), best] < min_confidence
+            labels[uncertain] = MessageIntent.OTHER.value
+        return labels.tolist()
+
+    def classify(self, text: str, min_confidence: float = 0.0) -> str:
+        return self.classify_batch([text], min_confidence)[0]
+
+
+def hash_ngrams(
+    texts: Sequence[str], n_features: int, ngram_range: Tuple[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Хэши символьных n-грамм всех текстов пакета.
+    Возвращает индексы признаков и номер текста для каждой n-граммы.
+    """
+    normalized = [normalize(text) for text in texts]
+    lengths = np.fromiter(
+        (len(t) for t in normalized), dtype=np.int64, count=len(texts)
+    )
+    codes = np.frombuffer("".join(normalized).encode("utf-32-le"), dtype=np.uint32)
+    codes = codes.astype(np.uint64)
+    char_doc = np.repeat(np.arange(len(texts)), lengths)
+
+    all_features = []
+    all_docs = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        count = len(codes) - n + 1
+        if count <= 0:
+            continue
+
+        # n-грамма не должна пересекать границу соседних текстов
+        valid = char_doc[:count] == char_doc[n - 1 :]
+
+        h = np.full(count, n, dtype=np.uint64)
+        for k in range(n):
+            h = (h * _HASH_MULTIPLIER) ^ codes[k : k + count]
+        h ^= h >> np.uint64(29)
+
+        all_features.append((h[valid] % np.uint64(n_features)).astype(np.int64))
+        all_docs.append(char_doc[:count][valid])
+
+    if not all_features:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    features = np.concatenate(all_features)
+    doc_ids = np.concatenate(all_docs)
+    order = np.argsort(doc_ids, kind="stable")
+    return features[order], doc_ids[order]
+
+
+def load_training_data(path: Path = DATA_PATH) -> Tuple[List[str], List[str]]:
+    with open(path, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    return [row["text"] for row in rows], [row["intent"] for row in rows]
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """
+    Общий экземпляр классификатора. Загружается из INTENT_MODEL_PATH,
+    если файл указан, иначе обучается на встроенных данных.
+    """
+    global _classifier
+    if _classifier is None:
+        model_path = os.environ.get("INTENT_MODEL_PATH")
+        if model_path and Path(model_path).exists():
+            _classifier = IntentClassifier.load(Path(model_path))
+        else:
+            _classifier = IntentClassifier.train(*load_training_data())
+    return _classifier
+
+
+if __name__ == "__main__":
+    import sys
+
+    output = Path(sys.argv[1] if len(sys.argv) > 1 else "intent_model.npz")
+    get_intent_classifier().save(output)
+    print(f"Saved intent model to {output}")
@@ -0,0 +1,235 @@
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from backend.models.client import ClientStatus
+from backend.models.message import MessageIntent, MessageType
+from backend.services.activity_buffer import ActivityBuffer
+from backend.services.intent_classifier import IntentClassifier
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+from datetime import datetime
+
+import numpy as np
+
+# Вклад каждого признака в итоговую оценку (в сумме 100)
+WEIGHTS = {
+    "engagement": 20.0,
+    "awaiting_reply": 25.0,
+    "intent": 20.0,
+    "source": 5.0,
+    "listing_price": 10.0,
+    "recency": 20.0,
+}
+
+INTENT_WEIGHTS = {
+    MessageIntent.PRICE.value: 1.0,
+    MessageIntent.MEETING.value: 1.0,
+    MessageIntent.AVAILABILITY.value: 0.8,
+    MessageIntent.DELIVERY.value: 0.8,
+    MessageIntent.CONDITION.value: 0.6,
+    MessageIntent.OTHER.value: 0.2,
+}
+
+SOURCE_WEIGHTS = {"olx": 1.0, "telegram": 0.8, "whatsapp": 0.8}
+
+
+def score_leads(
+    messages_count: np.ndarray,
+    hours_since_message: np.ndarray,
+    hours_waiting: np.ndarray,
+    intent_weight: np.ndarray,
+    source_weight: np.ndarray,
+    listing_price: np.ndarray,
+    closed: np.ndarray,
+) -> np.ndarray:
+    """
+    Оценка приоритета 0..100 для массива клиентов.
+    hours_waiting — сколько часов последнее входящее ждет ответа (NaN, если отвечено).
+    """
+    engagement = np.minimum(np.log1p(messages_count) / np.log1p(20), 1.0)
+    recency = np.exp(-np.nan_to_num(hours_since_message, nan=np.inf) / 24)
+
+    # Неотвеченный клиент быстро становится срочным, но через несколько
+    # дней ожидания его приоритет снова снижается
+    waiting = np.nan_to_num(hours_waiting, nan=-1.0)
+    awaiting = np.where(
+        waiting >= 0, (1 - np.exp(-waiting)) * np.exp(-waiting / 72), 0.0
+    )
+
+    price = np.minimum(np.log10(np.nan_to_num(listing_price, nan=0.0) + 1) / 5, 1.0)
+
+    score = (
+        WEIGHTS["engagement"] * engagement
+        + WEIGHTS["awaiting_reply"] * awaiting
+        + WEIGHTS["intent"] * intent_weight
+        + WEIGHTS["source"] * source_weight
+        + WEIGHTS["listing_price"] * price
+        + WEIGHTS["recency"] * recency
+    )
+    return np.where(closed, 0.0, np.round(score, 2))
+
+
+@track_queries
+class LeadScoringService:
+    def __init__(
+        self,
+        client_collection: MotorCollection,
+        message_collection: MotorCollection,
+        listing_collection: MotorCollection,
+        classifier: IntentClassifier,
+        activity_buffer: Optional[ActivityBuffer] = None,
+    ):
+        self.client_collection = client_collection
+        self.message_collection = message_collection
+        self.listing_collection = listing_collection
+        self.classifier = classifier
+        self.activity_buffer = activity_buffer
+
+    async def ensure_indexes(self) -> None:
+        """Индекс для выдачи клиентов по приоритету без сортировки в памяти"""
+        await self.client_collection.create_index([("user_id", 1), ("score", -1)])
+
+    async def rescore_user(self, user_id: str) -> int:
+        """Пересчитывает оценки всех клиентов пользователя одним пакетом"""
+        if self.activity_buffer:
+            await self.activity_buffer.flush(user_id)
+        clients = await self.client_collection.find({"user_id": user_id}).to_list(
+            length=None
+        )
+        return await self._rescore(user_id, clients)
+
+    async def rescore_client(self, client_id: str, user_id: str) -> Optional[float]:
+        """Инкрементальное обновление оценки после нового сообщения"""
+        client = await self.client_collection.find_one(
+            {"id": client_id, "user_id": user_id}
+        )
+        if not client:
+            return None
+        if self.activity_buffer:
+            # Пересчет идет после каждого сообщения: несброшенная активность
+            # учитывается без записи, чтобы не терять объединение записей
+            self.activity_buffer.apply(client)
+
+        await self._rescore(user_id, [client], client_id=client_id)
+        return client["score"]
+
+    async def _rescore(
+        self, user_id: str, clients: List[Dict], client_id: Optional[str] = None
+    ) -> int:
+        if not clients:
+            return 0
+
+        activity = await self._message_activity(user_id, client_id)
+        prices = await self._listing_prices(
+            user_id, {c["listing_id"] for c in clients if c.get("listing_id")}
+        )
+
+        now = datetime.utcnow()
+        stats = [activity.get(c["id"], {}) for c in clients]
+
+        last_contents = [s.get("last_incoming_content", "") for s in stats]
+        intents = self.classifier.classify_batch(last_contents, min_confidence=0.5)
+
+        scores = score_leads(
+            messages_count=np.array(
+                [c.get("messages_count", 0) for c in clients], dtype=float
+            ),
+            hours_since_message=_hours_since(
+                [c.get("last_message_at") for c in clients], now
+            ),
+            hours_waiting=_hours_since([_unanswered_since(s) for s in stats], now),
+            intent_weight=np.array(
+                [
+                    INTENT_WEIGHTS[i] if s.get("last_incoming_content") else 0.0
+                    for i, s in zip(intents, stats)
+                ]
+            ),
+            source_weight=np.array(
+                [SOURCE_WEIGHTS.get(c.get("source"), 0.5) for c in clients]
+            ),
+            listing_price=np.array(
+                [prices.get(c.get("listing_id"), np.nan) for c in clients],
+                dtype=float,
+            ),
+            closed=np.array(
+                [c.get("status") == ClientStatus.CLOSED.value for c in clients]
+            ),
+        )
+
+        requests = []
+        for client, score in zip(clients, scores.tolist()):
+            client["score"] = score
+            requests.append(
+                UpdateOne(
+                    {"id": client["id"], "user_id": user_id},
+                    {"$set": {"score": score}},
+                )
+            )
+        await self.client_collection.bulk_write(requests, ordered=False)
+        return len(requests)
+
+    async def _message_activity(
+        self, user_id: str, client_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """Последнее входящее и последнее исходящее сообщение по клиентам"""
+        match: Dict = {"user_id": user_id}
+        if client_id:
+            match["client_id"] = client_id
+
+        activity: Dict[str, Dict] = {}
+
+        incoming = [
+            {"$match": {**match, "message_type": MessageType.INCOMING.value}},
+            {"$sort": {"timestamp": 1}},
+            {
+                "$group": {
+                    "_id": "$client_id",
+                    "last_incoming_at": {"$last": "$timestamp"},
+                    "last_incoming_content": {"$last": "$content"},
+                }
+            },
+        ]
+        async for row in self.message_collection.aggregate(incoming):
+            activity.setdefault(row["_id"], {}).update(row)
+
+        outgoing = [
+            {"$match": {**match, "message_type": MessageType.OUTGOING.value}},
+            {
+                "$group": {
+                    "_id": "$client_id",
+                    "last_outgoing_at": {"$max": "$timestamp"},
+                }
+            },
+        ]
+        async for row in self.message_collection.aggregate(outgoing):
+            activity.setdefault(row["_id"], {}).update(row)
+
+        return activity
+
+    async def _listing_prices(self, user_id: str, listing_ids: set) -> Dict[str, float]:
+        if not listing_ids:
+            return {}
+
+        listings = await self.listing_collection.find(
+            {"user_id": user_id, "id": {"$in": list(listing_ids)}},
+            {"id": 1, "price": 1},
+        ).to_list(length=None)
+        return {
+            listing["id"]: listing["price"]
+            for listing in listings
+            if listing.get("price") is not None
+        }
+
+
+def _unanswered_since(stats: Dict) -> Optional[datetime]:
+    incoming_at = stats.get("last_incoming_at")
+    outgoing_at = stats.get("last_outgoing_at")
+    if incoming_at and (not outgoing_at or outgoing_at < incoming_at):
+        return incoming_at
+    return None
+
+
+def _hours_since(timestamps: List[Optional[datetime]], now: datetime) -> np.ndarray:
+    return np.array(
+        [(now - ts).total_seconds() / 3600 if ts else np.nan for ts in timestamps],
+        dtype=float,
+    )
@@ -0,0 +1,182 @@
+from typing import Dict, List, Sequence
+import re
+
+import numpy as np
+import pandas as pd
+
+# Шаблоны не используют \w и \b: в строках на Arrow они работают только
+# с ASCII и не видят кириллицу
+PRICE_PATTERN = (
+    r"\d[\d\s]*(?:руб|₽|лей|lei|mdl|грн|\$|€|eur|usd|у\.е)|цен[аыу]|торг|(?:^|\s)сто[иі]т"
+)
+PHOTO_PATTERN = r"фото|снимк|видео|photo"
+LOCATION_PATTERN = (
+    r"район|улиц|ул\.|метро|город|центр|самовывоз|адрес|кишин|бельц|киев|москв"
+)
+
+# Ожидания по категориям: минимальная длина текста и ключевые слова,
+# которые покупатели ищут в объявлениях этой категории
+CATEGORY_BASELINES: Dict[str, Dict] = {
+    "electronics": {
+        "min_length": 250,
+        "keywords": ["состояни", "гаранти", "комплект", "памят", "батаре", "модел"],
+    },
+    "transport": {
+        "min_length": 400,
+        "keywords": ["год", "пробег", "двигател", "коробк", "состояни", "документ"],
+    },
+    "furniture": {
+        "min_length": 200,
+        "keywords": ["размер", "материал", "цвет", "состояни", "доставк"],
+    },
+    "clothing": {
+        "min_length": 150,
+        "keywords": ["размер", "материал", "цвет", "состояни", "бренд"],
+    },
+    "other": {
+        "min_length": 150,
+        "keywords": ["состояни", "доставк", "размер"],
+    },
+}
+
+WEIGHTS = {
+    "length": 25.0,
+    "has_price": 15.0,
+    "mentions_photo": 10.0,
+    "mentions_location": 15.0,
+    "keyword_coverage": 35.0,
+}
+
+DUPLICATE_PENALTY = 30.0
+
+
+def analyze_listings(listings: Sequence[Dict]) -> pd.DataFrame:
+    """
+    Признаки и оценка качества для пакета объявлений одним проходом.
+    Каждый элемент: listing_id, listing_text и необязательные category, price.
+    """
+    frame = pd.DataFrame(
+        {
+            "listing_id": pd.Series(
+                [item["listing_id"] for item in listings], dtype=object
+            ),
+            "text": pd.Series(
+                [item.get("listing_text", "") for item in listings], dtype=object
+            ),
+            "category": pd.Series(
+                [item.get("category") or "other" for item in listings], dtype=object
+            ),
+            "price": pd.Series([item.get("price") for item in listings], dtype=float),
+        }
+    )
+    frame.loc[~frame["category"].isin(CATEGORY_BASELINES), "category"] = "other"
+    lowered = frame["text"].str.lower().str.replace("ё", "е", regex=False)
+
+    frame["length"] = frame["text"].str.len()
+    frame["has_price"] = frame["price"].notna() | lowered.str.contains(
+        PRICE_PATTERN, regex=True
+    )
+    frame["mentions_photo"] = lowered.str.contains(PHOTO_PATTERN, regex=True)
+    frame["mentions_location"] = lowered.str.contains(LOCATION_PATTERN, regex=True)
+    frame["keyword_coverage"] = _keyword_coverage(lowered, frame["category"])
+    frame["duplicate_ratio"] = _duplicate_ratio(lowered)
+
+    min_length = frame["category"].map(
+        {name: b["min_length"] for name, b in CATEGORY_BASELINES.items()}
+    )
+    length_ratio = np.minimum(frame["length"] / min_length, 1.0)
+
+    score = (
+        WEIGHTS["length"] * length_ratio
+        + WEIGHTS["has_price"] * frame["has_price"]
+        + WEIGHTS["mentions_photo"] * frame["mentions_photo"]
+        + WEIGHTS["mentions_location"] * frame["mentions_location"]
+        + WEIGHTS["keyword_coverage"] * frame["keyword_coverage"]
+        - DUPLICATE_PENALTY * frame["duplicate_ratio"]
+    )
+    frame["score"] = score.clip(0, 100).round(1)
+    frame["length_ratio"] = length_ratio
+
+    # Отклонение от среднего по категории внутри пакета
+    frame["category_delta"] = (
+        frame["score"] - frame.groupby("category")["score"].transform("mean")
+    ).round(1)
+
+    return frame.drop(columns=["text"])
+
+
+def listing_suggestions(row: Dict) -> List[str]:
+    """Рекомендации по улучшению для одной строки отчета"""
+    suggestions = []
+    if row["length_ratio"] < 1:
+        suggestions.append("Добавьте более подробное описание товара")
+    if not row["has_price"]:
+        suggestions.append("Укажите цену")
+    if not row["mentions_photo"]:
+        suggestions.append("Добавьте больше фотографий товара")
+    if not row["mentions_location"]:
+        suggestions.append("Укажите точное местоположение")
+    if row["keyword_coverage"] < 0.5:
+        suggestions.append("Добавьте характеристики, которые ищут покупатели")
+    if row["duplicate_ratio"] > 0.3:
+        suggestions.append("Перепишите текст: он повторяет другие ваши объявления")
+    return suggestions
+
+
+def listing_report(frame: pd.DataFrame) -> List[Dict]:
+    """Строки отчета в виде словарей, готовых к сериализации"""
+    report = []
+    for row in frame.to_dict(orient="records"):
+        report.append(
+            {
+                "listing_id": row["listing_id"],
+                "category": row["category"],
+                "score": float(row["score"]),
+                "category_delta": float(row["category_delta"]),
+                "length": int(row["length"]),
+                "has_price": bool(row["has_price"]),
+                "mentions_photo": bool(row["mentions_photo"]),
+                "mentions_location": bool(row["mentions_location"]),
+                "keyword_coverage": round(float(row["keyword_coverage"]), 2),
+                "duplicate_ratio": round(float(row["duplicate_ratio"]), 2),
+                "suggestions": listing_suggestions(row),
+            }
+        )
+    return report
+
+
+def _keyword_coverage(lowered: pd.Series, categories: pd.Series) -> pd.Series:
+    coverage = pd.Series(0.0, index=lowered.index)
+    for name, baseline in CATEGORY_BASELINES.items():
+        mask = categories == name
+        if not mask.any():
+            continue
+        keywords = baseline["keywords"]
+        hits = sum(
+            lowered[mask].str.contains(re.escape(word), regex=True).astype(int)
+            for word in keywords
+        )
+        coverage[mask] = hits / len(keywords)
+    return coverage
+
+
+def _duplicate_ratio(lowered: pd.Series, min_words: int = 4) -> pd.Series:
+    """Доля предложений объявления, встречающихся в других объявлениях пакета"""
+    sentences = (
+        lowered.str.split(r"[.!?\n]+", regex=True)
+        .explode()
+        .str.replace(r"[^0-9a-zа-я\s]", " ", regex=True)
+        .str.split()
+        .str.join(" ")
+    )
+    sentences = sentences[sentences.str.count(" ") >= min_words - 1]
+    if sentences.empty:
+        return pd.Series(0.0, index=lowered.index)
+
+    pairs = pd.DataFrame({"doc": sentences.index, "sentence": sentences.values})
+    pairs = pairs.drop_duplicates()
+    shared = pairs["sentence"].map(pairs["sentence"].value_counts()) > 1
+
+    ratio = shared.groupby(pairs["doc"]).mean()
+    return ratio.reindex(lowered.index, fill_value=0.0)
+
@@ -1,18 +1,69 @@
 from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
 from backend.models.message import Message, MessageCreate, MessageResponse, MessageType
-from typing import List, Optional
+from backend.services.deduplication import MessageDeduplicator
+from backend.services.rollup_service import RollupService
+from backend.services.response_metrics import ResponseMetricsService
+from pymongo.errors import DuplicateKeyError
+from typing import TYPE_CHECKING, List, Optional
 from datetime import datetime, timedelta
 
+if TYPE_CHECKING:
+    # Модуль подсказок тянет pandas; без ИИ он не нужен
+    from backend.services.suggestion_service import SuggestionService
 
+
+class DuplicateMessageError(Exception):
+    """Сообщение интеграции с таким external_id уже сохранено"""
+
+
+@track_queries
 class MessageService:
-    def __init__(self, collection: MotorCollection):
+    def __init__(
+        self,
+        collection: MotorCollection,
+        suggestion_service: Optional["SuggestionService"] = None,
+        rollup_service: Optional[RollupService] = None,
+        response_metrics: Optional[ResponseMetricsService] = None,
+        deduplicator: Optional[MessageDeduplicator] = None,
+    ):
         self.collection = collection
+        self.suggestion_service = suggestion_service
+        self.rollup_service = rollup_service
+        self.response_metrics = response_metrics
+        self.deduplicator = deduplicator
+
+    async def is_duplicate(self, integration_id: str, external_id: str) -> bool:
+        """Быстрая проверка повтора до обработки webhook"""
+        if not self.deduplicator:
+            return False
+        return await self.deduplicator.is_duplicate(integration_id, external_id)
 
     async def create_message(
         self, message_data: MessageCreate, user_id: str
     ) -> Message:
         message = Message(**message_data.model_dump(), user_id=user_id)
-        await self.collection.insert_one(message.model_dump())
+        document = message.model_dump()
+        keyed = bool(message.integration_id and message.external_id)
+        try:
+            await self.collection.insert_one(document)
+        except DuplicateKeyError:
+            if not keyed:
+                raise
+            # Повтор, пришедший в другой воркер или после перезапуска
+            if self.deduplicator:
+                self.deduplicator.index_hit(message.integration_id, message.external_id)
+            raise DuplicateMessageError(message.external_id)
+        if keyed and self.deduplicator:
+            self.deduplicator.remember(message.integration_id, message.external_id)
+
+        if self.rollup_service:
+            await self.rollup_service.record_messages([document])
+
+        # Готовим подсказки ответа заранее, пока продавец не открыл чат
+        if self.suggestion_service and message.message_type == MessageType.INCOMING:
+            self.suggestion_service.schedule(message.client_id, user_id)
+
         return message
 
     async def get_client_messages(
@@ -31,6 +82,12 @@ class MessageService:
         self, response_data: MessageResponse, user_id: str
     ) -> Message:
         """Отправляет ответ клиенту"""
+        # Задержку считаем до сохранения ответа, пока он не стал последним исходящим
+        if self.response_metrics:
+            await self.response_metrics.record_reply(
+                response_data.client_id, user_id, datetime.utcnow()
+            )
+
         message_data = MessageCreate(
             client_id=response_data.client_id,
             content=response_data.content,
@@ -0,0 +1,192 @@
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from backend.models.message import MessageType
+from pymongo import UpdateOne
+from typing import Dict, Iterable, Optional
+from datetime import datetime, timedelta
+from enum import Enum
+import math
+
+# Относительная точность квантилей скетча
+RELATIVE_ACCURACY = 0.02
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class LatencyMetric(str, Enum):
+    FIRST_REPLY = "first_reply"  # от первого сообщения клиента до первого ответа
+    REPLY = "reply"  # от самого старого неотвеченного сообщения до ответа
+
+
+class LatencySketch:
+    """
+    Гистограмма с логарифмическими бакетами (как в DDSketch): квантили
+    с относительной ошибкой RELATIVE_ACCURACY. Скетчи за разные дни
+    объединяются сложением счетчиков.
+    """
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+        self.count = sum(self.buckets.values())
+
+    @staticmethod
+    def bucket_index(seconds: float) -> int:
+        # Все, что быстрее секунды, попадает в один нулевой бакет
+        return max(0, math.ceil(math.log(max(seconds, 1.0)) / _LOG_GAMMA))
+
+    @staticmethod
+    def bucket_value(index: int) -> float:
+        if index == 0:
+            return 1.0
+        return 2 * _GAMMA**index / (_GAMMA + 1)
+
+    def add(self, seconds: float, count: int = 1) -> None:
+        index = self.bucket_index(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "LatencySketch") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.buckets))
+
+
+@track_queries
+class ResponseMetricsService:
+    """
+    Скорость ответов продавца. Каждый ответ добавляет задержку в дневные
+    скетчи пользователя и объявления; отчет объединяет скетчи за период
+    и не читает историю сообщений.
+    """
+
+    def __init__(
+        self,
+        metrics_collection: MotorCollection,
+        message_collection: MotorCollection,
+        client_collection: MotorCollection,
+        listing_collection: MotorCollection,
+    ):
+        self.metrics_collection = metrics_collection
+        self.message_collection = message_collection
+        self.client_collection = client_collection
+        self.listing_collection = listing_collection
+
+    async def ensure_indexes(self) -> None:
+        await self.metrics_collection.create_index(
+            [("user_id", 1), ("listing_id", 1), ("metric", 1), ("day", 1)],
+            unique=True,
+        )
+
+    async def record_reply(
+        self, client_id: str, user_id: str, replied_at: datetime
+    ) -> Optional[float]:
+        """
+        Вызывается до сохранения ответа. Возвращает задержку в секундах
+        или None, если неотвеченных входящих сообщений нет.
+        """
+        conversation = {"client_id": client_id, "user_id": user_id}
+        last_outgoing = await self.message_collection.find_one(
+            {**conversation, "message_type": MessageType.OUTGOING.value},
+            sort=[("timestamp", -1)],
+        )
+
+        unanswered: Dict = {**conversation, "message_type": MessageType.INCOMING.value}
+        if last_outgoing:
+            unanswered["timestamp"] = {"$gt": last_outgoing["timestamp"]}
+        oldest = await self.message_collection.find_one(
+            unanswered, sort=[("timestamp", 1)]
+        )
+        if not oldest:
+            return None
+
+        latency = max((replied_at - oldest["timestamp"]).total_seconds(), 0.0)
+        metrics = [LatencyMetric.REPLY]
+        if not last_outgoing:
+            metrics.append(LatencyMetric.FIRST_REPLY)
+
+        client = await self.client_collection.find_one(
+            {"id": client_id, "user_id": user_id}
+        )
+        listing_id = client.get("listing_id") if client else None
+
+        scopes = [None] + ([listing_id] if listing_id else [])
+        day = replied_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        index = LatencySketch.bucket_index(latency)
+        await self.metrics_collection.bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "user_id": user_id,
+                        "listing_id": scope,
+                        "metric": metric.value,
+                        "day": day,
+                    },
+                    {
+                        "$inc": {
+                            f"buckets.{index}": 1,
+                            "count": 1,
+                            "sum_seconds": latency,
+                        }
+                    },
+                    upsert=True,
+                )
+                for scope in scopes
+                for metric in metrics
+            ],
+            ordered=False,
+        )
+
+        if listing_id:
+            await self.listing_collection.update_one(
+                {"id": listing_id, "user_id": user_id},
+                {
+                    "$inc": {"responses_count": 1},
+                    "$set": {"last_response_at": replied_at},
+                },
+            )
+        return latency
+
+    async def get_latency(
+        self, user_id: str, listing_id: Optional[str] = None, days: int = 30
+    ) -> Dict[str, Dict]:
+        """p50/p90 задержки ответа за последние days дней"""
+        since = datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - timedelta(days=days - 1)
+        documents = await self.metrics_collection.find(
+            {"user_id": user_id, "listing_id": listing_id, "day": {"$gte": since}}
+        ).to_list(length=None)
+        return latency_report(documents)
+
+
+def latency_report(documents: Iterable[Dict]) -> Dict[str, Dict]:
+    """Объединяет дневные скетчи в отчет по каждой метрике"""
+    sketches = {metric.value: LatencySketch() for metric in LatencyMetric}
+    totals = {metric.value: 0.0 for metric in LatencyMetric}
+    for document in documents:
+        sketches[document["metric"]].merge(
+            LatencySketch({int(k): v for k, v in document.get("buckets", {}).items()})
+        )
+        totals[document["metric"]] += document.get("sum_seconds", 0.0)
+
+    report = {}
+    for metric, sketch in sketches.items():
+        report[metric] = {
+            "count": sketch.count,
+            "mean_seconds": totals[metric] / sketch.count if sketch.count else None,
+            "p50_seconds": sketch.quantile(0.5),
+            "p90_seconds": sketch.quantile(0.9),
+        }
+    return report
@@ -0,0 +1,215 @@
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from backend.models.client import ClientStatus
+from backend.models.message import MessageType
+from pymongo import UpdateOne
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+from enum import Enum
+
+# Счетчики одного часового бакета
+COUNTERS = ("incoming", "outgoing", "new_clients", "closed")
+
+# Максимальное число точек в ответе timeseries
+MAX_POINTS = 1000
+
+
+class RollupInterval(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
+INTERVAL_STEPS = {
+    RollupInterval.HOUR: timedelta(hours=1),
+    RollupInterval.DAY: timedelta(days=1),
+}
+
+
+def truncate(ts: datetime, interval: RollupInterval = RollupInterval.HOUR) -> datetime:
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if interval == RollupInterval.DAY:
+        ts = ts.replace(hour=0)
+    return ts
+
+
+@track_queries
+class RollupService:
+    """
+    Почасовые агрегаты по пользователю и источнику: входящие, исходящие,
+    новые и закрытые клиенты. Обновляются через $inc на пути записи,
+    графики читают только бакеты, а не сырые сообщения.
+    """
+
+    def __init__(
+        self,
+        rollup_collection: MotorCollection,
+        client_collection: MotorCollection,
+        message_collection: MotorCollection,
+    ):
+        self.rollup_collection = rollup_collection
+        self.client_collection = client_collection
+        self.message_collection = message_collection
+
+    async def ensure_indexes(self) -> None:
+        await self.rollup_collection.create_index(
+            [("user_id", 1), ("hour", 1), ("source", 1)], unique=True
+        )
+
+    async def record_messages(self, messages: Iterable[Dict]) -> None:
+        """Учитывает новые сообщения (документы из коллекции messages)"""
+        counts: Dict[Tuple, Dict[str, int]] = {}
+        for message in messages:
+            field = (
+                "incoming"
+                if _value(message["message_type"]) == MessageType.INCOMING.value
+                else "outgoing"
+            )
+            _add(counts, message, message["timestamp"], field)
+        await self._increment(counts)
+
+    async def record_new_clients(self, clients: Iterable[Dict]) -> None:
+        counts: Dict[Tuple, Dict[str, int]] = {}
+        for client in clients:
+            _add(counts, client, client["created_at"], "new_clients")
+        await self._increment(counts)
+
+    async def record_closed(self, client: Dict) -> None:
+        counts: Dict[Tuple, Dict[str, int]] = {}
+        _add(counts, client, client["updated_at"], "closed")
+        await self._increment(counts)
+
+    async def rebuild(self, user_id: str) -> int:
+        """
+        Пересчитывает агрегаты пользователя из истории.
+        Время закрытия клиента берется из updated_at.
+        """
+        counts: Dict[Tuple, Dict[str, int]] = {}
+
+        messages = [
+            {"$match": {"user_id": user_id}},
+            {
+                "$group": {
+                    "_id": {
+                        "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+                        "source": "$source",
+                        "type": "$message_type",
+                    },
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+        async for row in self.message_collection.aggregate(messages):
+            key = row["_id"]
+            field = (
+                "incoming" if key["type"] == MessageType.INCOMING.value else "outgoing"
+            )
+            bucket = counts.setdefault((user_id, key["source"], key["hour"]), {})
+            bucket[field] = bucket.get(field, 0) + row["count"]
+
+        for field, date_field, match in (
+            ("new_clients", "$created_at", {}),
+            ("closed", "$updated_at", {"status": ClientStatus.CLOSED.value}),
+        ):
+            pipeline = [
+                {"$match": {"user_id": user_id, **match}},
+                {
+                    "$group": {
+                        "_id": {
+                            "hour": {
+                                "$dateTrunc": {"date": date_field, "unit": "hour"}
+                            },
+                            "source": "$source",
+                        },
+                        "count": {"$sum": 1},
+                    }
+                },
+            ]
+            async for row in self.client_collection.aggregate(pipeline):
+                key = row["_id"]
+                bucket = counts.setdefault((user_id, key["source"], key["hour"]), {})
+                bucket[field] = row["count"]
+
+        await self.rollup_collection.delete_many({"user_id": user_id})
+        requests = [
+            UpdateOne(
+                {"user_id": uid, "source": source, "hour": hour},
+                {"$set": {counter: fields.get(counter, 0) for counter in COUNTERS}},
+                upsert=True,
+            )
+            for (uid, source, hour), fields in counts.items()
+        ]
+        if requests:
+            await self.rollup_collection.bulk_write(requests, ordered=False)
+        return len(requests)
+
+    async def timeseries(
+        self,
+        user_id: str,
+        date_from: datetime,
+        date_to: datetime,
+        interval: RollupInterval = RollupInterval.DAY,
+        source: Optional[str] = None,
+    ) -> List[Dict]:
+        """Ряд [date_from, date_to) с шагом interval; пустые периоды — нули"""
+        start = truncate(date_from, interval)
+        step = INTERVAL_STEPS[interval]
+        if date_to <= start:
+            raise ValueError("date_to must be after date_from")
+        if (date_to - start) / step > MAX_POINTS:
+            raise ValueError(f"Range is too long for interval '{interval.value}'")
+
+        match: Dict = {"user_id": user_id, "hour": {"$gte": start, "$lt": date_to}}
+        if source:
+            match["source"] = source
+
+        # Суммирование бакетов в периоды идет на стороне Mongo
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {"$dateTrunc": {"date": "$hour", "unit": interval.value}},
+                    **{counter: {"$sum": f"${counter}"} for counter in COUNTERS},
+                }
+            },
+        ]
+        rows = [row async for row in self.rollup_collection.aggregate(pipeline)]
+        return fill_series(rows, start, date_to, step)
+
+    async def _increment(self, counts: Dict[Tuple, Dict[str, int]]) -> None:
+        requests = [
+            UpdateOne(
+                {"user_id": user_id, "source": source, "hour": hour},
+                {"$inc": fields},
+                upsert=True,
+            )
+            for (user_id, source, hour), fields in counts.items()
+        ]
+        if requests:
+            await self.rollup_collection.bulk_write(requests, ordered=False)
+
+
+def fill_series(
+    rows: List[Dict], start: datetime, end: datetime, step: timedelta
+) -> List[Dict]:
+    by_period = {row["_id"]: row for row in rows}
+    series = []
+    period = start
+    while period < end:
+        row = by_period.get(period, {})
+        series.append(
+            {"period": period, **{counter: row.get(counter, 0) for counter in COUNTERS}}
+        )
+        period += step
+    return series
+
+
+def _add(
+    counts: Dict[Tuple, Dict[str, int]], document: Dict, ts: datetime, field: str
+) -> None:
+    key = (document["user_id"], _value(document["source"]), truncate(ts))
+    bucket = counts.setdefault(key, {})
+    bucket[field] = bucket.get(field, 0) + 1
+
+
+def _value(value):
+    return value.value if isinstance(value, Enum) else value
@@ -0,0 +1,160 @@
+from backend.utils.motor import MotorCollection
+from backend.services.ai_backend import AIBackend, AIPrompt, AITask
+from backend.services.intent_classifier import IntentClassifier
+from backend.models.message import MessageIntent, MessageType
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestionService:
+    """Фоновая генерация подсказок ответов с кэшем по хвосту переписки"""
+
+    def __init__(
+        self,
+        message_collection: MotorCollection,
+        backend: AIBackend,
+        debounce_seconds: float = 2.0,
+        ttl_seconds: float = 600.0,
+        history_size: int = 10,
+        max_entries: int = 10000,
+        classifier: Optional[IntentClassifier] = None,
+    ):
+        self.message_collection = message_collection
+        self.backend = backend
+        self.debounce_seconds = debounce_seconds
+        self.ttl_seconds = ttl_seconds
+        self.history_size = history_size
+        self.max_entries = max_entries
+        self.classifier = classifier
+
+        # (user_id, client_id) -> (хэш хвоста, время генерации, подсказки)
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[str, float, List[str]]]" = (
+            OrderedDict()
+        )
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def schedule(self, client_id: str, user_id: str) -> None:
+        """Планирует генерацию; серия сообщений подряд даст одну генерацию"""
+        key = (user_id, client_id)
+
+        pending = self._pending.get(key)
+        if pending and not pending.done():
+            pending.cancel()
+
+        self._pending[key] = asyncio.get_running_loop().create_task(
+            self._debounced_refresh(key)
+        )
+
+    async def get_suggestions(self, client_id: str, user_id: str) -> List[str]:
+        """Возвращает подсказки из кэша или генерирует их синхронно"""
+        key = (user_id, client_id)
+        messages, tail_hash = await self._load_tail(client_id, user_id)
+
+        cached = self._get_cached(key, tail_hash)
+        if cached is not None:
+            return cached
+
+        return await self._generate(key, messages, tail_hash)
+
+    async def refresh(self, client_id: str, user_id: str) -> List[str]:
+        """Обновляет кэш для клиента, если хвост переписки изменился"""
+        return await self.get_suggestions(client_id, user_id)
+
+    def pending_count(self) -> int:
+        return sum(1 for task in self._pending.values() if not task.done())
+
+    async def close(self) -> None:
+        """Отменяет запланированные генерации (при остановке приложения)"""
+        tasks = [task for task in self._pending.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.clear()
+
+    async def _debounced_refresh(self, key: Tuple[str, str]) -> None:
+        user_id, client_id = key
+        try:
+            await asyncio.sleep(self.debounce_seconds)
+            await self.refresh(client_id, user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Suggestion generation failed for {client_id}: {e}")
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+
+    async def _load_tail(self, client_id: str, user_id: str) -> Tuple[List[Dict], str]:
+        messages = (
+            await self.message_collection.find(
+                {"client_id": client_id, "user_id": user_id}
+            )
+            .sort("timestamp", -1)
+            .limit(self.history_size)
+            .to_list(length=self.history_size)
+        )
+        messages.reverse()
+
+        digest = hashlib.sha1()
+        for message in messages:
+            digest.update(str(message.get("id", "")).encode())
+            digest.update(b"\x00")
+            digest.update(message.get("content", "").encode())
+            digest.update(b"\x00")
+
+        return messages, digest.hexdigest()
+
+    def _get_cached(self, key: Tuple[str, str], tail_hash: str) -> Optional[List[str]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        cached_hash, generated_at, suggestions = entry
+        if (
+            cached_hash != tail_hash
+            or time.monotonic() - generated_at > self.ttl_seconds
+        ):
+            return None
+
+        self._cache.move_to_end(key)
+        return list(suggestions)
+
+    async def _generate(
+        self, key: Tuple[str, str], messages: List[Dict], tail_hash: str
+    ) -> List[str]:
+        user_id, _ = key
+
+        # Отвечаем на последнее входящее сообщение, а не на свое
+        incoming = [
+            m.get("content", "")
+            for m in messages
+            if m.get("message_type") == MessageType.INCOMING.value
+        ]
+        last_incoming = incoming[-1] if incoming else ""
+
+        intent = None
+        if self.classifier is not None:
+            intent = MessageIntent(self.classifier.classify(last_incoming, 0.5))
+
+        prompt = AIPrompt(
+            task=AITask.SUGGEST_RESPONSE,
+            text=last_incoming,
+            history=[m.get("content", "") for m in messages],
+            user_id=user_id,
+            intent=intent,
+        )
+        completion = (await self.backend.complete_batch([prompt]))[0]
+        suggestions = completion.suggestions or [completion.response]
+
+        self._cache[key] = (tail_hash, time.monotonic(), list(suggestions))
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return suggestions
@@ -0,0 +1,188 @@
+"""
+Преобразование обновлений Telegram Bot API в клиентов и сообщения.
+
+Пачка обновлений (из getUpdates или одного webhook'а) записывается
+несколькими bulk_write: клиенты - upsert по (user_id, source, external_id =
+chat.id), сообщения - upsert по (integration_id, external_id =
+"chat_id:message_id") через $setOnInsert, счетчики клиентов - одним $inc
+по действительно новым сообщениям. Повторная доставка той же пачки
+ничего не меняет.
+"""
+
+from backend.models.client import Client, MessageSource
+from backend.models.message import Message, MessageType
+from backend.services.deduplication import MessageDeduplicator
+from backend.services.rollup_service import RollupService
+from backend.utils.motor import MotorCollection
+from backend.utils.query_stats import track_queries
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Tuple
+
+
+def parse_updates(updates: List[Dict]) -> List[Dict]:
+    """Текстовые сообщения из личных чатов и групп; остальное пропускается"""
+    messages = []
+    for update in updates:
+        message = update.get("message")
+        if not message or "text" not in message or "chat" not in message:
+            continue
+        chat = message["chat"]
+        sender = message.get("from") or {}
+        name = " ".join(
+            part
+            for part in (
+                sender.get("first_name") or chat.get("first_name"),
+                sender.get("last_name") or chat.get("last_name"),
+            )
+            if part
+        )
+        messages.append(
+            {
+                "chat_id": str(chat["id"]),
+                "external_id": f"{chat['id']}:{message['message_id']}",
+                "name": name
+                or chat.get("title")
+                or sender.get("username")
+                or str(chat["id"]),
+                "text": message["text"],
+                "timestamp": datetime.utcfromtimestamp(message["date"]),
+            }
+        )
+    return messages
+
+
+@track_queries
+class TelegramIngestService:
+    def __init__(
+        self,
+        client_collection: MotorCollection,
+        message_collection: MotorCollection,
+        deduplicator: Optional[MessageDeduplicator] = None,
+        rollup_service: Optional[RollupService] = None,
+    ):
+        self.client_collection = client_collection
+        self.message_collection = message_collection
+        self.deduplicator = deduplicator
+        self.rollup_service = rollup_service
+
+    async def ingest(self, integration: Dict, updates: List[Dict]) -> int:
+        """Записывает обновления интеграции; возвращает число новых сообщений"""
+        parsed = parse_updates(updates)
+        if not parsed:
+            return 0
+        user_id = integration["user_id"]
+        client_ids = await self._upsert_clients(user_id, parsed)
+
+        messages = []
+        requests = []
+        for item in parsed:
+            message = Message(
+                client_id=client_ids[item["chat_id"]],
+                content=item["text"],
+                message_type=MessageType.INCOMING,
+                source=MessageSource.TELEGRAM.value,
+                timestamp=item["timestamp"],
+                external_id=item["external_id"],
+                integration_id=integration["id"],
+                user_id=user_id,
+            ).model_dump()
+            messages.append(message)
+            requests.append(
+                UpdateOne(
+                    {
+                        "integration_id": integration["id"],
+                        "external_id": item["external_id"],
+                    },
+                    {"$setOnInsert": message},
+                    upsert=True,
+                )
+            )
+
+        inserted = await _upserted(self.message_collection, requests)
+        new_messages = [messages[i] for i in sorted(inserted)]
+        if self.deduplicator:
+            for message in messages:
+                self.deduplicator.remember(integration["id"], message["external_id"])
+
+        await self._update_client_activity(new_messages, user_id)
+        if self.rollup_service and new_messages:
+            await self.rollup_service.record_messages(new_messages)
+        return len(new_messages)
+
+    async def _upsert_clients(self, user_id: str, parsed: List[Dict]) -> Dict[str, str]:
+        """Клиенты по chat.id; возвращает chat_id -> id клиента"""
+        clients: Dict[str, Dict] = {}
+        for item in parsed:
+            if item["chat_id"] not in clients:
+                clients[item["chat_id"]] = Client(
+                    name=item["name"],
+                    source=MessageSource.TELEGRAM,
+                    external_id=item["chat_id"],
+                    user_id=user_id,
+                ).model_dump()
+
+        chat_ids = list(clients)
+        requests = [
+            UpdateOne(
+                {
+                    "user_id": user_id,
+                    "source": MessageSource.TELEGRAM.value,
+                    "external_id": chat_id,
+                },
+                {"$setOnInsert": clients[chat_id]},
+                upsert=True,
+            )
+            for chat_id in chat_ids
+        ]
+        inserted = await _upserted(self.client_collection, requests)
+        if self.rollup_service and inserted:
+            await self.rollup_service.record_new_clients(
+                [clients[chat_ids[i]] for i in sorted(inserted)]
+            )
+
+        existing = await self.client_collection.find(
+            {
+                "user_id": user_id,
+                "source": MessageSource.TELEGRAM.value,
+                "external_id": {"$in": chat_ids},
+            },
+            {"_id": 0, "id": 1, "external_id": 1},
+        ).to_list(length=None)
+        return {client["external_id"]: client["id"] for client in existing}
+
+    async def _update_client_activity(self, messages: List[Dict], user_id: str) -> None:
+        activity: Dict[str, Tuple[int, datetime]] = {}
+        for message in messages:
+            count, last_at = activity.get(
+                message["client_id"], (0, message["timestamp"])
+            )
+            activity[message["client_id"]] = (
+                count + 1,
+                max(last_at, message["timestamp"]),
+            )
+
+        requests = [
+            UpdateOne(
+                {"id": client_id, "user_id": user_id},
+                {
+                    "$inc": {"messages_count": count},
+                    "$max": {"last_message_at": last_at, "updated_at": last_at},
+                },
+            )
+            for client_id, (count, last_at) in activity.items()
+        ]
+        if requests:
+            await self.client_collection.bulk_write(requests, ordered=False)
+
+
+async def _upserted(collection: MotorCollection, requests: List[UpdateOne]) -> set:
+    """Индексы upsert-операций, создавших документ"""
+    try:
+        result = await collection.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        # Гонка с параллельной вставкой: документ уже создан другим запросом
+        details = e.details
+    return {upsert["index"] for upsert in details.get("upserted", [])}
@@ -0,0 +1,263 @@
+"""
+Прием сообщений Telegram через long polling (getUpdates) вместо webhook'а.
+
+Для инсталляций без публичного HTTPS: интеграция IntegrationType.TELEGRAM
+со статусом active и config.mode = "polling" (токен бота в
+config.bot_token) опрашивается воркером. Все боты обслуживаются одним
+HTTP-клиентом, одновременных запросов getUpdates не больше concurrency;
+при большем числе ботов они ждут очереди, поэтому для мгновенной доставки
+concurrency должна быть не меньше числа ботов.
+
+Смещение (polling_offset) сохраняется в документе интеграции после
+записи каждой пачки: при падении пачка придет повторно, а повтор
+отсекают ключи сообщений (см. TelegramIngestService). Чтобы несколько
+воркеров uvicorn не опрашивали одного бота (Telegram отвечает 409),
+интеграцию захватывает аренда polling_lease_until.
+"""
+
+from backend.services.telegram_ingest import TelegramIngestService
+from backend.utils.motor import MotorCollection
+from backend.utils.partitioning import bind_user
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import httpx
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class TelegramAPIError(Exception):
+    def __init__(self, code: int, description: str):
+        super().__init__(f"Telegram API error {code}: {description}")
+        self.code = code
+
+
+class TelegramPoller:
+    def __init__(
+        self,
+        integration_collection: MotorCollection,
+        ingest_service: TelegramIngestService,
+        api_url: str = "https://api.telegram.org",
+        timeout_seconds: int = 25,
+        batch_size: int = 100,
+        concurrency: int = 20,
+        lease_seconds: float = 60.0,
+        refresh_seconds: float = 30.0,
+        http: Optional[httpx.AsyncClient] = None,
+    ):
+        self.integration_collection = integration_collection
+        self.ingest_service = ingest_service
+        self.api_url = api_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.refresh_seconds = refresh_seconds
+        self.worker_id = str(uuid.uuid4())
+
+        self._http = http
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, int] = {"polls": 0, "updates": 0, "messages": 0}
+        self._errors: Dict[str, int] = {}
+
+    # --- жизненный цикл ---
+
+    def start(self) -> None:
+        if self._supervisor is None or self._supervisor.done():
+            self._supervisor = asyncio.get_running_loop().create_task(self._supervise())
+
+    async def close(self) -> None:
+        """Останавливает опрос и освобождает аренды"""
+        tasks = list(self._tasks.values())
+        if self._supervisor:
+            tasks.append(self._supervisor)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._tasks:
+            await self.integration_collection.update_many(
+                {"id": {"$in": list(self._tasks)}, "polling_worker": self.worker_id},
+                {"$set": {"polling_lease_until": None}},
+            )
+        self._tasks.clear()
+        self._supervisor = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout_seconds + 10,
+                limits=httpx.Limits(max_connections=self.concurrency),
+            )
+        return self._http
+
+    async def _supervise(self) -> None:
+        """Запускает и останавливает опрос по списку интеграций"""
+        while True:
+            try:
+                integrations = await self.integration_collection.find(
+                    {"type": "telegram", "status": "active", "config.mode": "polling"},
+                    {"_id": 0, "id": 1},
+                ).to_list(length=None)
+                active = {integration["id"] for integration in integrations}
+                for integration_id in active - set(self._tasks):
+                    self._tasks[
+                        integration_id
+                    ] = asyncio.get_running_loop().create_task(
+                        self._poll_forever(integration_id)
+                    )
+                for integration_id in set(self._tasks) - active:
+                    self._tasks.pop(integration_id).cancel()
+                for integration_id, task in list(self._tasks.items()):
+                    if task.done():
+                        del self._tasks[integration_id]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Не удалось обновить список ботов Telegram: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    # --- опрос ---
+
+    async def _poll_forever(self, integration_id: str) -> None:
+        backoff = 1.0
+        while True:
+            integration = await self._claim(integration_id)
+            if integration is None:
+                # Бота опрашивает другой воркер
+                await asyncio.sleep(self.lease_seconds / 2)
+                continue
+            try:
+                await self.poll_once(integration)
+                backoff = 1.0
+                # Пустой ответ без ожидания не должен занимать цикл событий
+                await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except TelegramAPIError as e:
+                self._count_error(str(e.code))
+                if e.code == 401:
+                    # Неверный токен: повторять бессмысленно
+                    await self._set_status(integration_id, "error", str(e))
+                    return
+                logger.warning(f"Опрос Telegram {integration_id}: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            except Exception as e:
+                self._count_error("transport")
+                logger.warning(f"Опрос Telegram {integration_id}: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    async def _claim(self, integration_id: str) -> Optional[Dict]:
+        """Захватывает или продлевает аренду; возвращает документ интеграции"""
+        now = datetime.utcnow()
+        claimed = await self.integration_collection.update_one(
+            {
+                "id": integration_id,
+                "$or": [
+                    {"polling_lease_until": None},
+                    {"polling_lease_until": {"$lt": now}},
+                    {"polling_worker": self.worker_id},
+                ],
+            },
+            {
+                "$set": {
+                    "polling_worker": self.worker_id,
+                    "polling_lease_until": now + timedelta(seconds=self.lease_seconds),
+                }
+            },
+        )
+        if not claimed.matched_count:
+            return None
+        return await self.integration_collection.find_one({"id": integration_id})
+
+    async def poll_once(self, integration: Dict, timeout: Optional[int] = None) -> int:
+        """Одна пачка getUpdates: запись и сохранение смещения; число сообщений"""
+        bind_user(integration["user_id"])
+        updates = await self.get_updates(
+            integration["config"]["bot_token"],
+            integration.get("polling_offset"),
+            self.timeout_seconds if timeout is None else timeout,
+        )
+        self._stats["polls"] += 1
+        if not updates:
+            return 0
+
+        created = await self.ingest_service.ingest(integration, updates)
+        offset = max(update["update_id"] for update in updates) + 1
+        await self.integration_collection.update_one(
+            {"id": integration["id"]},
+            {
+                "$max": {"polling_offset": offset},
+                "$set": {"last_sync_at": datetime.utcnow()},
+            },
+        )
+        integration["polling_offset"] = offset
+        self._stats["updates"] += len(updates)
+        self._stats["messages"] += created
+        return created
+
+    async def get_updates(
+        self, token: str, offset: Optional[int], timeout: int
+    ) -> List[Dict]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        params = {"timeout": timeout, "limit": self.batch_size}
+        if offset is not None:
+            params["offset"] = offset
+        async with self._slots:
+            response = await self._client().post(
+                f"{self.api_url}/bot{token}/getUpdates", json=params
+            )
+        body = response.json()
+        if not body.get("ok"):
+            raise TelegramAPIError(
+                body.get("error_code", response.status_code),
+                body.get("description", ""),
+            )
+        return body["result"]
+
+    async def _set_status(self, integration_id: str, status: str, error: str) -> None:
+        await self.integration_collection.update_one(
+            {"id": integration_id},
+            {
+                "$set": {
+                    "status": status,
+                    "last_error": error,
+                    "polling_lease_until": None,
+                }
+            },
+        )
+
+    def _count_error(self, kind: str) -> None:
+        self._errors[kind] = self._errors.get(kind, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "bots": len(self._tasks)}
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP telegram_polling_bots Bots polled by this worker",
+            "# TYPE telegram_polling_bots gauge",
+            f"telegram_polling_bots {len(self._tasks)}",
+            "# HELP telegram_polling_total getUpdates polls, updates and new messages",
+            "# TYPE telegram_polling_total counter",
+        ]
+        for kind, count in self._stats.items():
+            lines.append(f'telegram_polling_total{{kind="{kind}"}} {count}')
+        lines += [
+            "# HELP telegram_polling_errors_total Polling errors by API code",
+            "# TYPE telegram_polling_errors_total counter",
+        ]
+        for kind, count in sorted(self._errors.items()):
+            lines.append(f'telegram_polling_errors_total{{code="{kind}"}} {count}')
+        return lines
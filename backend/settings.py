@@ -0,0 +1,182 @@
+"""
+Настройки приложения.
+
+Settings.from_env() читает переменные окружения (и backend/.env) один раз.
+create_app() вызывает configure(), после чего роутеры и подключение к
+MongoDB берут значения через get_settings().
+"""
+
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional, Tuple
+import os
+import tempfile
+
+ROOT_DIR = Path(__file__).parent
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+STORAGES = ("mongo", "memory", "sqlite")
+RATE_LIMIT_STORES = ("memory", "shared")
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Хранилище: mongo (Motor), memory (в памяти процесса) или sqlite
+    # (один файл, для небольших инсталляций без MongoDB)
+    storage: str = "mongo"
+    mongo_url: str = "mongodb://localhost:27017"
+    db_name: str = "leadgram_db"
+    sqlite_path: Path = ROOT_DIR / "data" / "leadgram.sqlite3"
+    # Разделы продавцов: (имя, MongoDB URL); первый - домашний
+    partitions: Tuple[Tuple[str, str], ...] = ()
+    # Read preference по методам сервисов: (шаблон, "режим[:staleness]"),
+    # дополняют политики по умолчанию из backend.utils.read_routing
+    read_preferences: Tuple[Tuple[str, str], ...] = ()
+    read_your_writes_seconds: float = 90.0
+    cors_origins: Tuple[str, ...] = ("*",)
+
+    # Необязательные подсистемы: роутеры импортируются, только если включены
+    ai_enabled: bool = True
+    automation_enabled: bool = True
+
+    ai_batch_size: int = 16
+    ai_batch_wait_ms: float = 10.0
+    ai_queue_depth: int = 1000
+    ai_timeout_seconds: float = 30.0
+    ai_suggest_debounce_seconds: float = 2.0
+
+    import_dir: Path = field(
+        default_factory=lambda: Path(tempfile.gettempdir()) / "leadgram_imports"
+    )
+    import_chunk_size: int = 1000
+
+    slow_query_ms: float = 100.0
+
+    # Окно объединения записей активности клиентов; 0 - писать сразу
+    activity_flush_ms: float = 250.0
+    activity_max_pending: int = 1000
+
+    # Лимиты webhook'ов по умолчанию (запросов в секунду, размер всплеска);
+    # лимит интеграции переопределяется в Integration.config["rate_limit"].
+    # shared - корзины в базе, общие для всех воркеров
+    webhook_rate_limit: float = 20.0
+    webhook_burst: int = 40
+    user_webhook_rate_limit: float = 50.0
+    user_webhook_burst: int = 100
+    rate_limit_store: str = "memory"
+
+    # Опрос getUpdates для Telegram-интеграций с config.mode = "polling"
+    telegram_polling: bool = False
+    telegram_api_url: str = "https://api.telegram.org"
+    telegram_poll_timeout: int = 25
+    telegram_poll_concurrency: int = 20
+
+    def __post_init__(self):
+        if self.storage not in STORAGES:
+            raise ValueError(
+                f"Unknown storage {self.storage!r}, expected one of {STORAGES}"
+            )
+        if self.rate_limit_store not in RATE_LIMIT_STORES:
+            raise ValueError(
+                f"Unknown rate limit store {self.rate_limit_store!r}, "
+                f"expected one of {RATE_LIMIT_STORES}"
+            )
+
+    @classmethod
+    def from_env(cls, env_file: Optional[Path] = ROOT_DIR / ".env") -> "Settings":
+        if env_file is not None:
+            load_dotenv(env_file)
+        env = os.environ
+        defaults = cls()
+        return cls(
+            storage=env.get("STORAGE", defaults.storage).strip().lower(),
+            mongo_url=env.get("MONGO_URL", defaults.mongo_url),
+            db_name=env.get("DB_NAME", defaults.db_name),
+            sqlite_path=Path(env.get("SQLITE_PATH") or defaults.sqlite_path),
+            partitions=tuple(
+                tuple(item.split("=", 1))
+                for item in env.get("PARTITIONS", "").split()
+                if "=" in item
+            ),
+            read_preferences=tuple(
+                tuple(item.split("=", 1))
+                for item in env.get("READ_PREFERENCES", "").split()
+                if "=" in item
+            ),
+            read_your_writes_seconds=float(
+                env.get("READ_YOUR_WRITES_SECONDS", defaults.read_your_writes_seconds)
+            ),
+            cors_origins=tuple(
+                origin.strip()
+                for origin in env.get("CORS_ORIGINS", "*").split(",")
+                if origin.strip()
+            ),
+            ai_enabled=_flag(env.get("AI_ENABLED", "true")),
+            automation_enabled=_flag(env.get("AUTOMATION_ENABLED", "true")),
+            ai_batch_size=int(env.get("AI_BATCH_SIZE", defaults.ai_batch_size)),
+            ai_batch_wait_ms=float(
+                env.get("AI_BATCH_WAIT_MS", defaults.ai_batch_wait_ms)
+            ),
+            ai_queue_depth=int(env.get("AI_QUEUE_DEPTH", defaults.ai_queue_depth)),
+            ai_timeout_seconds=float(
+                env.get("AI_TIMEOUT_SECONDS", defaults.ai_timeout_seconds)
+            ),
+            ai_suggest_debounce_seconds=float(
+                env.get(
+                    "AI_SUGGEST_DEBOUNCE_SECONDS", defaults.ai_suggest_debounce_seconds
+                )
+            ),
+            import_dir=Path(env.get("IMPORT_DIR") or defaults.import_dir),
+            import_chunk_size=int(
+                env.get("IMPORT_CHUNK_SIZE", defaults.import_chunk_size)
+            ),
+            slow_query_ms=float(env.get("SLOW_QUERY_MS", defaults.slow_query_ms)),
+            activity_flush_ms=float(
+                env.get("ACTIVITY_FLUSH_MS", defaults.activity_flush_ms)
+            ),
+            activity_max_pending=int(
+                env.get("ACTIVITY_MAX_PENDING", defaults.activity_max_pending)
+            ),
+            webhook_rate_limit=float(
+                env.get("WEBHOOK_RATE_LIMIT", defaults.webhook_rate_limit)
+            ),
+            webhook_burst=int(env.get("WEBHOOK_BURST", defaults.webhook_burst)),
+            user_webhook_rate_limit=float(
+                env.get("USER_WEBHOOK_RATE_LIMIT", defaults.user_webhook_rate_limit)
+            ),
+            user_webhook_burst=int(
+                env.get("USER_WEBHOOK_BURST", defaults.user_webhook_burst)
+            ),
+            rate_limit_store=env.get("RATE_LIMIT_STORE", defaults.rate_limit_store)
+            .strip()
+            .lower(),
+            telegram_polling=_flag(env.get("TELEGRAM_POLLING", "false")),
+            telegram_api_url=env.get("TELEGRAM_API_URL", defaults.telegram_api_url),
+            telegram_poll_timeout=int(
+                env.get("TELEGRAM_POLL_TIMEOUT", defaults.telegram_poll_timeout)
+            ),
+            telegram_poll_concurrency=int(
+                env.get("TELEGRAM_POLL_CONCURRENCY", defaults.telegram_poll_concurrency)
+            ),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def configure(settings: Settings) -> None:
+    global _settings
+    _settings = settings
+
+
+def get_settings() -> Settings:
+    """Текущие настройки; без configure() читаются из окружения"""
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
@@ -0,0 +1,331 @@
+"""
+Генератор синтетических данных для нагрузочных тестов и бенчмарков.
+
+Данные детерминированы: один и тот же seed дает те же документы
+(даты отсчитываются от момента запуска).
+Существующие данные не удаляются; --replace удаляет только документы
+сгенерированных пользователей в выбранной базе.
+
+Запуск: python -m backend.synthetic_data --users 10 --clients 200 --messages 15 --db leadgram_load
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from backend.models.client import ClientStatus
+from backend.models.message import MessageType
+from backend.services.intent_classifier import load_training_data
+
+SOURCE_WEIGHTS = {"olx": 0.5, "telegram": 0.3, "whatsapp": 0.2}
+STATUS_WEIGHTS = {
+    ClientStatus.NEW.value: 0.35,
+    ClientStatus.IN_PROGRESS.value: 0.45,
+    ClientStatus.CLOSED.value: 0.2,
+}
+
+FIRST_NAMES = [
+    "Александр",
+    "Мария",
+    "Дмитрий",
+    "Елена",
+    "Ион",
+    "Наталья",
+    "Сергей",
+    "Ольга",
+    "Андрей",
+    "Виктория",
+    "Михаил",
+    "Анна",
+    "Василий",
+    "Кристина",
+]
+LAST_NAMES = [
+    "Попа",
+    "Иванов",
+    "Руснак",
+    "Петрова",
+    "Чебан",
+    "Морару",
+    "Сидоров",
+    "Лупу",
+    "Кузнецова",
+    "Унгуряну",
+    "Ткач",
+    "Бордеяну",
+]
+LISTING_ITEMS = {
+    "electronics": [
+        "Ноутбук Lenovo",
+        "iPhone 13",
+        "Наушники Sony",
+        "Телевизор Samsung",
+    ],
+    "transport": [
+        "Велосипед горный",
+        "Самокат Xiaomi",
+        "Шины R16",
+        "Детское автокресло",
+    ],
+    "furniture": ["Диван угловой", "Шкаф-купе", "Стол обеденный", "Кресло офисное"],
+    "clothing": [
+        "Куртка зимняя",
+        "Кроссовки Nike",
+        "Платье вечернее",
+        "Пальто шерстяное",
+    ],
+}
+REPLIES = [
+    "Здравствуйте! Да, товар в наличии.",
+    "Цена указана в объявлении, небольшой торг возможен.",
+    "Можем встретиться сегодня вечером в центре.",
+    "Состояние отличное, все работает.",
+    "Доставка возможна, обсудим детали.",
+    "Спасибо за интерес! Напишу, когда буду свободен.",
+]
+
+# Средние паузы: между сообщениями внутри всплеска и между всплесками
+BURST_GAP_MINUTES = 3.0
+SESSION_GAP_HOURS = 10.0
+
+
+@dataclass
+class UserDataset:
+    user_id: str
+    listings: List[Dict] = field(default_factory=list)
+    clients: List[Dict] = field(default_factory=list)
+    messages: List[Dict] = field(default_factory=list)
+
+
+def user_ids(users: int, seed: int, prefix: str = "synthetic") -> List[str]:
+    return [f"{prefix}-{seed}-{i}" for i in range(users)]
+
+
+def generate_user(
+    user_id: str,
+    clients: int,
+    mean_messages: float,
+    seed: int,
+    now: Optional[datetime] = None,
+    history_days: int = 30,
+    incoming_texts: Optional[List[str]] = None,
+) -> UserDataset:
+    """
+    Данные одного продавца. Генератор свой у каждого пользователя,
+    поэтому пользователей можно создавать параллельно и в любом порядке.
+    """
+    rng = random.Random(f"{seed}:{user_id}")
+    now = now or datetime.utcnow()
+    incoming_texts = incoming_texts or load_training_data()[0]
+    dataset = UserDataset(user_id)
+
+    # Популярность объявлений по закону Ципфа: немногие собирают большую часть чатов
+    listing_count = max(1, int(math.sqrt(clients)))
+    for rank in range(listing_count):
+        category = rng.choice(list(LISTING_ITEMS))
+        title = rng.choice(LISTING_ITEMS[category])
+        created_at = now - timedelta(days=rng.uniform(1, history_days))
+        dataset.listings.append(
+            {
+                "id": _uuid(rng),
+                "title": title,
+                "description": f"{title}, хорошее состояние",
+                "price": float(rng.randrange(200, 30000, 50)),
+                "status": "active",
+                "source": _weighted(rng, SOURCE_WEIGHTS),
+                "external_id": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "user_id": user_id,
+                "messages_48h": 0,
+                "responses_count": 0,
+                "last_response_at": None,
+            }
+        )
+    popularity = [1 / (rank + 1) ** 1.1 for rank in range(listing_count)]
+
+    for _ in range(clients):
+        listing = rng.choices(dataset.listings, weights=popularity)[0]
+        source = _weighted(rng, SOURCE_WEIGHTS)
+        created_at = now - timedelta(days=rng.uniform(0, history_days))
+        client = {
+            "id": _uuid(rng),
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "phone": f"+373{rng.randrange(60000000, 79999999)}",
+            "source": source,
+            "status": _weighted(rng, STATUS_WEIGHTS),
+            "listing_id": listing["id"],
+            "listing_title": listing["title"],
+            "external_id": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "last_message_at": None,
+            "messages_count": 0,
+            "score": 0.0,
+            "user_id": user_id,
+        }
+
+        # Длина переписки: геометрическое распределение со средним mean_messages
+        count = 1 + int(rng.expovariate(1 / max(mean_messages - 1, 1e-9)))
+        messages = list(
+            _conversation(rng, client, count, created_at, now, incoming_texts)
+        )
+        if messages:
+            client["messages_count"] = len(messages)
+            client["last_message_at"] = messages[-1]["timestamp"]
+            client["updated_at"] = messages[-1]["timestamp"]
+        dataset.clients.append(client)
+        dataset.messages.extend(messages)
+
+    return dataset
+
+
+def generate_dataset(
+    users: int, clients: int, mean_messages: float, seed: int = 42, **kwargs
+) -> Iterator[UserDataset]:
+    incoming_texts = load_training_data()[0]
+    for user_id in user_ids(users, seed):
+        yield generate_user(
+            user_id,
+            clients,
+            mean_messages,
+            seed,
+            incoming_texts=incoming_texts,
+            **kwargs,
+        )
+
+
+def _conversation(rng, client, count, started_at, now, incoming_texts):
+    """Сообщения приходят всплесками: короткие паузы внутри сессии, длинные между ними"""
+    timestamp = started_at
+    incoming = True
+    for _ in range(count):
+        if timestamp > now:
+            return
+        yield {
+            "id": _uuid(rng),
+            "client_id": client["id"],
+            "content": rng.choice(incoming_texts if incoming else REPLIES),
+            "message_type": (
+                MessageType.INCOMING.value if incoming else MessageType.OUTGOING.value
+            ),
+            "source": client["source"] if incoming else "system",
+            "timestamp": timestamp,
+            "is_read": not incoming or rng.random() < 0.8,
+            "external_id": None,
+            "user_id": client["user_id"],
+        }
+
+        if rng.random() < 0.15:
+            timestamp += timedelta(hours=rng.expovariate(1 / SESSION_GAP_HOURS))
+        else:
+            timestamp += timedelta(minutes=rng.expovariate(1 / BURST_GAP_MINUTES))
+        # Клиент иногда пишет несколько сообщений подряд
+        incoming = not incoming if rng.random() < 0.7 else incoming
+
+
+def _weighted(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+async def write_dataset(
+    db,
+    users: int,
+    clients: int,
+    mean_messages: float,
+    seed: int = 42,
+    chunk_size: int = 1000,
+    concurrency: int = 4,
+    replace: bool = False,
+) -> Dict[str, int]:
+    """Пишет данные пачками insert_many; пользователи обрабатываются параллельно"""
+    ids = user_ids(users, seed)
+    if replace:
+        for name in ("listings", "clients", "messages"):
+            await db[name].delete_many({"user_id": {"$in": ids}})
+
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"listings": 0, "clients": 0, "messages": 0}
+    incoming_texts = load_training_data()[0]
+
+    async def write_user(user_id: str) -> None:
+        async with semaphore:
+            # Генерация занимает CPU, поэтому выносим ее из цикла событий
+            dataset = await asyncio.to_thread(
+                generate_user,
+                user_id,
+                clients,
+                mean_messages,
+                seed,
+                incoming_texts=incoming_texts,
+            )
+            for name in totals:
+                documents = getattr(dataset, name)
+                for start in range(0, len(documents), chunk_size):
+                    await db[name].insert_many(
+                        documents[start : start + chunk_size], ordered=False
+                    )
+                totals[name] += len(documents)
+
+    await asyncio.gather(*(write_user(user_id) for user_id in ids))
+    return totals
+
+
+async def main(args) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    started = time.perf_counter()
+    totals = await write_dataset(
+        client[args.db],
+        args.users,
+        args.clients,
+        args.messages,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        replace=args.replace,
+    )
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    print(f"✅ Синтетические данные записаны в {args.db} за {elapsed:.1f} с")
+    for name, count in totals.items():
+        print(f"   - {name}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument(
+        "--clients", type=int, default=200, help="клиентов на пользователя"
+    )
+    parser.add_argument(
+        "--messages", type=float, default=12, help="среднее сообщений на клиента"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    )
+    parser.add_argument(
+        "--db", default=os.environ.get("SYNTHETIC_DB_NAME", "leadgram_synthetic")
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="удалить прежние документы сгенерированных пользователей",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend import database
+from backend.database import db
+from backend.services.activity_buffer import ActivityBuffer
+from backend.services.client_service import ClientService
+from backend.utils.memory import MemoryClient, MemoryDatabase
+from backend.utils.partitioning import Partition, PartitionRouter, bind_user
+
+
+def run(coro):
+    # Отдельный цикл: asyncio.run() сбросил бы цикл по умолчанию для других тестов
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.bulk_writes = 0
+
+    def __getattr__(self, attr):
+        return getattr(self.collection, attr)
+
+    async def bulk_write(self, requests, **kwargs):
+        self.bulk_writes += 1
+        return await self.collection.bulk_write(requests, **kwargs)
+
+
+def test_burst_is_coalesced_into_one_write():
+    clients = MemoryDatabase().clients
+    counting = CountingCollection(clients)
+    buffer = ActivityBuffer(counting, flush_ms=20)
+    service = ClientService(counting, activity_buffer=buffer)
+    start = datetime(2026, 5, 1, 12)
+
+    async def scenario():
+        await clients.insert_one(
+            {"id": "c1", "user_id": "1", "messages_count": 3, "last_message_at": start}
+        )
+        # Сообщения приходят не по порядку: время берется максимальное
+        for i in (5, 19, 0, 7):
+            await buffer.record("c1", "1", start + timedelta(seconds=i))
+        for _ in range(16):
+            await service.update_last_message("c1", "1")
+        await service.update_last_message("c2", "1")
+
+        assert counting.bulk_writes == 0
+        overlay = buffer.apply(await clients.find_one({"id": "c1"}))
+        assert overlay["messages_count"] == 23
+
+        await asyncio.sleep(0.1)
+        return await clients.find_one({"id": "c1"})
+
+    document = run(scenario())
+    assert counting.bulk_writes == 1
+    assert document["messages_count"] == 23
+    assert document["last_message_at"] > start + timedelta(seconds=19)
+    assert buffer.stats()["written"] == 2
+    assert 'client_activity_flush_lag_seconds_count{collection="clients"} 2' in (
+        buffer.render()
+    )
+
+
+def test_exact_reads_threshold_and_close_flush():
+    clients = MemoryDatabase().clients
+    buffer = ActivityBuffer(clients, flush_ms=60000, max_pending=3)
+    service = ClientService(clients, activity_buffer=buffer)
+
+    async def scenario():
+        for i in range(4):
+            await clients.insert_one(
+                {"id": f"c{i}", "user_id": "1", "name": f"Клиент {i}", "source": "olx"}
+            )
+
+        await service.update_last_message("c0", "1")
+        exact = await service.get_client("c0", "1")
+        assert exact.messages_count == 1
+
+        # Третий клиент в буфере запускает сброс без ожидания окна
+        for i in (1, 2, 3):
+            await service.update_last_message(f"c{i}", "1")
+        flushed = await clients.count_documents({"messages_count": 1})
+        assert buffer.pending_count() == 0
+
+        await service.update_last_message("c3", "1")
+        await buffer.close()
+        return flushed, await clients.find_one({"id": "c3"})
+
+    flushed, last = run(scenario())
+    assert flushed == 4
+    assert last["messages_count"] == 2
+
+
+def test_flush_writes_to_each_user_partition():
+    client = MemoryClient()
+    for name in ("a", "b"):
+        run(client.drop_database(f"activity_{name}"))
+    router = PartitionRouter(
+        [
+            Partition("a", client, "activity_a"),
+            Partition("b", client, "activity_b"),
+        ]
+    )
+    database.set_router(router)
+    user_a = next(str(i) for i in range(100) if router.partition_for(str(i)) == "a")
+    user_b = next(str(i) for i in range(100) if router.partition_for(str(i)) == "b")
+    buffer = ActivityBuffer(db.clients, flush_ms=60000)
+
+    async def scenario():
+        for user_id in (user_a, user_b):
+            bind_user(user_id)
+            await db.clients.insert_one({"id": "c", "user_id": user_id})
+            await buffer.record("c", user_id)
+        # Сброс из контекста другого продавца
+        await buffer.flush()
+        return [
+            await client[f"activity_{name}"].clients.find_one({}) for name in ("a", "b")
+        ]
+
+    try:
+        in_a, in_b = run(scenario())
+    finally:
+        database.set_router(None)
+    assert (in_a["user_id"], in_a["messages_count"]) == (user_a, 1)
+    assert (in_b["user_id"], in_b["messages_count"]) == (user_b, 1)
@@ -0,0 +1,87 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+
+from backend import database
+from backend.app import create_app
+from backend.settings import Settings
+from backend.utils.memory import MemoryClient
+
+
+def run(coro):
+    # Отдельный цикл: asyncio.run() сбросил бы цикл по умолчанию для других тестов
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_app_starts_without_env_and_skips_disabled_subsystems(monkeypatch):
+    monkeypatch.delenv("MONGO_URL", raising=False)
+    monkeypatch.delenv("DB_NAME", raising=False)
+    monkeypatch.setenv("ENVIRONMENT", "development")
+
+    settings = Settings(
+        mongo_url="mongodb://memory",
+        db_name="app_test",
+        ai_enabled=False,
+        automation_enabled=False,
+    )
+    app = create_app(settings, client=MemoryClient())
+    paths = {route.path for route in app.routes}
+    assert "/api/clients/dashboard" in paths
+    assert not any(path.startswith(("/api/ai", "/api/automation")) for path in paths)
+
+    async def scenario():
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://t"
+            ) as http:
+                health = await http.get("/api/health")
+                dashboard = await http.get("/api/clients/dashboard")
+        finally:
+            await app.router.shutdown()
+        return health, dashboard
+
+    health, dashboard = run(scenario())
+    assert health.json()["status"] == "healthy"
+    assert dashboard.status_code == 200
+
+
+def test_app_runs_on_sqlite_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    database.close_client()
+    settings = Settings(
+        storage="sqlite",
+        sqlite_path=tmp_path / "crm.sqlite3",
+        ai_enabled=False,
+        automation_enabled=False,
+    )
+    app = create_app(settings)
+
+    async def scenario():
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://t"
+            ) as http:
+                health = await http.get("/api/health")
+                search = await http.get(
+                    "/api/messages/search", params={"query": "цена"}
+                )
+        finally:
+            await app.router.shutdown()
+        return health, search
+
+    health, search = run(scenario())
+    assert health.json()["status"] == "healthy"
+    assert search.status_code == 200
+    assert (tmp_path / "crm.sqlite3").exists()
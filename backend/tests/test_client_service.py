@@ -11,6 +11,7 @@ from backend.models.client import (
     ClientUpdate,
     MessageSource,
     ClientStatus,
+    ClientOrder,
 )
 
 
@@ -135,3 +136,18 @@ def test_update_client():
     assert updated is not None
     assert updated.name == "New"
     assert updated.status == ClientStatus.CLOSED
+
+
+def test_get_clients_priority_order():
+    collection = FakeCollection()
+    service = ClientService(collection)
+    for name, score in [("Low", 10.0), ("High", 90.0), ("Mid", 50.0)]:
+        created = run(
+            service.create_client(
+                ClientCreate(name=name, source=MessageSource.OLX), user_id="1"
+            )
+        )
+        run(collection.update_one({"id": created.id}, {"$set": {"score": score}}))
+
+    clients = run(service.get_clients(user_id="1", order=ClientOrder.PRIORITY))
+    assert [c.name for c in clients] == ["High", "Mid", "Low"]
@@ -0,0 +1,121 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+import pytest
+
+from backend.app import create_app
+from backend.models.message import MessageCreate, MessageType
+from backend.services.deduplication import BloomFilter, MessageDeduplicator
+from backend.services.message_service import DuplicateMessageError, MessageService
+from backend.settings import Settings
+from backend.utils.memory import MemoryClient, MemoryDatabase
+
+
+def run(coro):
+    # Отдельный цикл: asyncio.run() сбросил бы цикл по умолчанию для других тестов
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def incoming(external_id, integration_id="i1"):
+    return MessageCreate(
+        client_id="c1",
+        content="Еще продается?",
+        message_type=MessageType.INCOMING,
+        source="telegram",
+        external_id=external_id,
+        integration_id=integration_id,
+    )
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"key{i}")
+    assert all(f"key{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 200
+
+
+def test_duplicates_rejected_by_filter_and_by_index():
+    messages = MemoryDatabase().messages
+    first = MessageService(messages, deduplicator=MessageDeduplicator(messages))
+    # Второй воркер со своим пустым фильтром
+    second_filter = MessageDeduplicator(messages)
+    second = MessageService(messages, deduplicator=second_filter)
+
+    async def scenario():
+        await first.deduplicator.ensure_indexes()
+        await first.create_message(incoming("100:1"), "1")
+        assert await first.is_duplicate("i1", "100:1")
+
+        assert not await second.is_duplicate("i1", "100:1")
+        with pytest.raises(DuplicateMessageError):
+            await second.create_message(incoming("100:1"), "1")
+        assert await second.is_duplicate("i1", "100:1")
+
+        # Тот же external_id из другой интеграции или импорта - другое сообщение
+        await first.create_message(incoming("100:1", "i2"), "1")
+        await messages.insert_one({"id": "m", "user_id": "1", "external_id": "100:1"})
+        return await messages.count_documents({})
+
+    assert run(scenario()) == 3
+    assert first.deduplicator.results == {
+        "new": 0,
+        "filter": 1,
+        "index": 0,
+        "false_positive": 0,
+    }
+    assert second_filter.results["index"] == 1
+    assert second_filter.results["filter"] == 1
+    assert 'message_dedupe_total{result="index"} 1' in second_filter.render()
+
+
+def test_redelivered_message_does_not_inflate_counter(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    settings = Settings(
+        mongo_url="mongodb://memory",
+        db_name="dedupe_test",
+        ai_enabled=False,
+        automation_enabled=False,
+    )
+    app = create_app(settings, client=MemoryClient())
+
+    async def scenario():
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://t"
+            ) as http:
+                created = await http.post(
+                    "/api/clients/", json={"name": "Ольга", "source": "telegram"}
+                )
+                client_id = created.json()["id"]
+                body = {
+                    "client_id": client_id,
+                    "content": "Здравствуйте",
+                    "message_type": "incoming",
+                    "source": "telegram",
+                    "external_id": "555:7",
+                    "integration_id": "i1",
+                }
+                statuses = [
+                    (await http.post("/api/messages/", json=body)).status_code
+                    for _ in range(3)
+                ]
+                client = await http.get(f"/api/clients/{client_id}")
+        finally:
+            await app.router.shutdown()
+        return statuses, client.json()
+
+    statuses, client = run(scenario())
+    assert statuses == [200, 409, 409]
+    assert client["messages_count"] == 1
@@ -0,0 +1,115 @@
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.export_service import ExportService, ExportFormat
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda d: d[field], reverse=direction == -1)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class ExportCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return AsyncCursor([d for d in self.docs if d["user_id"] == query["user_id"]])
+
+
+def make_messages(count):
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "id": str(i),
+            "client_id": "c1",
+            "content": f"Сообщение, {i}",
+            "message_type": "incoming",
+            "source": "olx",
+            "timestamp": start + timedelta(minutes=i),
+            "is_read": False,
+            "user_id": "1",
+        }
+        for i in range(count)
+    ]
+
+
+def collect(service, export_format, **filters):
+    async def scenario():
+        return [
+            chunk
+            async for chunk in service.stream("messages", "1", export_format, **filters)
+        ]
+
+    return asyncio.run(scenario())
+
+
+def test_csv_and_ndjson_are_streamed_in_batches():
+    collection = ExportCollection(make_messages(25))
+    service = ExportService({"messages": collection}, batch_size=10)
+
+    chunks = collect(service, ExportFormat.CSV)
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 25
+    assert rows[0]["content"] == "Сообщение, 0"
+    assert rows[0]["timestamp"] == "2026-01-01T00:00:00"
+
+    lines = b"".join(collect(service, ExportFormat.NDJSON)).decode().splitlines()
+    assert json.loads(lines[-1])["id"] == "24"
+
+
+def test_parquet_row_groups_and_filters():
+    collection = ExportCollection(make_messages(25))
+    service = ExportService({"messages": collection}, batch_size=10)
+
+    data = b"".join(
+        collect(
+            service,
+            ExportFormat.PARQUET,
+            date_from=datetime(2026, 1, 1),
+            source="olx",
+        )
+    )
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_rows == 25
+    assert parquet.metadata.num_row_groups == 3
+    assert collection.queries[-1] == {
+        "user_id": "1",
+        "source": "olx",
+        "timestamp": {"$gte": datetime(2026, 1, 1)},
+    }
+
+
+def test_empty_export_has_header():
+    service = ExportService({"messages": ExportCollection([])})
+    data = b"".join(collect(service, ExportFormat.CSV)).decode()
+    assert data.startswith("id,client_id,content")
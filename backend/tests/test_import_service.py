@@ -0,0 +1,101 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from pymongo import InsertOne, UpdateOne
+
+from backend.models.import_job import ImportFormat
+from backend.services.import_service import ImportService, _read_rows
+
+
+class BulkResult:
+    def __init__(self, details):
+        self.bulk_api_result = details
+
+
+class BulkCollection:
+    def __init__(self):
+        self.requests = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.requests.append(requests)
+        upserted = [
+            {"index": i, "_id": i}
+            for i, r in enumerate(requests)
+            if isinstance(r, UpdateOne)
+            and r._doc.get("$setOnInsert", {}).get("content") != "дубль"
+        ]
+        inserted = sum(isinstance(r, InsertOne) for r in requests)
+        return BulkResult(
+            {
+                "nInserted": inserted,
+                "nUpserted": len(upserted),
+                "nModified": 0,
+                "upserted": upserted,
+            }
+        )
+
+
+def make_service():
+    clients, messages = BulkCollection(), BulkCollection()
+    service = ImportService(None, clients, messages, Path("."))
+    return service, clients, messages
+
+
+def test_clients_are_validated_and_deduplicated():
+    service, clients, _ = make_service()
+    rows = [
+        (1, {"name": "Анна", "phone": "+37360000000", "source": "olx"}),
+        (2, {"name": "Борис", "external_id": "tg-42", "source": "telegram"}),
+        (3, {"name": "Без контактов", "source": "whatsapp", "phone": ""}),
+        (4, {"name": "Ошибка", "source": "fax"}),
+    ]
+    written, errors = asyncio.run(service._import_clients(rows, "1"))
+
+    ops = clients.requests[0]
+    assert [type(op) for op in ops] == [UpdateOne, UpdateOne, InsertOne]
+    assert ops[0]._filter == {"user_id": "1", "phone": "+37360000000"}
+    assert ops[1]._filter == {"user_id": "1", "external_id": "tg-42"}
+    assert written == 3
+    assert [e["row"] for e in errors] == [4]
+
+
+def test_messages_update_client_activity_only_for_new_documents():
+    service, clients, messages = make_service()
+    base = {"client_id": "c1", "message_type": "incoming", "source": "olx"}
+    rows = [
+        (1, {**base, "content": "Привет", "timestamp": "2026-01-01T10:00:00"}),
+        (2, {**base, "content": "дубль", "external_id": "m1"}),
+        (
+            3,
+            {
+                **base,
+                "content": "Цена?",
+                "external_id": "m2",
+                "timestamp": "2026-01-02T10:00:00",
+            },
+        ),
+    ]
+    written, errors = asyncio.run(service._import_messages(rows, "1"))
+
+    assert written == 2 and errors == []
+    (activity,) = clients.requests[0]
+    assert activity._doc["$inc"] == {"messages_count": 2}
+    assert activity._doc["$max"]["last_message_at"].day == 2
+
+
+def test_read_rows_streams_csv_and_reports_bad_json(tmp_path):
+    csv_path = tmp_path / "clients.csv"
+    csv_path.write_text("name,source\nАнна,olx\nБорис,telegram\n", encoding="utf-8")
+    assert [r["name"] for r in _read_rows(csv_path, ImportFormat.CSV)] == [
+        "Анна",
+        "Борис",
+    ]
+
+    jsonl_path = tmp_path / "messages.jsonl"
+    jsonl_path.write_text('{"content": "ok"}\n\n{broken\n', encoding="utf-8")
+    rows = list(_read_rows(jsonl_path, ImportFormat.JSONL))
+    assert rows[0] == {"content": "ok"}
+    assert "__parse_error__" in rows[1]
@@ -0,0 +1,81 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.ai_backend import AIPrompt, AITask, AICompletion
+from backend.services.inference_scheduler import InferenceScheduler, QueueFullError
+
+
+class RecordingBackend:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def complete_batch(self, prompts):
+        self.batches.append([p.user_id for p in prompts])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return [AICompletion(response=p.text) for p in prompts]
+
+
+def prompt(user_id, text=""):
+    return AIPrompt(task=AITask.CUSTOM_RESPONSE, text=text, user_id=user_id)
+
+
+def test_concurrent_requests_share_one_batch():
+    async def scenario():
+        backend = RecordingBackend()
+        scheduler = InferenceScheduler(backend, max_batch_size=16, max_wait_ms=20)
+        results = await asyncio.gather(
+            *(scheduler.submit(prompt("1", str(i))) for i in range(10))
+        )
+        await scheduler.close()
+        return backend, results
+
+    backend, results = asyncio.run(scenario())
+    assert [r.response for r in results] == [str(i) for i in range(10)]
+    assert len(backend.batches) == 1
+
+
+def test_batches_round_robin_between_users():
+    async def scenario():
+        backend = RecordingBackend()
+        scheduler = InferenceScheduler(
+            backend, max_batch_size=4, max_wait_ms=20, max_concurrent_batches=1
+        )
+        requests = [scheduler.submit(prompt("busy")) for _ in range(8)]
+        requests += [scheduler.submit(prompt("quiet")) for _ in range(2)]
+        await asyncio.gather(*requests)
+        await scheduler.close()
+        return backend
+
+    backend = asyncio.run(scenario())
+    assert backend.batches[0] == ["busy", "quiet", "busy", "quiet"]
+
+
+def test_queue_depth_and_timeout():
+    async def scenario():
+        scheduler = InferenceScheduler(
+            RecordingBackend(delay=1),
+            max_batch_size=1,
+            max_wait_ms=0,
+            max_queue_depth=1,
+            timeout_seconds=0.05,
+        )
+        first = asyncio.ensure_future(scheduler.submit(prompt("1")))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await scheduler.submit(prompt("2"))
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        stats = scheduler.stats()
+        await scheduler.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["timed_out"] == 1
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.intent_classifier import (
+    IntentClassifier,
+    get_intent_classifier,
+)
+
+
+def test_classify_batch_handles_inflections():
+    classifier = get_intent_classifier()
+    labels = classifier.classify_batch(
+        [
+            "Сколько за велосипед хотите?",
+            "Когда можно подъехать посмотреть?",
+            "а царапины есть на корпусе",
+            "ещё продаёте?",
+            "можете отправить почтой",
+        ]
+    )
+    assert labels == ["price", "meeting", "condition", "availability", "delivery"]
+
+
+def test_batch_matches_single_and_low_confidence_is_other():
+    classifier = get_intent_classifier()
+    texts = ["Цену скинете?", "", "Добрый день"]
+    assert classifier.classify_batch(texts) == [classifier.classify(t) for t in texts]
+    assert classifier.classify("", min_confidence=0.5) == "other"
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    classifier = get_intent_classifier()
+    path = tmp_path / "intent_model.npz"
+    classifier.save(path)
+
+    loaded = IntentClassifier.load(path)
+    texts = ["Какая цена?", "Где встретимся?"]
+    assert loaded.labels == classifier.labels
+    assert loaded.classify_batch(texts) == classifier.classify_batch(texts)
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.lead_scoring import score_leads
+
+
+def test_score_leads_orders_hot_leads_first():
+    # 0: горячий лид ждет ответа, 1: отвеченный старый, 2: закрытый
+    scores = score_leads(
+        messages_count=np.array([6.0, 2.0, 10.0]),
+        hours_since_message=np.array([0.5, 72.0, 0.1]),
+        hours_waiting=np.array([0.5, np.nan, 0.1]),
+        intent_weight=np.array([1.0, 0.2, 1.0]),
+        source_weight=np.array([1.0, 0.8, 1.0]),
+        listing_price=np.array([20000.0, np.nan, 5000.0]),
+        closed=np.array([False, False, True]),
+    )
+    assert scores[0] > scores[1] > scores[2] == 0.0
+    assert 0 <= scores.min() and scores.max() <= 100
+
+
+def test_waiting_too_long_lowers_priority():
+    def score(hours_waiting):
+        return score_leads(
+            messages_count=np.array([3.0]),
+            hours_since_message=np.array([hours_waiting]),
+            hours_waiting=np.array([hours_waiting]),
+            intent_weight=np.array([1.0]),
+            source_weight=np.array([1.0]),
+            listing_price=np.array([np.nan]),
+            closed=np.array([False]),
+        )[0]
+
+    assert score(2) > score(0.05)
+    assert score(2) > score(96)
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.listing_analysis import analyze_listings, listing_report
+
+FULL_TEXT = (
+    "Продаю iPhone 12 в отличном состоянии, батарея 90 процентов. "
+    "Полный комплект, гарантия еще полгода, модель 128 гб памяти. "
+    "Цена 8000 лей, небольшой торг. Фото пришлю по запросу. "
+    "Самовывоз из центра Кишинева, район Ботаника. "
+    "Телефон не ремонтировался, экран без царапин, все функции работают."
+)
+
+
+def test_features_and_score():
+    frame = analyze_listings(
+        [
+            {
+                "listing_id": "full",
+                "listing_text": FULL_TEXT,
+                "category": "electronics",
+            },
+            {"listing_id": "short", "listing_text": "Диван", "category": "furniture"},
+        ]
+    )
+    full, short = listing_report(frame)
+
+    assert full["has_price"] and full["mentions_photo"] and full["mentions_location"]
+    assert full["keyword_coverage"] == 1.0
+    assert full["score"] > 90
+    assert full["suggestions"] == []
+
+    assert not short["has_price"]
+    assert short["score"] < 10
+    assert "Укажите цену" in short["suggestions"]
+
+
+def test_duplicate_phrasing_between_listings():
+    shared = "Отличное состояние, торг уместен при осмотре. "
+    frame = analyze_listings(
+        [
+            {"listing_id": "a", "listing_text": shared + "Цвет синий, размер М."},
+            {"listing_id": "b", "listing_text": shared + "Бренд известный."},
+            {
+                "listing_id": "c",
+                "listing_text": "Совсем другой текст без повторов тут.",
+            },
+        ]
+    )
+    ratios = dict(zip(frame["listing_id"], frame["duplicate_ratio"]))
+    assert ratios["a"] > 0 and ratios["b"] > 0
+    assert ratios["c"] == 0
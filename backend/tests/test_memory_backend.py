@@ -0,0 +1,213 @@
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.benchmarks.services import compare
+from backend.services.attention_service import AttentionService
+from backend.utils.memory import MemoryCollection, MemoryDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_filters_updates_and_sort():
+    db = MemoryDatabase()
+    now = datetime(2026, 3, 1)
+    for i in range(5):
+        run(
+            db.clients.insert_one(
+                {
+                    "id": str(i),
+                    "user_id": "1",
+                    "score": i,
+                    "created_at": now - timedelta(days=i),
+                }
+            )
+        )
+    run(db.clients.insert_one({"id": "x", "user_id": "2", "score": 100}))
+
+    query = {
+        "user_id": "1",
+        "created_at": {"$gte": now - timedelta(days=2)},
+        "id": {"$ne": "0"},
+    }
+    found = run(db.clients.find(query, {"_id": 0}).sort("score", -1).to_list(length=10))
+    assert [c["id"] for c in found] == ["2", "1"]
+    assert "_id" not in found[0]
+
+    result = run(
+        db.clients.update_one(
+            {"id": "1"}, {"$inc": {"score": 10}, "$set": {"status": "closed"}}
+        )
+    )
+    assert result.modified_count == 1
+    assert run(db.clients.count_documents({"status": {"$exists": True}})) == 1
+
+    upsert = run(
+        db.clients.bulk_write(
+            [
+                UpdateOne(
+                    {"id": "new", "user_id": "1"},
+                    {"$setOnInsert": {"score": 0}},
+                    upsert=True,
+                ),
+                InsertOne({"id": "y"}),
+            ]
+        )
+    )
+    assert upsert.bulk_api_result["nUpserted"] == 1
+    assert run(db.clients.find_one({"id": "new"}))["user_id"] == "1"
+
+
+def test_attention_service_runs_on_memory_backend():
+    db = MemoryDatabase()
+    now = datetime.utcnow()
+    run(
+        db.clients.insert_one(
+            {
+                "id": "c1",
+                "user_id": "1",
+                "listing_id": "l1",
+                "listing_title": "Диван",
+                "status": "new",
+                "last_message_at": now,
+            }
+        )
+    )
+    for i in range(6):
+        run(
+            db.messages.insert_one(
+                {
+                    "id": str(i),
+                    "client_id": "c1",
+                    "user_id": "1",
+                    "message_type": "incoming",
+                    "timestamp": now - timedelta(hours=i),
+                }
+            )
+        )
+
+    listings = run(
+        AttentionService(
+            db.clients, db.messages, db.listings
+        ).get_listings_requiring_attention("1")
+    )
+    assert listings[0]["listing_id"] == "l1"
+    assert listings[0]["reason"] == "high_volume"
+    assert listings[0]["incoming_count"] == 6
+
+
+def test_indexed_queries_match_full_scan():
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1)
+    indexed = MemoryDatabase().messages
+    plain = MemoryCollection("messages")
+    for i in range(2000):
+        document = {
+            "id": str(i),
+            "user_id": str(rng.randrange(20)),
+            "client_id": f"c{rng.randrange(200)}",
+            "timestamp": start + timedelta(minutes=i),
+            "status": rng.choice(["new", "read", None]),
+        }
+        if i % 97 == 0:
+            del document["timestamp"]
+        run(indexed.insert_one(dict(document)))
+        run(plain.insert_one(dict(document)))
+    assert indexed.indexes and not plain.indexes
+
+    # Обновления и удаления должны поддерживать индексы
+    for collection in (indexed, plain):
+        run(collection.update_many({"user_id": "3"}, {"$set": {"user_id": "4"}}))
+        run(collection.delete_many({"client_id": {"$in": ["c1", "c2"]}}))
+
+    for _ in range(100):
+        since = start + timedelta(minutes=rng.randrange(2000))
+        query = {"user_id": str(rng.randrange(20))}
+        if rng.random() < 0.5:
+            query["timestamp"] = {"$gte": since}
+        if rng.random() < 0.3:
+            query["status"] = {"$ne": None}
+        if rng.random() < 0.2:
+            query = {"client_id": {"$in": [f"c{rng.randrange(200)}" for _ in range(3)]}}
+        limit = rng.choice([0, 1, 25])
+
+        results = [
+            run(c.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list())
+            for c in (indexed, plain)
+        ]
+        assert [d.get("timestamp") for d in results[0]] == [
+            d.get("timestamp") for d in results[1]
+        ]
+        assert run(indexed.count_documents(query)) == run(plain.count_documents(query))
+
+
+def test_unique_index_rejects_duplicates():
+    db = MemoryDatabase()
+    run(db.metrics.create_index([("user_id", 1), ("day", 1)], unique=True))
+    run(db.metrics.insert_one({"user_id": "1", "day": "2026-01-01"}))
+    with pytest.raises(DuplicateKeyError):
+        run(db.metrics.insert_one({"user_id": "1", "day": "2026-01-01"}))
+
+    run(db.metrics.insert_one({"user_id": "1", "day": "2026-01-02"}))
+    with pytest.raises(DuplicateKeyError):
+        run(
+            db.metrics.update_one(
+                {"day": "2026-01-02"}, {"$set": {"day": "2026-01-01"}}
+            )
+        )
+    assert run(db.metrics.count_documents({"day": "2026-01-02"})) == 1
+
+
+def test_facet_and_indexed_lookup():
+    db = MemoryDatabase()
+    for i in range(4):
+        run(db.clients.insert_one({"id": f"c{i}", "status": "new" if i % 2 else "won"}))
+    for i in range(10):
+        run(db.messages.insert_one({"id": str(i), "client_id": f"c{i % 4}"}))
+
+    (result,) = run(
+        db.messages.aggregate(
+            [
+                {
+                    "$lookup": {
+                        "from": "clients",
+                        "localField": "client_id",
+                        "foreignField": "id",
+                        "as": "client",
+                    }
+                },
+                {"$unwind": "$client"},
+                {
+                    "$facet": {
+                        "total": [{"$count": "n"}],
+                        "by_status": [
+                            {"$group": {"_id": "$client.status", "count": {"$sum": 1}}},
+                            {"$sort": {"_id": 1}},
+                        ],
+                    }
+                },
+            ]
+        ).to_list()
+    )
+    assert result["total"] == [{"n": 10}]
+    assert result["by_status"] == [
+        {"_id": "new", "count": 5},
+        {"_id": "won", "count": 5},
+    ]
+
+
+def test_regression_gate_flags_only_large_slowdowns():
+    baseline = {"a": 1.0, "b": 1.0}
+    regressions = compare({"a": 0.5, "b": 0.8, "new": 0.1}, baseline, threshold=0.3)
+    assert list(regressions) == ["a"]
+    assert round(regressions["a"], 2) == 0.5
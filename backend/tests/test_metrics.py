@@ -0,0 +1,50 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from backend.utils.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_middleware_groups_requests_by_route_template():
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get("/api/clients/{client_id}")
+    async def get_client(client_id: str):
+        if client_id == "missing":
+            raise HTTPException(status_code=404, detail="Клиент не найден")
+        return {"id": client_id}
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as http:
+            for path in ("/api/clients/1", "/api/clients/2", "/api/clients/missing"):
+                await http.get(path)
+            await http.get("/nowhere")
+
+    run(scenario())
+
+    route = ("GET", "/api/clients/{client_id}")
+    assert registry.latency[route].count == 3
+    assert registry.responses[route + (200,)] == 2
+    assert registry.responses[route + (404,)] == 1
+    assert registry.responses[("GET", "unmatched", 404)] == 1
+    assert registry.in_flight == 0
+
+    text = registry.render()
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",'
+        'route="/api/clients/{client_id}",le="+Inf"} 3'
+    ) in text
+    assert 'http_response_size_bytes_count{method="GET",route="unmatched"} 1' in text
@@ -0,0 +1,113 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend import database
+from backend.database import db
+from backend.utils import partitioning
+from backend.utils.memory import MemoryClient
+from backend.utils.partitioning import HashRing, Partition, PartitionRouter, bind_user
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_router(prefix):
+    client = MemoryClient()
+    for name in ("a", "b"):
+        run(client.drop_database(f"{prefix}_{name}"))
+    return PartitionRouter(
+        [Partition("a", client, f"{prefix}_a"), Partition("b", client, f"{prefix}_b")]
+    )
+
+
+def test_hash_ring_moves_few_keys_when_node_added():
+    keys = [str(i) for i in range(5000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    counts = {}
+    for key in keys:
+        counts[before.node_for(key)] = counts.get(before.node_for(key), 0) + 1
+    assert min(counts.values()) > len(keys) / 3 * 0.7
+
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+    assert all(after.node_for(key) == "d" for key in moved)
+    assert len(moved) < len(keys) / 4 * 1.3
+
+
+def test_collections_resolve_to_user_partition():
+    router = make_router("route")
+    database.set_router(router)
+    try:
+        user_a = next(str(i) for i in range(100) if router.partition_for(str(i)) == "a")
+        user_b = next(str(i) for i in range(100) if router.partition_for(str(i)) == "b")
+
+        async def write(user_id):
+            bind_user(user_id)
+            await db.clients.insert_one({"id": f"c{user_id}", "user_id": user_id})
+            await db.integrations.insert_one({"id": f"i{user_id}", "user_id": user_id})
+
+        async def scenario():
+            await write(user_a)
+            await write(user_b)
+            await router.set_override(user_b, "a")
+            await write(user_b)
+
+        run(scenario())
+        home, other = (router.partitions[n].database for n in ("a", "b"))
+        assert [d["user_id"] for d in home.clients.documents] == [user_a, user_b]
+        assert [d["user_id"] for d in other.clients.documents] == [user_b]
+        # Глобальные коллекции всегда в домашнем разделе
+        assert len(home.integrations.documents) == 3
+
+        reloaded = PartitionRouter(list(router.partitions.values()))
+        run(reloaded.load_overrides())
+        assert reloaded.partition_for(user_b) == "a"
+    finally:
+        database.set_router(None)
+
+
+def test_live_migration_keeps_concurrent_writes(monkeypatch):
+    monkeypatch.setattr(partitioning, "COPY_BATCH_SIZE", 50)
+    router = make_router("migrate")
+    database.set_router(router)
+    user_id = next(str(i) for i in range(100) if router.partition_for(str(i)) == "a")
+    source, target = (router.partitions[n].database for n in ("a", "b"))
+
+    async def scenario():
+        bind_user(user_id)
+        await db.clients.insert_one({"id": "c1", "user_id": user_id, "count": 0})
+        await db.messages.insert_many(
+            [{"id": str(i), "user_id": user_id} for i in range(300)]
+        )
+
+        async def writer():
+            bind_user(user_id)
+            for i in range(40):
+                await db.messages.insert_one({"id": f"new{i}", "user_id": user_id})
+                await db.clients.update_one({"id": "c1"}, {"$inc": {"count": 1}})
+                await db.messages.delete_one({"id": str(i)})
+                await asyncio.sleep(0)
+
+        migration = router.migrate(user_id, "b", ["clients", "messages"])
+        counts, _ = await asyncio.gather(migration, writer())
+        client = await db.clients.find_one({"id": "c1"})
+        return counts, client
+
+    try:
+        counts, client = run(scenario())
+    finally:
+        database.set_router(None)
+
+    assert router.partition_for(user_id) == "b"
+    assert counts["clients"] == 1
+    assert client["count"] == 40
+    ids = {d["id"] for d in target.messages.documents}
+    assert len(ids) == len(target.messages.documents) == 300
+    assert {f"new{i}" for i in range(40)} <= ids
+    assert not ids & {str(i) for i in range(40)}
+    assert not source.messages.documents and not source.clients.documents
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+from fastapi import FastAPI
+
+from backend.utils.profiling import (
+    ProfileStore,
+    ProfilingMiddleware,
+    current_profile,
+)
+
+
+def busy_dashboard():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def make_app(store):
+    app = FastAPI()
+
+    @app.get("/api/clients/dashboard")
+    async def dashboard():
+        busy_dashboard()
+        # Так CommandListener сообщает время команд MongoDB
+        current_profile.get() and current_profile.get().record_db("find", 12.5)
+        await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, store=store)
+    return app
+
+
+def call(app, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as http:
+            return await http.get("/api/clients/dashboard", **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def test_admin_request_is_profiled(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    monkeypatch.setenv("ADMIN_USER_IDS", "123456789")
+    store = ProfileStore(size=2)
+    app = make_app(store)
+
+    response = call(app, headers={"X-Profile": "1"})
+    profile = store.get(response.headers["x-profile-id"])
+
+    summary = profile.summary()
+    assert summary["status"] == 200
+    assert summary["db_ms"] == 12.5
+    assert summary["cpu_ms"] > 10
+    assert summary["wall_ms"] >= 60
+    assert "busy_dashboard" in profile.folded()
+
+    # Кольцевой буфер хранит только последние профили
+    for _ in range(2):
+        call(app, params={"profile": "1"})
+    assert store.get(profile.id) is None
+    assert len(store.list()) == 2
+
+
+def test_flag_is_ignored_for_non_admins(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    monkeypatch.setenv("ADMIN_USER_IDS", "")
+    store = ProfileStore()
+    app = make_app(store)
+
+    response = call(app, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert store.list() == []
@@ -0,0 +1,95 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.utils.query_stats import (
+    QueryMonitor,
+    plan_summary,
+    query_shape,
+    query_source,
+    track_queries,
+)
+
+
+def event(request_id, command_name, command, reply=None, micros=0):
+    return SimpleNamespace(
+        request_id=request_id,
+        command_name=command_name,
+        command=command,
+        reply=reply or {},
+        duration_micros=micros,
+        database_name="leadgram",
+    )
+
+
+def test_shape_hides_values():
+    first = query_shape(
+        "find", {"find": "clients", "filter": {"user_id": "1", "score": {"$gte": 5}}}
+    )
+    second = query_shape(
+        "find", {"find": "clients", "filter": {"user_id": "2", "score": {"$gte": 9}}}
+    )
+    assert (
+        first == second == 'find {"filter": {"user_id": "?", "score": {"$gte": "?"}}}'
+    )
+
+
+def test_commands_are_attributed_to_service_methods():
+    monitor = QueryMonitor(slow_ms=50)
+    seen = []
+
+    @track_queries
+    class Service:
+        async def get_clients(self):
+            seen.append(query_source.get())
+            find = {"find": "clients", "filter": {"user_id": "1"}}
+            monitor.started(event(1, "find", find))
+            monitor.succeeded(
+                event(
+                    1,
+                    "find",
+                    find,
+                    {"cursor": {"id": 77, "firstBatch": [{}] * 101}},
+                    micros=20000,
+                )
+            )
+            more = {"getMore": 77, "collection": "clients"}
+            monitor.started(event(2, "getMore", more))
+            monitor.succeeded(
+                event(
+                    2,
+                    "getMore",
+                    more,
+                    {"cursor": {"id": 0, "nextBatch": [{}] * 9}},
+                    micros=40000,
+                )
+            )
+
+    asyncio.run(Service().get_clients())
+    assert seen == ["Service.get_clients"]
+    assert query_source.get() == "unknown"
+
+    [stats] = monitor.top()
+    assert stats["source"] == "Service.get_clients"
+    assert stats["count"] == 1
+    assert stats["documents"] == 110
+    assert stats["total_ms"] == 60.0
+    assert stats["slow"] == 0
+    assert 'source="Service.get_clients",collection="clients"' in "\n".join(
+        monitor.render()
+    )
+
+
+def test_plan_summary_reads_winning_plan():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"},
+            }
+        }
+    }
+    assert plan_summary(explain) == "IXSCAN(user_id_1) > FETCH"
@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+
+from backend.app import create_app
+from backend.database import db
+from backend.settings import Settings
+from backend.utils.memory import MemoryClient, MemoryDatabase
+from backend.utils.rate_limit import Limit, MemoryRateLimiter, SharedRateLimiter
+
+
+def run(coro):
+    # Отдельный цикл: asyncio.run() сбросил бы цикл по умолчанию для других тестов
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_memory_buckets_allow_burst_and_charge_all_or_nothing():
+    limiter = MemoryRateLimiter()
+    integration = ("integration", "integration:a", Limit(0.5, 3))
+    user = ("user", "user:1", Limit(100.0, 4))
+
+    async def scenario():
+        waits = [await limiter.acquire([integration, user]) for _ in range(4)]
+        # Отказ по интеграции не списывает токен продавца
+        other = ("integration", "integration:b", Limit(100.0, 10))
+        return waits, await limiter.acquire([other, user])
+
+    waits, other = run(scenario())
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 1.9 < waits[3] <= 2.0
+    assert other == 0.0
+    assert limiter.stats.throttled == {"integration": 1}
+    assert 'webhook_rate_limit_total{result="allowed"} 4' in limiter.render()
+
+
+def test_shared_buckets_are_common_for_workers():
+    collection = MemoryDatabase().rate_limits
+    workers = [SharedRateLimiter(collection), SharedRateLimiter(collection)]
+    bucket = [("integration", "integration:a", Limit(1.0, 5))]
+
+    async def scenario():
+        await workers[0].ensure_indexes()
+        return await asyncio.gather(*(workers[i % 2].acquire(bucket) for i in range(8)))
+
+    waits = run(scenario())
+    assert sum(1 for wait in waits if wait == 0.0) == 5
+
+
+def test_flooding_integration_gets_429():
+    settings = Settings(
+        mongo_url="mongodb://memory",
+        db_name="rate_limit_test",
+        ai_enabled=False,
+        automation_enabled=False,
+    )
+    app = create_app(settings, client=MemoryClient())
+
+    async def scenario():
+        await app.router.startup()
+        for integration_id, config in (
+            ("flood", {"rate_limit": {"per_second": 0.1, "burst": 2}}),
+            ("quiet", {"rate_limit": {"per_second": "bad"}}),
+        ):
+            await db.integrations.insert_one(
+                {
+                    "id": integration_id,
+                    "name": integration_id,
+                    "type": "olx",
+                    "config": config,
+                    "user_id": "1",
+                }
+            )
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://t"
+            ) as http:
+                flood = [
+                    await http.post("/api/integrations/webhook/flood", json={})
+                    for _ in range(3)
+                ]
+                quiet = await http.post("/api/integrations/webhook/quiet", json={})
+                metrics = await http.get("/metrics")
+        finally:
+            await app.router.shutdown()
+        return flood, quiet, metrics.text
+
+    flood, quiet, metrics = run(scenario())
+    assert [r.status_code for r in flood] == [200, 200, 429]
+    assert flood[2].headers["Retry-After"] == "10"
+    assert quiet.status_code == 200
+    assert 'webhook_rate_limit_total{result="throttled",scope="integration"}' in (
+        metrics
+    )
@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from backend import database
+from backend.database import db
+from backend.utils.memory import MemoryDatabase
+from backend.utils.partitioning import current_partition_key
+from backend.utils.query_stats import query_source
+from backend.utils.read_routing import ReadPolicy, ReadRouter, read_router
+
+
+def routed(router, collection, attr, source, user_id=None):
+    source_token = query_source.set(source)
+    user_token = current_partition_key.set(user_id)
+    try:
+        return router.route(collection, attr)
+    finally:
+        query_source.reset(source_token)
+        current_partition_key.reset(user_token)
+
+
+def test_policy_validation():
+    assert ReadPolicy.parse("secondaryPreferred:120").read_preference == (
+        SecondaryPreferred(max_staleness=120)
+    )
+    with pytest.raises(ValueError):
+        ReadPolicy.parse("secondary:30")
+    with pytest.raises(ValueError):
+        ReadPolicy.parse("fastest")
+
+
+def test_analytics_reads_go_to_secondaries_except_after_own_writes():
+    client = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    clients = client.crm.clients
+    router = ReadRouter()
+    router.configure([("MessageService.get_client_messages", "nearest:90")])
+
+    attention = routed(router, clients, "aggregate", "AttentionService.get_summary")
+    assert attention.read_preference == SecondaryPreferred(max_staleness=120)
+    assert routed(router, clients, "find", "ClientService.get_client") is clients
+    assert routed(
+        router, clients, "find", "MessageService.get_client_messages"
+    ) is not (clients)
+
+    # После ответа продавец читает свои данные с первичного узла
+    routed(router, clients, "update_one", "ClientService.update_last_message", "7")
+    after_write = routed(
+        router, clients, "aggregate", "AttentionService.get_summary", "7"
+    )
+    assert after_write is clients
+    other_user = routed(
+        router, clients, "aggregate", "AttentionService.get_summary", "8"
+    )
+    assert other_user.read_preference == SecondaryPreferred(max_staleness=120)
+    assert 'mode="primary"' in "\n".join(router.render())
+
+    # Хранилища без реплик не трогаются
+    memory = MemoryDatabase().clients
+    assert routed(router, memory, "aggregate", "AttentionService.get_summary") is memory
+
+
+def test_lazy_collections_apply_read_preference():
+    client = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    database.set_client(client)
+    token = query_source.set("ClientService.get_dashboard_stats")
+    try:
+        assert db.clients.aggregate.__self__.read_preference == SecondaryPreferred(
+            max_staleness=120
+        )
+        query_source.set("ClientService.get_clients")
+        assert db.clients.find.__self__.read_preference == Primary()
+    finally:
+        query_source.reset(token)
+        database.close_client()
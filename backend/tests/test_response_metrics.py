@@ -0,0 +1,137 @@
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.response_metrics import (
+    RELATIVE_ACCURACY,
+    LatencySketch,
+    ResponseMetricsService,
+    latency_report,
+)
+
+
+class MessageCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one(self, query, sort=None):
+        def matches(doc):
+            for key, value in query.items():
+                if isinstance(value, dict):
+                    if not doc[key] > value["$gt"]:
+                        return False
+                elif doc.get(key) != value:
+                    return False
+            return True
+
+        found = [d for d in self.docs if matches(d)]
+        if sort:
+            field, direction = sort[0]
+            found.sort(key=lambda d: d[field], reverse=direction == -1)
+        return found[0] if found else None
+
+
+class MetricsCollection:
+    def __init__(self):
+        self.requests = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.requests.extend(requests)
+
+
+class ListingCollection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(6, 1.5) + 1 for _ in range(5000))
+
+    # Два скетча за разные дни объединяются без потери точности
+    first, second = LatencySketch(), LatencySketch()
+    for i, value in enumerate(values):
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+
+    assert first.count == len(values)
+    for q in (0.5, 0.9):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(first.quantile(q) - exact) / exact <= RELATIVE_ACCURACY + 1e-9
+
+
+def test_record_reply_measures_oldest_unanswered_message():
+    start = datetime(2026, 3, 1, 12, 0)
+    messages = MessageCollection(
+        [
+            {
+                "client_id": "c1",
+                "user_id": "1",
+                "message_type": "incoming",
+                "timestamp": start,
+            },
+            {
+                "client_id": "c1",
+                "user_id": "1",
+                "message_type": "outgoing",
+                "timestamp": start + timedelta(minutes=5),
+            },
+            {
+                "client_id": "c1",
+                "user_id": "1",
+                "message_type": "incoming",
+                "timestamp": start + timedelta(minutes=10),
+            },
+            {
+                "client_id": "c1",
+                "user_id": "1",
+                "message_type": "incoming",
+                "timestamp": start + timedelta(minutes=12),
+            },
+        ]
+    )
+    clients = MessageCollection([{"id": "c1", "user_id": "1", "listing_id": "l1"}])
+    metrics, listings = MetricsCollection(), ListingCollection()
+    service = ResponseMetricsService(metrics, messages, clients, listings)
+
+    latency = asyncio.run(
+        service.record_reply("c1", "1", start + timedelta(minutes=20))
+    )
+
+    assert latency == 600
+    # Ответ не первый: только метрика reply, для пользователя и для объявления
+    assert {
+        (r._filter["listing_id"], r._filter["metric"]) for r in metrics.requests
+    } == {
+        (None, "reply"),
+        ("l1", "reply"),
+    }
+    assert listings.updates[0][1]["$inc"] == {"responses_count": 1}
+
+
+def test_latency_report_merges_daily_documents():
+    documents = [
+        {"metric": "reply", "buckets": {"0": 2}, "sum_seconds": 1.0},
+        {
+            "metric": "reply",
+            "buckets": {str(LatencySketch.bucket_index(3600)): 2},
+            "sum_seconds": 7200.0,
+        },
+    ]
+    report = latency_report(documents)
+
+    assert report["reply"]["count"] == 4
+    assert report["reply"]["p90_seconds"] > 3500
+    assert report["first_reply"] == {
+        "count": 0,
+        "mean_seconds": None,
+        "p50_seconds": None,
+        "p90_seconds": None,
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.models.client import (
+    ClientCreate,
+    ClientUpdate,
+    ClientStatus,
+    MessageSource,
+)
+from backend.services.client_service import ClientService
+from backend.services.rollup_service import (
+    RollupInterval,
+    RollupService,
+    fill_series,
+    truncate,
+)
+from backend.tests.test_client_service import FakeCollection
+
+
+class RollupCollection:
+    """Хранит бакеты в словаре и применяет $inc-апсерты из bulk_write"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            key = tuple(sorted(request._filter.items()))
+            bucket = self.buckets.setdefault(key, {})
+            for field, value in request._doc["$inc"].items():
+                bucket[field] = bucket.get(field, 0) + value
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_messages_are_grouped_into_hourly_buckets():
+    rollups = RollupCollection()
+    service = RollupService(rollups, None, None)
+    hour = datetime(2026, 3, 1, 10)
+    messages = [
+        {
+            "user_id": "1",
+            "source": "olx",
+            "message_type": "incoming",
+            "timestamp": hour + timedelta(minutes=5),
+        },
+        {
+            "user_id": "1",
+            "source": "olx",
+            "message_type": "incoming",
+            "timestamp": hour + timedelta(minutes=55),
+        },
+        {
+            "user_id": "1",
+            "source": "olx",
+            "message_type": "outgoing",
+            "timestamp": hour + timedelta(minutes=56),
+        },
+        {
+            "user_id": "1",
+            "source": "telegram",
+            "message_type": "incoming",
+            "timestamp": hour + timedelta(hours=1),
+        },
+    ]
+    run(service.record_messages(messages))
+
+    assert rollups.buckets[(("hour", hour), ("source", "olx"), ("user_id", "1"))] == {
+        "incoming": 2,
+        "outgoing": 1,
+    }
+    assert len(rollups.buckets) == 2
+
+
+def test_closing_client_is_counted_once():
+    rollups = RollupCollection()
+    service = ClientService(FakeCollection(), RollupService(rollups, None, None))
+    created = run(
+        service.create_client(ClientCreate(name="A", source=MessageSource.OLX), "1")
+    )
+
+    run(
+        service.update_client(created.id, "1", ClientUpdate(status=ClientStatus.CLOSED))
+    )
+    run(
+        service.update_client(created.id, "1", ClientUpdate(status=ClientStatus.CLOSED))
+    )
+
+    totals = {}
+    for bucket in rollups.buckets.values():
+        for field, value in bucket.items():
+            totals[field] = totals.get(field, 0) + value
+    assert totals == {"new_clients": 1, "closed": 1}
+
+
+def test_fill_series_adds_empty_periods():
+    start = truncate(datetime(2026, 3, 1, 15, 30), RollupInterval.DAY)
+    rows = [{"_id": start + timedelta(days=1), "incoming": 3, "outgoing": 1}]
+    series = fill_series(rows, start, start + timedelta(days=3), timedelta(days=1))
+
+    assert [point["incoming"] for point in series] == [0, 3, 0]
+    assert series[1]["new_clients"] == 0
+    assert series[0]["period"] == datetime(2026, 3, 1)
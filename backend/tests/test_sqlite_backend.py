@@ -0,0 +1,215 @@
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.models.message import MessageCreate, MessageType
+from backend.services.attention_service import AttentionService
+from backend.services.client_service import ClientService
+from backend.services.message_service import MessageService
+from backend.utils.memory import MemoryDatabase
+from backend.utils.sqlite import SQLiteClient
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_documents_persist_in_wal_file(tmp_path):
+    path = tmp_path / "crm.sqlite3"
+    client = SQLiteClient(path)
+    now = datetime(2026, 3, 1, 12, 30, 15, 250000)
+
+    async def write():
+        db = client["crm"]
+        await db.clients.insert_one(
+            {"id": "c1", "user_id": "1", "tags": ["a", "b"], "created_at": now}
+        )
+        await db.clients.update_one({"id": "c1"}, {"$inc": {"messages_count": 1}})
+        (mode,) = await client.run(
+            lambda: client.connection.execute("PRAGMA journal_mode").fetchone()
+        )
+        return mode
+
+    assert run(write()) == "wal"
+    client.close()
+
+    reopened = SQLiteClient(path)
+    document = run(reopened["crm"].clients.find_one({"tags": "b"}, {"_id": 0}))
+    reopened.close()
+    assert document == {
+        "id": "c1",
+        "user_id": "1",
+        "tags": ["a", "b"],
+        "created_at": now,
+        "messages_count": 1,
+    }
+
+
+def test_queries_match_memory_backend():
+    rng = random.Random(11)
+    start = datetime(2026, 1, 1)
+    client = SQLiteClient()
+    sqlite = client["crm"].messages
+    memory = MemoryDatabase().messages
+
+    documents = []
+    for i in range(500):
+        document = {
+            "id": str(i),
+            "user_id": str(rng.randrange(5)),
+            "client_id": f"c{rng.randrange(40)}",
+            "timestamp": start + timedelta(minutes=i),
+            "status": rng.choice(["new", "read", None]),
+            "is_read": rng.random() < 0.5,
+            "score": rng.choice([1, 2.5, "high", None]),
+        }
+        if i % 50 == 0:
+            del document["timestamp"]
+        documents.append(document)
+
+    async def scenario():
+        for collection in (sqlite, memory):
+            await collection.insert_many([dict(d) for d in documents])
+            await collection.update_many({"user_id": "3"}, {"$set": {"user_id": "4"}})
+            await collection.delete_many({"client_id": {"$in": ["c1", "c2"]}})
+
+        for _ in range(60):
+            query = {"user_id": str(rng.randrange(5))}
+            if rng.random() < 0.5:
+                since = start + timedelta(minutes=rng.randrange(500))
+                query["timestamp"] = {"$gte": since}
+            if rng.random() < 0.3:
+                query["is_read"] = False
+            if rng.random() < 0.3:
+                query["score"] = {"$gt": 1}
+            if rng.random() < 0.2:
+                query = {"status": {"$in": [None, "new"]}, "score": {"$exists": True}}
+            limit = rng.choice([0, 1, 10])
+
+            results = [
+                await c.find(query, {"_id": 0})
+                .sort("timestamp", -1)
+                .limit(limit)
+                .to_list()
+                for c in (sqlite, memory)
+            ]
+            # Порядок документов без timestamp не определен, сравниваются ключи
+            assert [d.get("timestamp") for d in results[0]] == [
+                d.get("timestamp") for d in results[1]
+            ]
+            if not limit:
+                assert sorted(d["id"] for d in results[0]) == sorted(
+                    d["id"] for d in results[1]
+                )
+            assert await sqlite.count_documents(query) == await memory.count_documents(
+                query
+            )
+
+    try:
+        run(scenario())
+    finally:
+        client.close()
+
+
+def test_services_run_on_sqlite():
+    client = SQLiteClient()
+    db = client["crm"]
+    now = datetime.utcnow()
+    messages = MessageService(db.messages)
+
+    async def scenario():
+        await db.clients.insert_one(
+            {
+                "id": "c1",
+                "user_id": "1",
+                "listing_id": "l1",
+                "listing_title": "Диван",
+                "status": "new",
+                "last_message_at": now,
+            }
+        )
+        for i in range(6):
+            await db.messages.insert_one(
+                {
+                    "id": str(i),
+                    "client_id": "c1",
+                    "user_id": "1",
+                    "content": "Диван ещё продаётся?" if i % 2 else "Какая цена?",
+                    "message_type": "incoming",
+                    "source": "telegram",
+                    "is_read": False,
+                    "timestamp": now - timedelta(hours=i),
+                }
+            )
+        await messages.create_message(
+            MessageCreate(
+                client_id="c1",
+                content="Да, продаётся",
+                message_type=MessageType.OUTGOING,
+                source="telegram",
+            ),
+            "1",
+        )
+        await ClientService(db.clients).update_last_message("c1", "1")
+
+        found = await messages.search_messages("1", "диван")
+        listings = await AttentionService(
+            db.clients, db.messages, db.listings
+        ).get_listings_requiring_attention("1")
+        unread = await messages.get_unread_count("1")
+        history = await messages.get_client_messages("c1", "1")
+        client_doc = await db.clients.find_one({"id": "c1"})
+        return found, listings, unread, history, client_doc
+
+    try:
+        found, listings, unread, history, client_doc = run(scenario())
+    finally:
+        client.close()
+
+    assert [m.id for m in found] == ["1", "3", "5"]
+    assert listings[0]["listing_id"] == "l1"
+    assert listings[0]["incoming_count"] == 6
+    assert unread == 6
+    assert [m.content for m in history][-1] == "Да, продаётся"
+    assert client_doc["messages_count"] == 1
+
+
+def test_unique_index_and_bulk_write_transaction():
+    client = SQLiteClient()
+    metrics = client["crm"].metrics
+
+    async def scenario():
+        await metrics.create_index([("user_id", 1), ("day", 1)], unique=True)
+        await metrics.create_index(
+            [("user_id", 1), ("external_id", 1)],
+            unique=True,
+            partialFilterExpression={"external_id": {"$type": "string"}},
+        )
+        await metrics.insert_one({"user_id": "1", "day": "d1"})
+        with pytest.raises(DuplicateKeyError):
+            await metrics.insert_one({"user_id": "1", "day": "d1"})
+
+        # Без external_id документы не попадают в частичный индекс
+        await metrics.insert_one({"user_id": "1", "day": "d2"})
+
+        with pytest.raises(DuplicateKeyError):
+            await metrics.bulk_write(
+                [
+                    InsertOne({"user_id": "1", "day": "d3"}),
+                    UpdateOne({"day": "d2"}, {"$set": {"day": "d1"}}),
+                ]
+            )
+        return await metrics.count_documents({"user_id": "1"})
+
+    try:
+        assert run(scenario()) == 2
+    finally:
+        client.close()
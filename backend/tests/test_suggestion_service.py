@@ -0,0 +1,75 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.suggestion_service import SuggestionService
+from backend.services.message_service import MessageService
+from backend.services.ai_backend import AICompletion
+from backend.models.message import MessageCreate, MessageType
+from test_client_service import FakeCollection
+
+
+class CountingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    async def complete_batch(self, prompts):
+        self.calls += 1
+        return [
+            AICompletion(response="", suggestions=[f"reply to {p.history[-1]}"])
+            for p in prompts
+        ]
+
+
+def make_services(debounce_seconds=0.01):
+    collection = FakeCollection()
+    backend = CountingBackend()
+    suggestions = SuggestionService(
+        collection, backend, debounce_seconds=debounce_seconds
+    )
+    return MessageService(collection, suggestions), suggestions, backend
+
+
+def incoming(content):
+    return MessageCreate(
+        client_id="c1",
+        content=content,
+        message_type=MessageType.INCOMING,
+        source="telegram",
+    )
+
+
+def test_burst_is_debounced_into_one_generation():
+    async def scenario():
+        messages, suggestions, backend = make_services()
+        for i in range(5):
+            await messages.create_message(incoming(f"msg {i}"), user_id="1")
+        await asyncio.sleep(0.05)
+
+        assert backend.calls == 1
+        assert suggestions.pending_count() == 0
+
+        # Хвост не изменился — ответ берется из кэша
+        result = await suggestions.get_suggestions("c1", user_id="1")
+        assert result == ["reply to msg 4"]
+        assert backend.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_new_message_invalidates_cache():
+    async def scenario():
+        messages, suggestions, backend = make_services(debounce_seconds=10)
+        await messages.create_message(incoming("первое"), user_id="1")
+        assert await suggestions.get_suggestions("c1", "1") == ["reply to первое"]
+
+        await messages.create_message(incoming("второе"), user_id="1")
+        assert await suggestions.get_suggestions("c1", "1") == ["reply to второе"]
+        assert backend.calls == 2
+
+        await suggestions.close()
+        assert suggestions.pending_count() == 0
+
+    asyncio.run(scenario())
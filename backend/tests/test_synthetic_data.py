@@ -0,0 +1,40 @@
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.models.client import Client
+from backend.models.message import Message
+from backend.synthetic_data import generate_dataset, generate_user
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def test_same_seed_gives_same_documents():
+    first = generate_user("u1", clients=50, mean_messages=8, seed=1, now=NOW)
+    second = generate_user("u1", clients=50, mean_messages=8, seed=1, now=NOW)
+    other = generate_user("u1", clients=50, mean_messages=8, seed=2, now=NOW)
+
+    assert first.clients == second.clients
+    assert first.messages == second.messages
+    assert first.clients != other.clients
+
+
+def test_documents_match_models_and_counters():
+    (dataset,) = generate_dataset(users=1, clients=200, mean_messages=10, now=NOW)
+
+    for client in dataset.clients:
+        Client(**client)
+    for message in dataset.messages[:500]:
+        Message(**message)
+
+    per_client = Counter(m["client_id"] for m in dataset.messages)
+    assert all(c["messages_count"] == per_client[c["id"]] for c in dataset.clients)
+    assert all(m["timestamp"] <= NOW for m in dataset.messages)
+    assert 5 < len(dataset.messages) / len(dataset.clients) < 15
+
+    # Самое популярное объявление собирает заметно больше чатов, чем среднее
+    per_listing = Counter(c["listing_id"] for c in dataset.clients)
+    assert max(per_listing.values()) > 2 * len(dataset.clients) / len(dataset.listings)
@@ -0,0 +1,150 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import httpx
+
+from backend.app import create_app
+from backend.benchmarks.fake_telegram import FakeBotAPI
+from backend.database import db
+from backend.services.deduplication import MessageDeduplicator
+from backend.services.telegram_ingest import TelegramIngestService
+from backend.services.telegram_polling import TelegramPoller
+from backend.settings import Settings
+from backend.utils.memory import MemoryClient, MemoryDatabase
+
+
+def run(coro):
+    # Отдельный цикл: asyncio.run() сбросил бы цикл по умолчанию для других тестов
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def integration(number, token):
+    return {
+        "id": f"i{number}",
+        "name": f"bot {number}",
+        "type": "telegram",
+        "status": "active",
+        "config": {"mode": "polling", "bot_token": token},
+        "user_id": str(number),
+    }
+
+
+def make_poller(api, database, **kwargs):
+    return TelegramPoller(
+        database.integrations,
+        TelegramIngestService(database.clients, database.messages),
+        api_url="http://fake",
+        http=httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app)),
+        **kwargs,
+    )
+
+
+def test_updates_become_clients_and_messages_once():
+    api = FakeBotAPI()
+    database = MemoryDatabase()
+    poller = make_poller(api, database, batch_size=3)
+    bot = integration(1, "token-1")
+
+    async def scenario():
+        await MessageDeduplicator(database.messages).ensure_indexes()
+        await database.integrations.insert_one(dict(bot))
+        updates = [
+            api.send_message("token-1", 10 + i % 2, f"Цена? {i}", "Анна")
+            for i in range(5)
+        ]
+        created = [await poller.poll_once(bot, timeout=0) for _ in range(3)]
+
+        # Повторная доставка пачки (например, смещение не успело сохраниться)
+        again = await poller.ingest_service.ingest(bot, updates)
+        stored = await database.integrations.find_one({"id": "i1"})
+        clients = await database.clients.find({}, {"_id": 0}).to_list(length=None)
+        messages = await database.messages.count_documents({"integration_id": "i1"})
+        await poller.close()
+        return created, again, stored, clients, messages
+
+    created, again, stored, clients, messages = run(scenario())
+    assert created == [3, 2, 0]
+    assert again == 0
+    assert stored["polling_offset"] == 6
+    assert messages == 5
+    assert sorted(c["messages_count"] for c in clients) == [2, 3]
+    assert {c["name"] for c in clients} == {"Анна"}
+    assert all(c["source"] == "telegram" for c in clients)
+
+
+def test_poller_serves_many_bots_and_stops_on_bad_token():
+    api = FakeBotAPI()
+    database = MemoryDatabase()
+    poller = make_poller(
+        api, database, concurrency=2, timeout_seconds=0, refresh_seconds=0.01
+    )
+
+    async def scenario():
+        for number in range(4):
+            api.add_bot(f"token-{number}")
+            await database.integrations.insert_one(
+                integration(number, f"token-{number}")
+            )
+        await database.integrations.insert_one(integration(9, "revoked"))
+        for number in range(4):
+            for i in range(30):
+                api.send_message(f"token-{number}", 100 + i % 3, f"#{i}")
+
+        poller.start()
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            if await database.messages.count_documents({}) == 120:
+                break
+        await poller.close()
+        revoked = await database.integrations.find_one({"id": "i9"})
+        return await database.messages.count_documents({}), revoked
+
+    stored, revoked = run(scenario())
+    assert stored == 120
+    assert revoked["status"] == "error"
+    assert 'telegram_polling_errors_total{code="401"} 1' in poller.render()
+
+
+def test_telegram_webhook_uses_same_ingestion(monkeypatch):
+    app = create_app(
+        Settings(
+            mongo_url="mongodb://memory",
+            db_name="telegram_webhook_test",
+            ai_enabled=False,
+            automation_enabled=False,
+        ),
+        client=MemoryClient(),
+    )
+    update = FakeBotAPI().send_message("token", 77, "Доставка есть?", "Олег")
+
+    async def scenario():
+        await app.router.startup()
+        bot = integration(5, "token")
+        bot["config"] = {}
+        await db.integrations.insert_one(bot)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://t"
+            ) as http:
+                responses = [
+                    (
+                        await http.post("/api/integrations/webhook/i5", json=update)
+                    ).json()["message"]
+                    for _ in range(2)
+                ]
+            client = await db.clients.find_one({"external_id": "77"})
+        finally:
+            await app.router.shutdown()
+        return responses, client
+
+    responses, client = run(scenario())
+    assert responses == ["Webhook processed successfully", "Duplicate webhook ignored"]
+    assert (client["name"], client["messages_count"]) == ("Олег", 1)
@@ -1,5 +1,6 @@
 from fastapi import Depends, HTTPException, Header
 from typing import Optional, Dict
+from backend.utils.partitioning import bind_user
 from backend.utils.telegram_auth import TelegramAuth
 import os
 
@@ -38,6 +39,28 @@ async def get_current_user(
 
 async def get_user_id(current_user: Dict = Depends(get_current_user)) -> str:
     """
-    Быстрый способ получить user_id для использования в эндпоинтах
+    Быстрый способ получить user_id для использования в эндпоинтах.
+    Запрос привязывается к разделу данных продавца.
     """
-    return current_user["user_id"]
+    user_id = current_user["user_id"]
+    bind_user(user_id)
+    return user_id
+
+
+def is_admin(user_id: str) -> bool:
+    """Администраторы: Telegram ID из ADMIN_USER_IDS через запятую"""
+    admins = {
+        admin.strip()
+        for admin in os.environ.get("ADMIN_USER_IDS", "").split(",")
+        if admin.strip()
+    }
+    return str(user_id) in admins
+
+
+async def require_admin(user_id: str = Depends(get_user_id)) -> str:
+    """
+    Доступ к служебным эндпоинтам только для администраторов
+    """
+    if not is_admin(user_id):
+        raise HTTPException(status_code=403, detail="Forbidden: admin access required")
+    return user_id
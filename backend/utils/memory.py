@@ -0,0 +1,1233 @@
+"""
+Хранилище в памяти с интерфейсом MotorCollection.
+
+Поддерживает подмножество языка запросов MongoDB, которым пользуются
+сервисы: фильтры, обновления, сортировку и стадии агрегации
+(включая $lookup и $facet). Используется в бенчмарках, нагрузочных
+тестах и в режиме разработки (MONGO_URL=memory://).
+
+Коллекции держат вторичные индексы: HashIndex для точного поиска и
+SortedIndex для префикса равенства с диапазоном или сортировкой.
+Планировщик выбирает самый дешевый индекс по оценке числа кандидатов,
+кандидаты всегда перепроверяются полным фильтром. Индексы создаются
+через create_index (unique и partialFilterExpression учитываются) и
+по умолчанию из DEFAULT_INDEXES.
+"""
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from sortedcontainers import SortedList
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from datetime import datetime
+from types import SimpleNamespace
+import copy
+import itertools
+import re
+
+_MISSING = object()
+_TOP = float("inf")
+
+# Индексы, с которыми создаются коллекции: под запросы сервисов по id
+# и по user_id с сортировкой или диапазоном по дате
+DEFAULT_INDEXES: Dict[str, List[Dict]] = {
+    "clients": [
+        {"key": [("id", "hashed")]},
+        {"key": [("user_id", 1), ("last_message_at", -1)]},
+        {"key": [("user_id", 1), ("created_at", -1)]},
+    ],
+    "messages": [
+        {"key": [("id", "hashed")]},
+        {"key": [("user_id", 1), ("timestamp", -1)]},
+        {"key": [("client_id", 1), ("timestamp", 1)]},
+    ],
+    "listings": [
+        {"key": [("id", "hashed")]},
+        {"key": [("user_id", 1), ("created_at", -1)]},
+    ],
+}
+
+
+class MemoryCursor:
+    """
+    Курсор в стиле Motor: sort/skip/limit и асинхронная итерация.
+    source(sort, limit) возвращает уже отсортированные документы:
+    коллекция может взять порядок из индекса и остановиться на limit.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[List[Tuple[str, int]], int], List[Dict]],
+        projection: Optional[Dict] = None,
+    ):
+        self._source = source
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict]] = None
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "MemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _evaluate(self) -> List[Dict]:
+        if self._results is None:
+            wanted = self._skip + self._limit if self._limit else 0
+            documents = self._source(self._sort, wanted)[self._skip :]
+            if self._limit:
+                documents = documents[: self._limit]
+            self._results = [project(d, self._projection) for d in documents]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        results = self._evaluate()
+        return results[:length] if length is not None else list(results)
+
+    def __aiter__(self):
+        self._iterator = iter(self._evaluate())
+        return self
+
+    async def __anext__(self) -> Dict:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+# --- индексы ---
+
+
+def _index_key(value: Any) -> Tuple:
+    """Пара (тип, значение) с тем же порядком, что и сортировка"""
+    # Частые типы без общего _sort_key: ключ строится на каждой записи
+    kind = type(value)
+    if kind is str:
+        return (2, value)
+    if kind is datetime:
+        return (4, value)
+    key = _sort_key(value)
+    return key if len(key) == 2 else (0, None)
+
+
+class _Index:
+    """
+    Общая часть индексов: поля, уникальность и частичный фильтр.
+    Документы, у которых значение поля - массив, в индекс не попадают
+    и всегда добавляются к кандидатам (multikey не поддерживается).
+    """
+
+    def __init__(
+        self,
+        fields: List[str],
+        unique: bool = False,
+        partial: Optional[Dict] = None,
+    ):
+        self.fields = fields
+        self.unique = unique
+        self.partial = partial
+        self.unindexed: set = set()
+        self._nested = any("." in field for field in fields)
+
+    def key(self, document: Dict) -> Optional[Tuple]:
+        """Плоский ключ (тип1, значение1, тип2, ...) или None, если не индексируется"""
+        if self.partial and not matches(document, self.partial):
+            return None
+        key: Tuple = ()
+        for field in self.fields:
+            value = (
+                get_path(document, field)
+                if self._nested
+                else document.get(field, _MISSING)
+            )
+            if isinstance(value, list):
+                return None
+            key += _index_key(value)
+        return key
+
+    def add(self, row: int, document: Dict) -> None:
+        key = self.key(document)
+        if key is None:
+            if not self.partial or matches(document, self.partial):
+                self.unindexed.add(row)
+            return
+        self._add(key, row)
+
+    def remove(self, row: int, document: Dict) -> None:
+        key = self.key(document)
+        if key is None:
+            self.unindexed.discard(row)
+        else:
+            self._remove(key, row)
+
+
+class HashIndex(_Index):
+    """Точный поиск по равенству всех полей; значение - row или set строк"""
+
+    def __init__(self, fields: List[str], **kwargs):
+        super().__init__(fields, **kwargs)
+        self.entries: Dict[Tuple, Union[int, set]] = {}
+
+    def _add(self, key: Tuple, row: int) -> None:
+        current = self.entries.get(key)
+        if current is None:
+            self.entries[key] = row
+        elif isinstance(current, set):
+            current.add(row)
+        else:
+            self.entries[key] = {current, row}
+
+    def _remove(self, key: Tuple, row: int) -> None:
+        current = self.entries.get(key)
+        if isinstance(current, set):
+            current.discard(row)
+            if len(current) == 1:
+                self.entries[key] = next(iter(current))
+        elif current == row:
+            del self.entries[key]
+
+    def rows(self, key: Tuple) -> List[int]:
+        current = self.entries.get(key)
+        if current is None:
+            return []
+        return sorted(current) if isinstance(current, set) else [current]
+
+    def count(self, key: Tuple) -> int:
+        current = self.entries.get(key)
+        if current is None:
+            return 0
+        return len(current) if isinstance(current, set) else 1
+
+
+class SortedIndex(_Index):
+    """
+    Упорядоченный индекс на SortedList записей (ключ..., row): равенство
+    по префиксу полей, диапазон по следующему полю и порядок для sort.
+    """
+
+    def __init__(self, fields: List[str], **kwargs):
+        super().__init__(fields, **kwargs)
+        self.entries = SortedList()
+
+    def _add(self, key: Tuple, row: int) -> None:
+        self.entries.add(key + (row,))
+
+    def _remove(self, key: Tuple, row: int) -> None:
+        self.entries.discard(key + (row,))
+
+    def bounds(self, prefix: Tuple, low: Optional[Tuple], high: Optional[Tuple]):
+        """
+        Границы irange для префикса равенства и диапазона по следующему полю.
+        low/high: (ключ, включительно) или None.
+        """
+        lower = prefix if low is None else prefix + low[0] + (() if low[1] else (_TOP,))
+        upper = prefix + (_TOP,) if high is None else prefix + high[0]
+        if high is not None and high[1]:
+            upper += (_TOP,)
+        return lower, upper
+
+    def count(self, lower: Tuple, upper: Tuple) -> int:
+        return max(self.entries.bisect_left(upper) - self.entries.bisect_left(lower), 0)
+
+    def rows(self, lower: Tuple, upper: Tuple, reverse: bool = False) -> Iterable[int]:
+        for entry in self.entries.irange(
+            lower, upper, inclusive=(True, False), reverse=reverse
+        ):
+            yield entry[-1]
+
+
+def _equality_values(condition: Any) -> Optional[List[Any]]:
+    """Значения, которые дает условие равенства или $in (None - не равенство)"""
+    if _is_operator(condition):
+        if set(condition) == {"$eq"}:
+            condition = condition["$eq"]
+        elif set(condition) == {"$in"}:
+            values = list(condition["$in"])
+            return None if any(isinstance(v, (list, dict)) for v in values) else values
+        else:
+            return None
+    if isinstance(condition, (list, dict)):
+        return None
+    return [condition]
+
+
+def _within_partial(filter: Dict, partial: Dict) -> bool:
+    """Все документы под фильтром попадают в частичный индекс"""
+    for field, condition in partial.items():
+        if field.startswith("$") or "." in field or field not in filter:
+            return False
+        values = _equality_values(filter[field])
+        if not values or not all(
+            matches({field: value}, {field: condition}) for value in values
+        ):
+            return False
+    return True
+
+
+def _range(condition: Any) -> Optional[Tuple[Optional[Tuple], Optional[Tuple]]]:
+    """Границы диапазона из $gt/$gte/$lt/$lte одного типа"""
+    if not _is_operator(condition):
+        return None
+    ops = {k: v for k, v in condition.items() if k in ("$gt", "$gte", "$lt", "$lte")}
+    if not ops or any(v is None for v in ops.values()):
+        return None
+    ranks = {_index_key(v)[0] for v in ops.values()}
+    if len(ranks) != 1:
+        return None
+    (rank,) = ranks
+
+    # Сравнения в MongoDB не выходят за пределы типа
+    low, high = ((rank,), True), ((rank + 1,), False)
+    for op, value in ops.items():
+        key = _index_key(value)
+        if op in ("$gt", "$gte"):
+            low = (key, op == "$gte")
+        else:
+            high = (key, op == "$lte")
+    return low, high
+
+
+class _Plan:
+    __slots__ = ("cost", "rows", "ordered")
+
+    def __init__(self, cost: float, rows: Callable[[], Iterable[int]], ordered: bool):
+        self.cost = cost
+        self.rows = rows
+        self.ordered = ordered
+
+
+class MemoryCollection:
+    def __init__(self, name: str, database: Optional["MemoryDatabase"] = None):
+        self.name = name
+        self.database = database
+        self._rows: Dict[int, Dict] = {}
+        self._row_ids = itertools.count()
+        self.indexes: Dict[str, _Index] = {}
+        self._unique = False
+        self.index_specs: List[Dict] = []
+
+    @property
+    def documents(self) -> List[Dict]:
+        return list(self._rows.values())
+
+    # --- планировщик ---
+
+    def _plans(self, filter: Dict, sort: List[Tuple[str, int]], limit: int):
+        for index in self.indexes.values():
+            if index.partial and not _within_partial(filter, index.partial):
+                # Частичный индекс не видит часть документов
+                continue
+
+            values: List[List[Any]] = []
+            for field in index.fields:
+                equal = _equality_values(filter[field]) if field in filter else None
+                if equal is None:
+                    break
+                values.append(equal)
+            if not values:
+                continue
+
+            if isinstance(index, HashIndex):
+                if len(values) < len(index.fields):
+                    continue
+                keys = [
+                    sum((_index_key(v) for v in combo), ())
+                    for combo in itertools.product(*values)
+                ]
+                count = sum(index.count(key) for key in keys)
+                yield _Plan(
+                    count + len(index.unindexed),
+                    lambda index=index, keys=keys: itertools.chain(
+                        (row for key in keys for row in index.rows(key)),
+                        index.unindexed,
+                    ),
+                    ordered=False,
+                )
+                continue
+
+            position = len(values)
+            next_field = (
+                index.fields[position] if position < len(index.fields) else None
+            )
+            span = (
+                _range(filter.get(next_field, _MISSING))
+                if next_field is not None
+                else None
+            )
+            low, high = span if span else (None, None)
+            prefixes = [
+                sum((_index_key(v) for v in combo), ())
+                for combo in itertools.product(*values)
+            ]
+            ranges = [index.bounds(prefix, low, high) for prefix in prefixes]
+            count = sum(index.count(lower, upper) for lower, upper in ranges)
+
+            # Порядок индекса подходит для sort, если сортировка идет по
+            # полям сразу после префикса равенства в одном направлении
+            sort_fields = [field for field, _ in sort]
+            ordered = (
+                bool(sort)
+                and len(ranges) == 1
+                and not index.unindexed
+                and sort_fields == index.fields[position : position + len(sort)]
+                and len({direction for _, direction in sort}) == 1
+            )
+            reverse = ordered and sort[0][1] == -1
+            cost = count if not sort or ordered else count * 2
+            if ordered and limit:
+                cost = min(cost, limit * 4)
+            yield _Plan(
+                cost + len(index.unindexed),
+                lambda index=index, ranges=ranges, reverse=reverse: itertools.chain(
+                    (
+                        row
+                        for lower, upper in ranges
+                        for row in index.rows(lower, upper, reverse)
+                    ),
+                    index.unindexed,
+                ),
+                ordered,
+            )
+
+    def _select_rows(
+        self,
+        filter: Optional[Dict],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+    ) -> List[Tuple[int, Dict]]:
+        """(row, документ) по фильтру, отсортированные и обрезанные до limit"""
+        filter = filter or {}
+        sort = sort or []
+        full_scan = _Plan(
+            len(self._rows) * (2 if sort else 1), lambda: self._rows.keys(), False
+        )
+        plan = min(
+            self._plans(filter, sort, limit) if filter else (),
+            key=lambda p: p.cost,
+            default=full_scan,
+        )
+        if plan.cost > full_scan.cost:
+            plan = full_scan
+
+        rows = self._rows
+        selected = []
+        seen = set()
+        for row in plan.rows():
+            if row in seen:
+                continue
+            seen.add(row)
+            document = rows.get(row)
+            if document is None or (filter and not matches(document, filter)):
+                continue
+            selected.append((row, document))
+            if plan.ordered and limit and len(selected) >= limit:
+                break
+
+        if sort and not plan.ordered:
+            order = {id(d): row for row, d in selected}
+            selected = [
+                (order[id(d)], d)
+                for d in sort_documents([d for _, d in selected], sort)
+            ]
+        return selected[:limit] if limit else selected
+
+    def _select(self, filter: Optional[Dict], sort=None, limit: int = 0) -> List[Dict]:
+        return [document for _, document in self._select_rows(filter, sort, limit)]
+
+    # --- чтение ---
+
+    def find(
+        self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs
+    ) -> MemoryCursor:
+        cursor = MemoryCursor(
+            lambda sort, limit: self._select(filter, sort, limit), projection
+        )
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(
+        self,
+        filter: Optional[Dict] = None,
+        projection: Optional[Dict] = None,
+        sort=None,
+    ) -> Optional[Dict]:
+        if isinstance(sort, str):
+            sort = [(sort, 1)]
+        documents = self._select(filter, sort, 1)
+        return project(documents[0], projection) if documents else None
+
+    async def count_documents(self, filter: Dict, **kwargs) -> int:
+        return len(self._select(filter))
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> MemoryCursor:
+        def source(sort, limit):
+            return sort_documents(self._run_pipeline(pipeline), sort)
+
+        return MemoryCursor(source)
+
+    def _run_pipeline(self, pipeline: List[Dict]) -> List[Dict]:
+        # Начальные $match, $sort и $limit выполняются через индексы
+        filter, sort, limit, start = None, None, 0, 0
+        if pipeline and "$match" in pipeline[0]:
+            filter, start = pipeline[0]["$match"], 1
+        if len(pipeline) > start and "$sort" in pipeline[start]:
+            sort = list(pipeline[start]["$sort"].items())
+            start += 1
+            if len(pipeline) > start and "$limit" in pipeline[start]:
+                limit = pipeline[start]["$limit"]
+                start += 1
+        documents = self._select(filter, sort, limit)
+        return run_pipeline(documents, pipeline[start:], self.database)
+
+    # --- запись ---
+
+    async def insert_one(self, document: Dict) -> Any:
+        self._insert(document)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> Any:
+        ids = [self._insert(d) for d in documents]
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def _insert(self, document: Dict) -> Any:
+        # Как и Motor, добавляет _id в переданный документ
+        document.setdefault("_id", ObjectId())
+        stored = copy.copy(document)
+        if self._unique:
+            self._check_unique(stored)
+        row = next(self._row_ids)
+        self._rows[row] = stored
+        for index in self.indexes.values():
+            index.add(row, stored)
+        return document["_id"]
+
+    def _check_unique(self, document: Dict, row: Optional[int] = None) -> None:
+        for name, index in self.indexes.items():
+            if not index.unique:
+                continue
+            key = index.key(document)
+            if key is None:
+                continue
+            if isinstance(index, HashIndex):
+                others = index.rows(key)
+            else:
+                others = list(index.rows(key, key + (_TOP,)))
+            if any(other != row for other in others):
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {name}"
+                )
+
+    def _replace_row(self, row: int, document: Dict) -> None:
+        if self._unique:
+            self._check_unique(document, row)
+        old = self._rows[row]
+        for index in self.indexes.values():
+            # Индексы, ключ которых не изменился, не трогаются
+            key = index.key(document)
+            if key is not None and key == index.key(old):
+                continue
+            index.remove(row, old)
+            index.add(row, document)
+        self._rows[row] = document
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> Any:
+        return self._update(filter, update, upsert, multi=False)
+
+    async def update_many(
+        self, filter: Dict, update: Dict, upsert: bool = False
+    ) -> Any:
+        return self._update(filter, update, upsert, multi=True)
+
+    async def replace_one(
+        self, filter: Dict, replacement: Dict, upsert: bool = False
+    ) -> Any:
+        return self._replace(filter, replacement, upsert)
+
+    def _replace(self, filter: Dict, replacement: Dict, upsert: bool) -> Any:
+        for row, document in self._select_rows(filter, limit=1):
+            self._replace_row(row, {"_id": document["_id"], **replacement})
+            return _update_result(1, 1)
+        if upsert:
+            return _update_result(0, 0, self._insert(dict(replacement)))
+        return _update_result(0, 0)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool, multi: bool) -> Any:
+        matched = modified = 0
+        for row, document in self._select_rows(filter, limit=0 if multi else 1):
+            matched += 1
+            updated = copy.deepcopy(document)
+            apply_update(updated, update)
+            if updated != document:
+                modified += 1
+                self._replace_row(row, updated)
+
+        if matched or not upsert:
+            return _update_result(matched, modified)
+
+        document = {
+            k: v
+            for k, v in filter.items()
+            if not k.startswith("$") and not _is_operator(v)
+        }
+        apply_update(document, update, inserting=True)
+        return _update_result(0, 0, self._insert(document))
+
+    def _delete_row(self, row: int) -> None:
+        document = self._rows.pop(row)
+        for index in self.indexes.values():
+            index.remove(row, document)
+
+    async def delete_one(self, filter: Dict) -> Any:
+        return self._delete(filter, multi=False)
+
+    async def delete_many(self, filter: Dict) -> Any:
+        return self._delete(filter, multi=True)
+
+    def _delete(self, filter: Dict, multi: bool) -> Any:
+        rows = self._select_rows(filter, limit=0 if multi else 1)
+        for row, _ in rows:
+            self._delete_row(row)
+        return SimpleNamespace(deleted_count=len(rows))
+
+    async def bulk_write(self, requests: List, ordered: bool = True) -> Any:
+        return bulk_write(self, requests)
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return self._create_index(keys, **kwargs)
+
+    def _create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = kwargs.get("name") or "_".join(
+            f"{field}_{direction}" for field, direction in keys
+        )
+        if name in self.indexes:
+            return name
+
+        fields = [field for field, _ in keys]
+        index_class = HashIndex if any(d == "hashed" for _, d in keys) else SortedIndex
+        index = index_class(
+            fields,
+            unique=kwargs.get("unique", False),
+            partial=kwargs.get("partialFilterExpression"),
+        )
+        for row, document in self._rows.items():
+            index.add(row, document)
+        self.indexes[name] = index
+        if index.unique:
+            self._unique = True
+            try:
+                for row, document in self._rows.items():
+                    self._check_unique(document, row)
+            except DuplicateKeyError:
+                del self.indexes[name]
+                self._unique = any(i.unique for i in self.indexes.values())
+                raise
+        self.index_specs.append({"key": keys, **kwargs})
+        return name
+
+    def has_index(self, field: str) -> bool:
+        """Есть ли полный индекс, начинающийся с field"""
+        return any(
+            index.fields[0] == field and not index.partial
+            for index in self.indexes.values()
+        )
+
+
+def bulk_write(collection, requests: List) -> Any:
+    """
+    bulk_write поверх синхронных _insert/_update/_replace/_delete
+    коллекции; общий для хранилища в памяти и SQLite
+    """
+    result = {
+        "nInserted": 0,
+        "nUpserted": 0,
+        "nMatched": 0,
+        "nModified": 0,
+        "nRemoved": 0,
+        "upserted": [],
+        "writeErrors": [],
+    }
+    for index, request in enumerate(requests):
+        if isinstance(request, InsertOne):
+            collection._insert(request._doc)
+            result["nInserted"] += 1
+            continue
+        if isinstance(request, (DeleteOne, DeleteMany)):
+            outcome = collection._delete(
+                request._filter, isinstance(request, DeleteMany)
+            )
+            result["nRemoved"] += outcome.deleted_count
+            continue
+
+        if isinstance(request, ReplaceOne):
+            outcome = collection._replace(
+                request._filter, request._doc, bool(request._upsert)
+            )
+        else:
+            outcome = collection._update(
+                request._filter,
+                request._doc,
+                bool(request._upsert),
+                isinstance(request, UpdateMany),
+            )
+        result["nMatched"] += outcome.matched_count
+        result["nModified"] += outcome.modified_count
+        if outcome.upserted_id is not None:
+            result["nUpserted"] += 1
+            result["upserted"].append({"index": index, "_id": outcome.upserted_id})
+
+    return SimpleNamespace(
+        bulk_api_result=result,
+        inserted_count=result["nInserted"],
+        upserted_count=result["nUpserted"],
+        matched_count=result["nMatched"],
+        modified_count=result["nModified"],
+        deleted_count=result["nRemoved"],
+        acknowledged=True,
+    )
+
+
+class MemoryDatabase:
+    """Набор коллекций, создаваемых при первом обращении (db.clients, db["clients"])"""
+
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            collection = MemoryCollection(name, self)
+            # Как в MongoDB, индекс по _id есть у каждой коллекции
+            collection._create_index([("_id", "hashed")], name="_id_")
+            for spec in DEFAULT_INDEXES.get(name, []):
+                collection._create_index(spec["key"])
+            self._collections[name] = collection
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, **kwargs) -> Dict:
+        return {"ok": 1.0}
+
+
+class MemoryClient:
+    """
+    Замена AsyncIOMotorClient: все экземпляры видят одни и те же базы,
+    как разные клиенты одного сервера MongoDB.
+    """
+
+    _databases: Dict[str, MemoryDatabase] = {}
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    async def drop_database(self, name: str) -> None:
+        self._databases.pop(name, None)
+
+    def close(self) -> None:
+        pass
+
+
+def _update_result(matched: int, modified: int, upserted_id: Any = None):
+    return SimpleNamespace(
+        matched_count=matched,
+        modified_count=modified,
+        upserted_id=upserted_id,
+        acknowledged=True,
+    )
+
+
+# --- фильтры ---
+
+
+def _is_operator(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(k.startswith("$") for k in value)
+    )
+
+
+def get_path(document: Any, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            value = value[int(part)] if int(part) < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _plain(value: Any) -> Any:
+    # Enum-значения (str, Enum) сравниваются как строки
+    return value.value if hasattr(value, "value") and isinstance(value, str) else value
+
+
+def matches(document: Dict, filter: Dict) -> bool:
+    for key, condition in filter.items():
+        if key == "$or":
+            if not any(matches(document, f) for f in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, f) for f in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, f) for f in condition):
+                return False
+        elif key == "$text":
+            if not _text_match(document, condition["$search"]):
+                return False
+        elif not _match_value(get_path(document, key), condition):
+            return False
+    return True
+
+
+def _match_value(value: Any, condition: Any) -> bool:
+    if _is_operator(condition):
+        if "i" in condition.get("$options", ""):
+            condition = {
+                ("$regex_i" if k == "$regex" else k): v for k, v in condition.items()
+            }
+        return all(
+            _apply_operator(value, op, arg)
+            for op, arg in condition.items()
+            if op != "$options"
+        )
+    return _equals(value, condition)
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    expected = _plain(expected)
+    if expected is None:
+        return value is _MISSING or value is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value is not _MISSING and _plain(value) == expected
+
+
+def _compare(value: Any, arg: Any, op: Callable[[Any, Any], bool]) -> bool:
+    if value is _MISSING or value is None or arg is None:
+        return False
+    try:
+        return op(_plain(value), _plain(arg))
+    except TypeError:
+        return False
+
+
+def _apply_operator(value: Any, op: str, arg: Any) -> bool:
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op == "$gt":
+        return _compare(value, arg, lambda a, b: a > b)
+    if op == "$gte":
+        return _compare(value, arg, lambda a, b: a >= b)
+    if op == "$lt":
+        return _compare(value, arg, lambda a, b: a < b)
+    if op == "$lte":
+        return _compare(value, arg, lambda a, b: a <= b)
+    if op == "$in":
+        return any(_equals(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_equals(value, item) for item in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$type":
+        types = {"string": str, "date": datetime, "bool": bool, "number": (int, float)}
+        return value is not _MISSING and isinstance(value, types.get(arg, object))
+    if op == "$regex":
+        return isinstance(value, str) and re.search(arg, value) is not None
+    if op == "$regex_i":
+        return isinstance(value, str) and re.search(arg, value, re.I) is not None
+    if op == "$not":
+        return not _match_value(value, arg)
+    raise NotImplementedError(f"Query operator {op} is not supported")
+
+
+def _text_match(document: Dict, search: str) -> bool:
+    """Упрощенный $text: любое слово запроса в любом строковом поле"""
+    words = search.lower().split()
+    text = " ".join(v.lower() for v in document.values() if isinstance(v, str))
+    return any(word in text for word in words)
+
+
+# --- обновления ---
+
+
+def _set_path(document: Dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_path(document: Dict, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part, {})
+    document.pop(parts[-1], None)
+
+
+def apply_update(document: Dict, update: Dict, inserting: bool = False) -> None:
+    if not any(key.startswith("$") for key in update):
+        # Замена документа целиком
+        _id = document.get("_id")
+        document.clear()
+        document.update(update)
+        if _id is not None:
+            document["_id"] = _id
+        return
+
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = get_path(document, path)
+            if op == "$set":
+                _set_path(document, path, arg)
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, arg)
+            elif op == "$unset":
+                _unset_path(document, path)
+            elif op == "$inc":
+                _set_path(document, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                if current is _MISSING or current is None or arg > current:
+                    _set_path(document, path, arg)
+            elif op == "$min":
+                if current is _MISSING or current is None or arg < current:
+                    _set_path(document, path, arg)
+            elif op in ("$push", "$addToSet"):
+                items = list(current) if isinstance(current, list) else []
+                each = arg["$each"] if _is_operator(arg) else [arg]
+                for item in each:
+                    if op == "$push" or item not in items:
+                        items.append(item)
+                if _is_operator(arg) and "$slice" in arg:
+                    limit = arg["$slice"]
+                    items = items[limit:] if limit < 0 else items[:limit]
+                _set_path(document, path, items)
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported")
+
+
+# --- сортировка и проекция ---
+
+
+def _sort_key(value: Any) -> Tuple:
+    if value is _MISSING or value is None:
+        return (0,)
+    value = _plain(value)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (4, value)
+    return (5, str(value))
+
+
+def sort_documents(documents: List[Dict], sort: List[Tuple[str, int]]) -> List[Dict]:
+    # Устойчивая сортировка с конца списка ключей
+    for field, direction in reversed(sort):
+        documents = sorted(
+            documents,
+            key=lambda d: _sort_key(get_path(d, field)),
+            reverse=direction == -1,
+        )
+    return documents
+
+
+def project(document: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return dict(document)
+
+    included = {k for k, v in projection.items() if v and k != "_id"}
+    if included:
+        result = {k: document[k] for k in included if k in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {k: v for k, v in document.items() if projection.get(k, 1)}
+
+
+# --- агрегация ---
+
+
+def evaluate(expression: Any, document: Dict) -> Any:
+    """Значение выражения агрегации для документа"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) == 1:
+        ((op, arg),) = expression.items()
+        if op == "$dateTrunc":
+            return _date_trunc(evaluate(arg["date"], document), arg["unit"])
+        if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+            left, right = (evaluate(a, document) for a in arg)
+            return _apply_operator(left, op, right)
+        if op == "$cond":
+            if isinstance(arg, dict):
+                arg = [arg["if"], arg["then"], arg["else"]]
+            return evaluate(arg[1] if evaluate(arg[0], document) else arg[2], document)
+        if op == "$ifNull":
+            value = evaluate(arg[0], document)
+            return evaluate(arg[1], document) if value is None else value
+        if op == "$size":
+            return len(evaluate(arg, document) or [])
+        if op.startswith("$"):
+            raise NotImplementedError(f"Expression {op} is not supported")
+    return {k: evaluate(v, document) for k, v in expression.items()}
+
+
+def _date_trunc(value: Optional[datetime], unit: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    value = value.replace(second=0, microsecond=0)
+    if unit in ("hour", "day", "month"):
+        value = value.replace(minute=0)
+    if unit in ("day", "month"):
+        value = value.replace(hour=0)
+    if unit == "month":
+        value = value.replace(day=1)
+    return value
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _group(documents: List[Dict], spec: Dict) -> List[Dict]:
+    groups: Dict[Any, Dict] = {}
+    accumulators = {k: v for k, v in spec.items() if k != "_id"}
+
+    for document in documents:
+        key_value = evaluate(spec["_id"], document)
+        key = _freeze(key_value)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"_id": key_value, "__count": {}}
+
+        for field, accumulator in accumulators.items():
+            ((op, expression),) = accumulator.items()
+            value = evaluate(expression, document)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (
+                    value if isinstance(value, (int, float)) else 0
+                )
+            elif op == "$avg":
+                total, count = group["__count"].get(field, (0, 0))
+                if isinstance(value, (int, float)):
+                    total, count = total + value, count + 1
+                group["__count"][field] = (total, count)
+                group[field] = total / count if count else None
+            elif op == "$first":
+                group.setdefault(field, value)
+            elif op == "$last":
+                group[field] = value
+            elif op == "$max":
+                if value is not None and (
+                    group.get(field) is None or value > group[field]
+                ):
+                    group[field] = value
+                group.setdefault(field, None)
+            elif op == "$min":
+                if value is not None and (
+                    group.get(field) is None or value < group[field]
+                ):
+                    group[field] = value
+                group.setdefault(field, None)
+            elif op == "$push":
+                group.setdefault(field, []).append(value)
+            elif op == "$addToSet":
+                items = group.setdefault(field, [])
+                if value not in items:
+                    items.append(value)
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported")
+
+    for group in groups.values():
+        del group["__count"]
+    return list(groups.values())
+
+
+def _unwind(documents: List[Dict], spec: Any) -> List[Dict]:
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    keep_empty = spec.get("preserveNullAndEmptyArrays", False)
+
+    result = []
+    for document in documents:
+        values = get_path(document, path)
+        if isinstance(values, list) and values:
+            for value in values:
+                item = dict(document)
+                _set_path(item, path, value)
+                result.append(item)
+        elif keep_empty:
+            item = dict(document)
+            if values is _MISSING or values == []:
+                _unset_path(item, path)
+            result.append(item)
+    return result
+
+
+def _lookup(
+    documents: List[Dict], spec: Dict, database: Optional[MemoryDatabase]
+) -> List[Dict]:
+    if database is None:
+        raise NotImplementedError("$lookup requires a MemoryDatabase")
+
+    collection = database[spec["from"]]
+    foreign_field = spec["foreignField"]
+    foreign: Dict[Any, List[Dict]] = {}
+
+    if collection.has_index(foreign_field):
+        # Выборка по индексу только для встреченных значений
+        def related(value: Any) -> List[Dict]:
+            key = _freeze(value)
+            if key not in foreign:
+                foreign[key] = (
+                    collection._select({foreign_field: value})
+                    if not isinstance(value, (list, dict))
+                    else [
+                        d
+                        for d in collection._select(None)
+                        if _freeze(_lookup_value(d, foreign_field)) == key
+                    ]
+                )
+            return foreign[key]
+
+    else:
+        for other in collection.documents:
+            foreign.setdefault(_freeze(_lookup_value(other, foreign_field)), []).append(
+                other
+            )
+
+        def related(value: Any) -> List[Dict]:
+            return foreign.get(_freeze(value), [])
+
+    result = []
+    for document in documents:
+        item = dict(document)
+        item[spec["as"]] = [
+            dict(d) for d in related(_lookup_value(document, spec["localField"]))
+        ]
+        result.append(item)
+    return result
+
+
+def _lookup_value(document: Dict, path: str) -> Any:
+    value = get_path(document, path)
+    return None if value is _MISSING else value
+
+
+def _project_stage(documents: List[Dict], spec: Dict) -> List[Dict]:
+    exclusions = all(v in (0, False) for v in spec.values())
+    if exclusions:
+        return [project(d, spec) for d in documents]
+
+    result = []
+    for document in documents:
+        item = {"_id": document.get("_id")} if spec.get("_id", 1) else {}
+        for field, expression in spec.items():
+            if field == "_id" and expression in (0, 1, True, False):
+                continue
+            if expression in (1, True):
+                value = get_path(document, field)
+                if value is not _MISSING:
+                    _set_path(item, field, value)
+            else:
+                item[field] = evaluate(expression, document)
+        result.append(item)
+    return result
+
+
+def run_pipeline(
+    documents: List[Dict],
+    pipeline: List[Dict],
+    database: Optional[MemoryDatabase] = None,
+) -> List[Dict]:
+    for stage in pipeline:
+        ((name, spec),) = stage.items()
+        if name == "$match":
+            documents = [d for d in documents if matches(d, spec)]
+        elif name == "$sort":
+            documents = sort_documents(documents, list(spec.items()))
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$skip":
+            documents = documents[spec:]
+        elif name == "$group":
+            documents = _group(documents, spec)
+        elif name == "$unwind":
+            documents = _unwind(documents, spec)
+        elif name == "$lookup":
+            documents = _lookup(documents, spec, database)
+        elif name == "$project":
+            documents = _project_stage(documents, spec)
+        elif name == "$addFields" or name == "$set":
+            documents = [
+                {**d, **{k: evaluate(v, d) for k, v in spec.items()}} for d in documents
+            ]
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        elif name == "$facet":
+            documents = [
+                {
+                    output: run_pipeline(list(documents), stages, database)
+                    for output, stages in spec.items()
+                }
+            ]
+        else:
+            raise NotImplementedError(f"Aggregation stage {name} is not supported")
+    return documents
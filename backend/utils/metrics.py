@@ -0,0 +1,220 @@
+"""
+Метрики HTTP-запросов и пула соединений MongoDB в формате Prometheus.
+
+Счетчики агрегируются сразу при записи и живут в памяти процесса:
+каждый воркер uvicorn отдает свои значения, блокировки не нужны,
+так как цикл событий однопоточный.
+"""
+
+from pymongo import monitoring
+from typing import Callable, Dict, List, Sequence, Tuple
+from bisect import bisect_left
+import time
+
+# Границы бакетов: секунды для задержек, байты для размеров ответов
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.response_size: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight = 0
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def observe(
+        self, method: str, route: str, status: int, seconds: float, size: int
+    ) -> None:
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.response_size[key] = Histogram(SIZE_BUCKETS)
+        histogram.observe(seconds)
+        self.response_size[key].observe(size)
+
+        status_key = (method, route, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Дополнительные метрики (строки в формате Prometheus)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests being processed",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_responses_total Responses by route and status code",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(
+                f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}'
+            )
+
+        for name, help_text, histograms in (
+            (
+                "http_request_duration_seconds",
+                "Request latency",
+                self.latency,
+            ),
+            (
+                "http_response_size_bytes",
+                "Response body size",
+                self.response_size,
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), histogram in sorted(histograms.items()):
+                lines.extend(
+                    histogram.render(name, f'method="{method}",route="{route}"')
+                )
+
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: задержка, код ответа и размер тела по шаблону маршрута
+    (/api/clients/{client_id}), чтобы число серий не росло с числом ID.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            route = scope.get("route")
+            registry.observe(
+                scope["method"],
+                getattr(route, "path_format", None) or UNMATCHED_ROUTE,
+                status,
+                time.perf_counter() - started,
+                size,
+            )
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Использование пулов соединений всех клиентов Motor процесса"""
+
+    def __init__(self):
+        self.pools = 0
+        self.max_size = 0
+        self.open = 0
+        self.checked_out = 0
+
+    def pool_created(self, event):
+        self.pools += 1
+        self.max_size += event.options.get("maxPoolSize", 100)
+
+    def pool_closed(self, event):
+        self.pools -= 1
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    # Остальные события пула не влияют на счетчики
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def snapshot(self) -> Dict:
+        return {
+            "pools": self.pools,
+            "open_connections": self.open,
+            "checked_out": self.checked_out,
+            "max_size": self.max_size,
+            "utilization": (
+                round(self.checked_out / self.max_size, 4) if self.max_size else 0.0
+            ),
+        }
+
+    def render(self) -> List[str]:
+        return [
+            "# HELP mongo_pool_connections Connections by state",
+            "# TYPE mongo_pool_connections gauge",
+            f'mongo_pool_connections{{state="open"}} {self.open}',
+            f'mongo_pool_connections{{state="checked_out"}} {self.checked_out}',
+            f"mongo_pool_max_size {self.max_size}",
+        ]
+
+
+metrics_registry = MetricsRegistry()
+pool_stats = PoolStats()
+metrics_registry.register_collector(pool_stats.render)
@@ -6,5 +6,8 @@ class MotorCollection(Protocol):
     async def find_one(self, *args: Any, **kwargs: Any) -> Any: ...
     async def update_one(self, *args: Any, **kwargs: Any) -> Any: ...
     async def delete_one(self, *args: Any, **kwargs: Any) -> Any: ...
+    async def delete_many(self, *args: Any, **kwargs: Any) -> Any: ...
     def aggregate(self, *args: Any, **kwargs: Any) -> Any: ...
     async def count_documents(self, *args: Any, **kwargs: Any) -> int: ...
+    async def bulk_write(self, *args: Any, **kwargs: Any) -> Any: ...
+    async def create_index(self, *args: Any, **kwargs: Any) -> Any: ...
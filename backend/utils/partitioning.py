@@ -0,0 +1,353 @@
+"""
+Разделение данных продавцов по базам/кластерам.
+
+PartitionRouter сопоставляет user_id разделу: сначала по таблице
+закреплений (коллекция partition_overrides в домашнем разделе), иначе по
+консистентному хешированию (HashRing). Коллекции из backend.database
+разрешаются через роутер при каждом обращении, раздел берется из
+current_partition_key, который выставляет зависимость get_user_id
+(bind_user). Сервисы при этом не меняются.
+
+Глобальные коллекции (GLOBAL_COLLECTIONS) и обращения вне контекста
+пользователя (startup-хуки, служебные задачи) идут в домашний раздел -
+первый в списке.
+
+Перенос продавца между разделами (migrate) выполняется без остановки:
+1. двойная запись - записи продавца идут в оба раздела, чтение из старого;
+2. копирование документов продавца в новый раздел;
+3. переключение - записи продавца на короткое время приостанавливаются,
+   новый раздел сверяется со старым, закрепление переключается;
+4. очистка - документы продавца удаляются из старого раздела.
+Состояние переноса хранится в памяти процесса: при нескольких воркерах
+перенос запускается там, где нет записи этого продавца, или при
+остановленных остальных воркерах.
+
+Добавление раздела в кольцо меняет размещение части продавцов: перед
+этим их текущее размещение закрепляется (pin), затем продавцы переносятся.
+"""
+
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pymongo import DeleteOne, ReplaceOne
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# user_id продавца, данные которого обрабатывает текущий запрос или задача
+current_partition_key: ContextVar[Optional[str]] = ContextVar(
+    "current_partition_key", default=None
+)
+# Явно выбранный раздел (например, для создания индексов в каждом разделе)
+current_partition: ContextVar[Optional[str]] = ContextVar(
+    "current_partition", default=None
+)
+
+OVERRIDES_COLLECTION = "partition_overrides"
+# Коллекции без user-разделения: поиск интеграции по webhook и задачи
+# импорта при старте выполняются без известного продавца; лимиты
+# webhook'ов не должны сбрасываться при переносе продавца
+GLOBAL_COLLECTIONS = frozenset(
+    {OVERRIDES_COLLECTION, "integrations", "import_jobs", "rate_limits"}
+)
+# Коллекции с данными продавца, которые переносит migrate()
+USER_COLLECTIONS = (
+    "clients",
+    "messages",
+    "listings",
+    "rollups_hourly",
+    "response_latency",
+    "automations",
+    "automation_logs",
+    "ai_settings",
+)
+COPY_BATCH_SIZE = 500
+
+
+def bind_user(user_id: Any) -> None:
+    """Привязывает текущий запрос или задачу к разделу продавца"""
+    current_partition_key.set(str(user_id))
+
+
+@contextmanager
+def use_partition(name: str) -> Iterator[None]:
+    token = current_partition.set(name)
+    try:
+        yield
+    finally:
+        current_partition.reset(token)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Консистентное хеширование: replicas виртуальных точек на раздел"""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100):
+        self.nodes = list(nodes)
+        if not self.nodes:
+            raise ValueError("HashRing needs at least one node")
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect_right(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+@dataclass
+class Partition:
+    name: str
+    client: Any
+    db_name: str
+
+    @property
+    def database(self):
+        return self.client[self.db_name]
+
+
+@dataclass
+class _Migration:
+    source: str
+    target: str
+    writers: int = 0
+    finished: bool = False
+    resumed: asyncio.Event = field(default_factory=asyncio.Event)
+    drained: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self.resumed.set()
+        self.drained.set()
+
+
+class DualWriteCollection:
+    """
+    Коллекция продавца на время переноса: чтение из исходного раздела,
+    записи в оба. Ошибки записи в новый раздел только логируются -
+    расхождения устраняет сверка при переключении.
+    """
+
+    _WRITES = frozenset(
+        {
+            "insert_one",
+            "insert_many",
+            "update_one",
+            "update_many",
+            "replace_one",
+            "delete_one",
+            "delete_many",
+            "bulk_write",
+        }
+    )
+
+    def __init__(self, router: "PartitionRouter", name: str, migration: _Migration):
+        self._router = router
+        self._name = name
+        self._migration = migration
+
+    def _collection(self, partition: str):
+        return self._router.partitions[partition].database[self._name]
+
+    def __getattr__(self, attr: str):
+        if attr in self._WRITES:
+            return lambda *args, **kwargs: self._write(attr, args, kwargs)
+        return getattr(self._collection(self._migration.source), attr)
+
+    async def _write(self, method: str, args: Tuple, kwargs: Dict) -> Any:
+        migration = self._migration
+        await migration.resumed.wait()
+        if migration.finished:
+            return await getattr(self._collection(migration.target), method)(
+                *args, **kwargs
+            )
+
+        migration.writers += 1
+        migration.drained.clear()
+        try:
+            result = await getattr(self._collection(migration.source), method)(
+                *args, **kwargs
+            )
+            try:
+                # insert_one уже добавил _id: в новом разделе тот же документ
+                await getattr(self._collection(migration.target), method)(
+                    *_copy_documents(method, args), **kwargs
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Двойная запись {self._name}.{method} в раздел "
+                    f"{migration.target} не удалась: {e}"
+                )
+            return result
+        finally:
+            migration.writers -= 1
+            if migration.writers == 0:
+                migration.drained.set()
+
+
+def _copy_documents(method: str, args: Tuple) -> Tuple:
+    if method == "insert_one":
+        return (dict(args[0]), *args[1:])
+    if method == "insert_many":
+        return ([dict(d) for d in args[0]], *args[1:])
+    return args
+
+
+class PartitionRouter:
+    def __init__(self, partitions: List[Partition], replicas: int = 100):
+        if not partitions:
+            raise ValueError("PartitionRouter needs at least one partition")
+        self.partitions: Dict[str, Partition] = {p.name: p for p in partitions}
+        self.home = partitions[0].name
+        self.ring = HashRing(self.partitions, replicas)
+        self.overrides: Dict[str, str] = {}
+        self.migrations: Dict[str, _Migration] = {}
+
+    # --- размещение ---
+
+    def partition_for(self, user_id: str) -> str:
+        return self.overrides.get(user_id) or self.ring.node_for(user_id)
+
+    def collection(self, name: str):
+        """Коллекция для текущего контекста (раздел продавца или домашний)"""
+        explicit = current_partition.get()
+        if explicit is not None:
+            return self.partitions[explicit].database[name]
+
+        user_id = current_partition_key.get()
+        if user_id is None or name in GLOBAL_COLLECTIONS:
+            return self.partitions[self.home].database[name]
+
+        migration = self.migrations.get(user_id)
+        if migration is not None and not migration.finished:
+            return DualWriteCollection(self, name, migration)
+        return self.partitions[self.partition_for(user_id)].database[name]
+
+    def each_partition(self) -> Iterator[str]:
+        """Перебирает разделы, переключая current_partition на каждый"""
+        for name in self.partitions:
+            with use_partition(name):
+                yield name
+
+    # --- закрепления ---
+
+    def _overrides_collection(self):
+        return self.partitions[self.home].database[OVERRIDES_COLLECTION]
+
+    async def load_overrides(self) -> None:
+        documents = await self._overrides_collection().find({}).to_list(length=None)
+        self.overrides = {
+            d["user_id"]: d["partition"]
+            for d in documents
+            if d["partition"] in self.partitions
+        }
+
+    async def set_override(self, user_id: str, partition: str) -> None:
+        if partition not in self.partitions:
+            raise ValueError(f"Unknown partition {partition!r}")
+        await self._overrides_collection().update_one(
+            {"user_id": user_id}, {"$set": {"partition": partition}}, upsert=True
+        )
+        self.overrides[user_id] = partition
+
+    async def pin(self, user_ids: Iterable[str]) -> None:
+        """Закрепляет текущее размещение продавцов перед изменением кольца"""
+        for user_id in user_ids:
+            if user_id not in self.overrides:
+                await self.set_override(user_id, self.partition_for(user_id))
+
+    # --- перенос ---
+
+    async def migrate(
+        self,
+        user_id: str,
+        target: str,
+        collections: Iterable[str] = USER_COLLECTIONS,
+    ) -> Dict[str, int]:
+        """Переносит продавца в раздел target; возвращает число документов"""
+        if target not in self.partitions:
+            raise ValueError(f"Unknown partition {target!r}")
+        if user_id in self.migrations:
+            raise RuntimeError(f"User {user_id} is already being migrated")
+        source = self.partition_for(user_id)
+        collections = list(collections)
+        if source == target:
+            return {name: 0 for name in collections}
+
+        migration = self.migrations[user_id] = _Migration(source, target)
+        try:
+            for name in collections:
+                await self._copy(user_id, name, source, target)
+
+            # Переключение: новые записи ждут, пока идущие не завершатся
+            migration.resumed.clear()
+            await migration.drained.wait()
+            counts = {}
+            for name in collections:
+                counts[name] = await self._reconcile(user_id, name, source, target)
+            await self.set_override(user_id, target)
+            migration.finished = True
+        finally:
+            migration.resumed.set()
+            del self.migrations[user_id]
+
+        for name in collections:
+            await self.partitions[source].database[name].delete_many(
+                {"user_id": user_id}
+            )
+        logger.info(f"Продавец {user_id} перенесен из {source} в {target}: {counts}")
+        return counts
+
+    async def _copy(self, user_id: str, name: str, source: str, target: str) -> None:
+        target_collection = self.partitions[target].database[name]
+        batch = []
+        async for document in (
+            self.partitions[source].database[name].find({"user_id": user_id})
+        ):
+            batch.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+            if len(batch) >= COPY_BATCH_SIZE:
+                await target_collection.bulk_write(batch, ordered=False)
+                batch = []
+                # Копирование не должно занимать цикл событий целиком
+                await asyncio.sleep(0)
+        if batch:
+            await target_collection.bulk_write(batch, ordered=False)
+
+    async def _reconcile(
+        self, user_id: str, name: str, source: str, target: str
+    ) -> int:
+        """Приводит документы продавца в target к source; записи остановлены"""
+        source_documents = await (
+            self.partitions[source].database[name].find({"user_id": user_id})
+        ).to_list(length=None)
+        target_collection = self.partitions[target].database[name]
+        target_documents = {
+            d["_id"]: d
+            for d in await target_collection.find({"user_id": user_id}).to_list(
+                length=None
+            )
+        }
+
+        requests = [
+            ReplaceOne({"_id": d["_id"]}, d, upsert=True)
+            for d in source_documents
+            if target_documents.pop(d["_id"], None) != d
+        ]
+        requests += [DeleteOne({"_id": _id}) for _id in target_documents]
+        for start in range(0, len(requests), COPY_BATCH_SIZE):
+            await target_collection.bulk_write(
+                requests[start : start + COPY_BATCH_SIZE], ordered=False
+            )
+        return len(source_documents)
+
+    def close(self) -> None:
+        for partition in self.partitions.values():
+            partition.client.close()
@@ -0,0 +1,221 @@
+"""
+Профилирование отдельных запросов по требованию администратора.
+
+Запрос с заголовком X-Profile: 1 (или ?profile=1) от пользователя из
+ADMIN_USER_IDS выполняется под сэмплирующим профайлером: отдельный поток
+раз в interval снимает стек потока цикла событий, когда в нем выполняется
+задача этого запроса. Так получается время CPU самого запроса без
+соседних. Время ожидания MongoDB приходит из CommandListener через
+contextvar current_profile. Без флага middleware только проверяет заголовки.
+"""
+
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "current_profile", default=None
+)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+@dataclass
+class RequestProfile:
+    id: str
+    method: str
+    path: str
+    user_id: str
+    interval: float
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    status: Optional[int] = None
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    # (команда, мс); list.append атомарен, пишут потоки пула Motor
+    db_calls: List[Tuple[str, float]] = field(default_factory=list)
+
+    def record_db(self, command_name: str, elapsed_ms: float) -> None:
+        self.db_calls.append((command_name, elapsed_ms))
+
+    @property
+    def db_ms(self) -> float:
+        return sum(elapsed for _, elapsed in self.db_calls)
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "user_id": self.user_id,
+            "started_at": self.started_at,
+            "status": self.status,
+            "wall_ms": round(self.wall_ms, 3),
+            "cpu_ms": round(self.cpu_ms, 3),
+            "db_ms": round(self.db_ms, 3),
+            "db_commands": len(self.db_calls),
+            # Остаток: ожидание прочих операций (сеть, очереди, планировщик)
+            "other_wait_ms": round(max(self.wall_ms - self.cpu_ms - self.db_ms, 0), 3),
+            "samples": self.samples,
+        }
+
+    def folded(self) -> str:
+        """Свернутые стеки для flamegraph.pl и speedscope: a;b;c <число сэмплов>"""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, profile: RequestProfile, task: asyncio.Task):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        # Потоки просыпаются реже заданного интервала, поэтому каждый
+        # сэмпл весит столько, сколько реально прошло с предыдущего
+        last = time.perf_counter()
+        while not self._stopped.wait(self.profile.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            if asyncio.current_task(self.loop) is not self.task:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if not code.co_filename.startswith(_ASYNCIO_DIR):
+                    stack.append(
+                        f"{code.co_qualname} "
+                        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                frame = frame.f_back
+            if stack:
+                self.profile.stacks[";".join(reversed(stack))] += 1
+                self.profile.samples += 1
+                self.profile.cpu_ms += elapsed * 1000
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class ProfileStore:
+    """Кольцевой буфер последних профилей"""
+
+    def __init__(self, size: int = 50):
+        self._profiles: Deque[RequestProfile] = deque(maxlen=size)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[Dict]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware профилирования /api. Профиль сохраняется в store,
+    его ID возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, app, store: ProfileStore, interval: float = 0.001):
+        self.app = app
+        self.store = store
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = await self._admin_id(scope)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            id=uuid.uuid4().hex[:12],
+            method=scope["method"],
+            path=scope["path"],
+            user_id=user_id,
+            interval=self.interval,
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (PROFILE_ID_HEADER, profile.id.encode()),
+                    ],
+                }
+            await send(message)
+
+        token = current_profile.set(profile)
+        sampler = StackSampler(profile, asyncio.current_task())
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.wall_ms = (time.perf_counter() - started) * 1000
+            current_profile.reset(token)
+            self.store.add(profile)
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        if not scope["path"].startswith("/api"):
+            return False
+        if b"profile=1" in scope.get("query_string", b""):
+            return True
+        return any(
+            name == PROFILE_HEADER and value == b"1" for name, value in scope["headers"]
+        )
+
+    @staticmethod
+    async def _admin_id(scope) -> Optional[str]:
+        # Модуль импортируется сервисами (через query_stats), а зависимости
+        # читают токен бота при импорте, поэтому они подключаются здесь
+        from fastapi import HTTPException
+        from backend.utils.dependencies import get_current_user, is_admin
+
+        headers = dict(scope["headers"])
+        try:
+            user = await get_current_user(
+                x_telegram_init_data=(
+                    headers.get(b"x-telegram-init-data", b"").decode() or None
+                ),
+                authorization=headers.get(b"authorization", b"").decode() or None,
+            )
+        except HTTPException:
+            return None
+        return user["user_id"] if is_admin(user["user_id"]) else None
+
+
+profile_store = ProfileStore()
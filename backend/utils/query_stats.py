@@ -0,0 +1,371 @@
+"""
+Статистика запросов к MongoDB по методам сервисов.
+
+Методы сервисов, помеченных @track_queries, записывают свое имя в
+contextvar query_source. Motor выполняет команды в пуле потоков, но
+копирует туда контекст, поэтому CommandListener видит, какой метод
+отправил команду. Команды группируются по форме запроса: значения
+фильтров заменяются на "?", остаются поля и операторы.
+"""
+
+from pymongo import monitoring
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+
+from backend.utils.metrics import metrics_registry
+from backend.utils.profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+query_source: ContextVar[str] = ContextVar("query_source", default="unknown")
+
+TRACKED_COMMANDS = {
+    "find",
+    "aggregate",
+    "count",
+    "distinct",
+    "insert",
+    "update",
+    "delete",
+    "findAndModify",
+}
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+# Поля сессии и транспорта, которые нельзя передать внутрь explain
+_COMMAND_META_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+MAX_SHAPE_LENGTH = 500
+
+
+def track_queries(cls):
+    """Помечает команды MongoDB из асинхронных методов класса их именем"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_"):
+            continue
+        source = f"{cls.__name__}.{name}"
+        if inspect.iscoroutinefunction(method):
+            setattr(cls, name, _traced_coroutine(method, source))
+        elif inspect.isasyncgenfunction(method):
+            setattr(cls, name, _traced_generator(method, source))
+    return cls
+
+
+def _traced_coroutine(method, source):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = query_source.set(source)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            query_source.reset(token)
+
+    return wrapper
+
+
+def _traced_generator(method, source):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        # Генератор выполняется в контексте вызывающего кода, поэтому
+        # имя выставляется только на время каждого шага
+        generator = method(*args, **kwargs)
+        try:
+            while True:
+                token = query_source.set(source)
+                try:
+                    item = await generator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    query_source.reset(token)
+                yield item
+        finally:
+            await generator.aclose()
+
+    return wrapper
+
+
+def _shape(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return [_shape(item) for item in value]
+    return "?"
+
+
+def _pipeline_shape(pipeline: List[Dict]) -> List[Any]:
+    stages = []
+    for stage in pipeline:
+        name = next(iter(stage), "?")
+        if name == "$match":
+            stages.append({name: _shape(stage[name])})
+        elif name == "$lookup":
+            stages.append({name: stage[name].get("from", "?")})
+        elif name == "$sort":
+            stages.append({name: stage[name]})
+        else:
+            stages.append(name)
+    return stages
+
+
+def query_shape(command_name: str, command: Dict) -> str:
+    """Форма запроса без конкретных значений, например find {"user_id": "?"}"""
+    if command_name == "find":
+        shape = {"filter": _shape(command.get("filter", {}))}
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+    elif command_name == "aggregate":
+        shape = _pipeline_shape(command.get("pipeline", []))
+    elif command_name == "count":
+        shape = _shape(command.get("query", {}))
+    elif command_name == "distinct":
+        shape = {"key": command.get("key"), "query": _shape(command.get("query", {}))}
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes")
+        first = statements[0] if statements else {}
+        shape = {"q": _shape(first.get("q", {}))}
+        if isinstance(first.get("u"), dict):
+            shape["u"] = sorted(first["u"])
+    elif command_name == "findAndModify":
+        shape = _shape(command.get("query", {}))
+    else:
+        shape = {}
+    text = f"{command_name} {json.dumps(shape, ensure_ascii=False, default=str)}"
+    return text[:MAX_SHAPE_LENGTH]
+
+
+def _returned_documents(command_name: str, reply: Dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    return int(reply.get("n", 0))
+
+
+def plan_summary(explain: Dict) -> str:
+    """Цепочка стадий выигравшего плана от листа к корню: IXSCAN(user_id_1) > FETCH"""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # aggregate: план первой стадии лежит внутри $cursor
+        for stage in explain.get("stages", []):
+            if "$cursor" in stage:
+                planner = stage["$cursor"].get("queryPlanner")
+                break
+    if not planner:
+        return "unknown"
+
+    plan = planner.get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)  # планы SBE
+    stages = []
+    while plan:
+        name = plan.get("stage", "?")
+        if plan.get("indexName"):
+            name = f"{name}({plan['indexName']})"
+        stages.append(name)
+        children = plan.get("inputStages") or [plan.get("inputStage")]
+        plan = children[0] if children else None
+    return " > ".join(reversed(stages))
+
+
+@dataclass
+class QueryStats:
+    source: str
+    collection: str
+    command: str
+    shape: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    documents: int = 0
+    slow: int = 0
+    failures: int = 0
+    plan: Optional[str] = None
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    Агрегирует команды по (метод сервиса, коллекция, форма запроса).
+    Медленные запросы пишутся в лог вместе с кратким планом explain();
+    explain выполняется в цикле событий не чаще раза в explain_interval
+    секунд на каждую форму.
+    """
+
+    def __init__(self, slow_ms: float = 100.0, explain_interval: float = 300.0):
+        self.slow_ms = slow_ms
+        self.explain_interval = explain_interval
+        self.stats: Dict[Tuple[str, str, str], QueryStats] = {}
+        # Слушатель вызывается из потоков пула Motor
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[QueryStats, Optional[Dict]]] = {}
+        self._cursors: Dict[int, QueryStats] = {}
+        self._explained: Dict[Tuple[str, str, str], float] = {}
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, client, slow_ms: Optional[float] = None) -> None:
+        """Разрешает explain медленных запросов через клиента приложения"""
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+
+    def started(self, event) -> None:
+        name = event.command_name
+        if name == "getMore":
+            with self._lock:
+                stats = self._cursors.get(event.command["getMore"])
+            if stats is not None:
+                self._pending[event.request_id] = (stats, None)
+            return
+        if name not in TRACKED_COMMANDS:
+            return
+
+        command = event.command
+        collection = command.get(name)
+        if not isinstance(collection, str):
+            collection = "?"
+        source = query_source.get()
+        shape = query_shape(name, command)
+        key = (source, collection, shape)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = QueryStats(source, collection, name, shape)
+        explainable = name in EXPLAINABLE_COMMANDS
+        self._pending[event.request_id] = (stats, command if explainable else None)
+
+    def succeeded(self, event) -> None:
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record_db(event.command_name, event.duration_micros / 1000)
+
+        pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        stats, command = pending
+        elapsed_ms = event.duration_micros / 1000
+        reply = event.reply
+        cursor = reply.get("cursor")
+        cursor_id = cursor.get("id", 0) if isinstance(cursor, dict) else 0
+
+        with self._lock:
+            if event.command_name == "getMore":
+                # Догрузка курсора: время и документы идут в исходный запрос
+                if not cursor_id:
+                    self._cursors.pop(event.command["getMore"], None)
+            else:
+                stats.count += 1
+                if cursor_id:
+                    self._cursors[cursor_id] = stats
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.documents += _returned_documents(event.command_name, reply)
+            slow = elapsed_ms >= self.slow_ms
+            if slow:
+                stats.slow += 1
+
+        if slow:
+            logger.warning(
+                f"Медленный запрос {elapsed_ms:.0f} мс: {stats.source} "
+                f"{stats.collection} {stats.shape}"
+            )
+            if command is not None:
+                self._schedule_explain(stats, command, event.database_name)
+
+    def failed(self, event) -> None:
+        pending = self._pending.pop(event.request_id, None)
+        if pending is not None:
+            with self._lock:
+                pending[0].failures += 1
+
+    def _schedule_explain(self, stats: QueryStats, command: Dict, db_name: str):
+        if self._client is None or self._loop is None or self._loop.is_closed():
+            return
+        key = (stats.source, stats.collection, stats.shape)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(key, -self.explain_interval) < (
+                self.explain_interval
+            ):
+                return
+            self._explained[key] = now
+        self._loop.call_soon_threadsafe(
+            asyncio.ensure_future, self._explain(stats, command, db_name)
+        )
+
+    async def _explain(self, stats: QueryStats, command: Dict, db_name: str):
+        explained = {
+            key: value
+            for key, value in command.items()
+            if not key.startswith("$") and key not in _COMMAND_META_FIELDS
+        }
+        try:
+            result = await self._client[db_name].command(
+                {"explain": explained, "verbosity": "queryPlanner"}
+            )
+        except Exception as e:
+            logger.error(f"Ошибка explain для {stats.shape}: {e}")
+            return
+        stats.plan = plan_summary(result)
+        logger.warning(f"План медленного запроса {stats.source}: {stats.plan}")
+
+    def top(self, sort: str = "total_ms", limit: int = 50) -> List[Dict]:
+        with self._lock:
+            rows = [asdict(stats) for stats in self.stats.values()]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        for row in rows[:limit]:
+            row["avg_ms"] = (
+                round(row["total_ms"] / row["count"], 3) if row["count"] else 0
+            )
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+            self._cursors.clear()
+            self._explained.clear()
+
+    def render(self) -> List[str]:
+        """Метрики без формы запроса, чтобы число серий оставалось небольшим"""
+        totals: Dict[Tuple[str, str, str], List[float]] = {}
+        with self._lock:
+            for stats in self.stats.values():
+                key = (stats.source, stats.collection, stats.command)
+                total = totals.setdefault(key, [0, 0.0, 0, 0])
+                total[0] += stats.count
+                total[1] += stats.total_ms / 1000
+                total[2] += stats.documents
+                total[3] += stats.slow
+
+        durations, documents, slow = [], [], []
+        for (source, collection, command), total in sorted(totals.items()):
+            labels = f'source="{source}",collection="{collection}",command="{command}"'
+            durations.append(
+                f"mongo_query_duration_seconds_sum{{{labels}}} {total[1]:.6f}"
+            )
+            durations.append(
+                f"mongo_query_duration_seconds_count{{{labels}}} {total[0]}"
+            )
+            documents.append(f"mongo_query_documents_total{{{labels}}} {total[2]}")
+            slow.append(f"mongo_slow_queries_total{{{labels}}} {total[3]}")
+        return [
+            "# HELP mongo_query_duration_seconds MongoDB command time by service method",
+            "# TYPE mongo_query_duration_seconds summary",
+            *durations,
+            "# TYPE mongo_query_documents_total counter",
+            *documents,
+            "# TYPE mongo_slow_queries_total counter",
+            *slow,
+        ]
+
+
+query_monitor = QueryMonitor()
+metrics_registry.register_collector(query_monitor.render)
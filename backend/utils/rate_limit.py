@@ -0,0 +1,162 @@
+"""
+Ограничение частоты webhook'ов по интеграции и по продавцу.
+
+Корзина токенов хранится в виде GCRA: вместо числа токенов запоминается
+теоретическое время следующего запроса (tat). Запрос проходит, если
+max(tat, now) + interval опережает now не больше чем на burst интервалов;
+это та же корзина емкостью burst, пополняемая со скоростью rate, но
+состояние - одно число, которое удобно атомарно менять в общем хранилище.
+
+MemoryRateLimiter держит корзины в памяти воркера: при нескольких
+воркерах лимит фактически умножается на их число. SharedRateLimiter
+хранит tat в коллекции rate_limits и меняет его сравнением-с-заменой,
+поэтому лимит общий для всех воркеров ценой одного-двух запросов к базе.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, List, Sequence, Tuple
+import time
+
+from backend.utils.motor import MotorCollection
+
+MAX_KEYS = 10000
+CAS_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # запросов в секунду
+    burst: int  # сколько запросов можно принять разом
+
+    def __post_init__(self):
+        if self.rate <= 0 or self.burst < 1:
+            raise ValueError("Rate limit needs positive rate and burst")
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+
+def _admit(tat: float, now: float, limit: Limit) -> Tuple[float, float]:
+    """Новый tat и задержка до разрешения (0 - запрос проходит)"""
+    new_tat = max(tat, now) + limit.interval
+    wait = new_tat - now - limit.burst * limit.interval
+    # Допуск на погрешность float, иначе последний токен всплеска теряется
+    return new_tat, wait if wait > 1e-9 else 0.0
+
+
+class _Stats:
+    def __init__(self):
+        self.allowed = 0
+        self.throttled: Dict[str, int] = {}
+
+    def record(self, throttled_scope: str = "") -> None:
+        if throttled_scope:
+            self.throttled[throttled_scope] = self.throttled.get(throttled_scope, 0) + 1
+        else:
+            self.allowed += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP webhook_rate_limit_total Webhooks by rate limit decision",
+            "# TYPE webhook_rate_limit_total counter",
+            f'webhook_rate_limit_total{{result="allowed"}} {self.allowed}',
+        ]
+        for scope, count in sorted(self.throttled.items()):
+            lines.append(
+                f'webhook_rate_limit_total{{result="throttled",scope="{scope}"}} {count}'
+            )
+        return lines
+
+
+class MemoryRateLimiter:
+    def __init__(self):
+        self._tat: Dict[str, float] = {}
+        self.stats = _Stats()
+
+    async def acquire(self, buckets: Sequence[Tuple[str, str, Limit]]) -> float:
+        """
+        buckets: (область для метрик, ключ, лимит). Запрос списывается из
+        всех корзин, только если проходит по каждой; возвращает Retry-After
+        в секундах или 0
+        """
+        now = time.monotonic()
+        admitted = []
+        for scope, key, limit in buckets:
+            new_tat, wait = _admit(self._tat.get(key, now), now, limit)
+            if wait:
+                self.stats.record(scope)
+                return wait
+            admitted.append((key, new_tat))
+
+        self._tat.update(admitted)
+        if len(self._tat) > MAX_KEYS:
+            # Корзины, которые уже полностью пополнились, не нужны
+            self._tat = {k: t for k, t in self._tat.items() if t > now}
+        self.stats.record()
+        return 0.0
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+    def render(self) -> List[str]:
+        return self.stats.render()
+
+
+class SharedRateLimiter:
+    """
+    Корзины в коллекции: {"key", "tat", "expires_at"}. Корзины списываются
+    по очереди; если не прошла вторая, токен первой уже потрачен - лимит
+    при этом только строже.
+    """
+
+    def __init__(self, collection: MotorCollection):
+        self.collection = collection
+        self.stats = _Stats()
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("key", unique=True)
+        # Полностью пополнившиеся корзины удаляет TTL-индекс
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def acquire(self, buckets: Sequence[Tuple[str, str, Limit]]) -> float:
+        for scope, key, limit in buckets:
+            wait = await self._take(key, limit)
+            if wait:
+                self.stats.record(scope)
+                return wait
+        self.stats.record()
+        return 0.0
+
+    async def _take(self, key: str, limit: Limit) -> float:
+        for _ in range(CAS_ATTEMPTS):
+            now = time.time()
+            document = await self.collection.find_one({"key": key})
+            tat = document["tat"] if document else now
+            new_tat, wait = _admit(tat, now, limit)
+            if wait:
+                return wait
+
+            update = {
+                "key": key,
+                "tat": new_tat,
+                "expires_at": datetime.utcnow() + timedelta(seconds=new_tat - now),
+            }
+            if document is None:
+                try:
+                    await self.collection.insert_one(update)
+                    return 0.0
+                except DuplicateKeyError:
+                    continue
+            result = await self.collection.update_one(
+                {"key": key, "tat": tat}, {"$set": update}
+            )
+            if result.modified_count:
+                return 0.0
+        # Корзину одновременно меняют другие воркеры - считаем ее пустой
+        return limit.interval
+
+    def render(self) -> List[str]:
+        return self.stats.render()
@@ -0,0 +1,208 @@
+"""
+Маршрутизация чтения по методам сервисов (read preference).
+
+Тяжелые аналитические чтения (агрегации внимания, статистика дашборда,
+экспорт, роллапы) уходят на вторичные узлы реплика-сета с ограниченным
+отставанием (maxStalenessSeconds), чтобы не конкурировать с записью
+webhook'ов на первичном. Политика выбирается по имени метода из
+query_source (@track_queries), шаблоны в стиле fnmatch, первый
+подходящий выигрывает; настраивается через READ_PREFERENCES.
+
+Чтение своих записей: если продавец недавно писал (ответ в чат и т.п.),
+его чтения еще окно staleness идут на первичный узел - вторичный мог не
+успеть получить запись. Продавец берется из current_partition_key,
+который выставляет get_user_id.
+
+Политики применяются только к Motor (with_options); хранилища в памяти
+и SQLite не имеют реплик и используются как есть.
+"""
+
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+
+from backend.utils.metrics import metrics_registry
+from backend.utils.partitioning import current_partition_key
+from backend.utils.query_stats import query_source
+
+MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Минимум, который допускает MongoDB для maxStalenessSeconds
+MIN_STALENESS_SECONDS = 90
+
+DEFAULT_READ_PREFERENCES: Tuple[Tuple[str, str], ...] = (
+    ("AttentionService.*", "secondaryPreferred:120"),
+    ("ClientService.get_dashboard_stats", "secondaryPreferred:120"),
+    ("ExportService.*", "secondaryPreferred:300"),
+    ("RollupService.timeseries", "secondaryPreferred:120"),
+    ("ResponseMetricsService.get_latency", "secondaryPreferred:120"),
+)
+
+READ_METHODS = frozenset(
+    {"find", "find_one", "aggregate", "count_documents", "distinct"}
+)
+WRITE_METHODS = frozenset(
+    {
+        "insert_one",
+        "insert_many",
+        "update_one",
+        "update_many",
+        "replace_one",
+        "delete_one",
+        "delete_many",
+        "bulk_write",
+        "find_one_and_update",
+    }
+)
+
+
+@dataclass(frozen=True)
+class ReadPolicy:
+    mode: str
+    max_staleness: int = -1
+
+    @classmethod
+    def parse(cls, spec: str) -> "ReadPolicy":
+        """'secondaryPreferred:120' - режим и maxStalenessSeconds"""
+        mode, _, staleness = spec.partition(":")
+        if mode not in MODES:
+            raise ValueError(f"Unknown read preference {mode!r}")
+        max_staleness = int(staleness) if staleness else -1
+        if max_staleness != -1 and max_staleness < MIN_STALENESS_SECONDS:
+            raise ValueError(
+                f"maxStalenessSeconds must be at least {MIN_STALENESS_SECONDS}"
+            )
+        if mode == "primary" and max_staleness != -1:
+            raise ValueError("primary read preference does not take staleness")
+        return cls(mode, max_staleness)
+
+    @property
+    def read_preference(self):
+        if self.mode == "primary":
+            return Primary()
+        return MODES[self.mode](max_staleness=self.max_staleness)
+
+
+class ReadRouter:
+    """
+    Выбирает read preference для чтений и запоминает время последней
+    записи продавца, чтобы он читал свои записи с первичного узла.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_write: Dict[str, float] = {}
+        self.routed: Dict[Tuple[str, str], int] = {}
+        self.configure()
+
+    def configure(
+        self,
+        preferences: Iterable[Tuple[str, str]] = (),
+        read_your_writes_seconds: float = MIN_STALENESS_SECONDS,
+    ) -> None:
+        """preferences дополняют DEFAULT_READ_PREFERENCES и проверяются первыми"""
+        self.rules: List[Tuple[str, ReadPolicy]] = [
+            (pattern, ReadPolicy.parse(spec))
+            for pattern, spec in (*preferences, *DEFAULT_READ_PREFERENCES)
+        ]
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._policies: Dict[str, Optional[ReadPolicy]] = {}
+        self._collections: Dict[Tuple, Any] = {}
+
+    def policy_for(self, source: str) -> Optional[ReadPolicy]:
+        if source not in self._policies:
+            self._policies[source] = next(
+                (
+                    policy
+                    for pattern, policy in self.rules
+                    if fnmatchcase(source, pattern)
+                ),
+                None,
+            )
+        return self._policies[source]
+
+    def _window(self, policy: ReadPolicy) -> float:
+        # Вторичный узел отстает не больше maxStalenessSeconds
+        if policy.max_staleness == -1:
+            return self.read_your_writes_seconds
+        return max(policy.max_staleness, self.read_your_writes_seconds)
+
+    def record_write(self, user_id: Optional[str]) -> None:
+        if user_id is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_id] = now
+            if len(self._last_write) > 10000:
+                horizon = now - max(
+                    [self.read_your_writes_seconds]
+                    + [p.max_staleness for _, p in self.rules]
+                )
+                self._last_write = {
+                    u: t for u, t in self._last_write.items() if t >= horizon
+                }
+
+    def wrote_recently(self, user_id: Optional[str], window: float) -> bool:
+        if user_id is None:
+            return False
+        written = self._last_write.get(user_id)
+        return written is not None and time.monotonic() - written < window
+
+    def route(self, collection: Any, attr: str) -> Any:
+        """Коллекция с read preference для вызова collection.<attr>"""
+        if attr in WRITE_METHODS:
+            self.record_write(current_partition_key.get())
+            return collection
+        if attr not in READ_METHODS or not hasattr(collection, "with_options"):
+            return collection
+
+        source = query_source.get()
+        policy = self.policy_for(source)
+        if policy is None or policy.mode == "primary":
+            return collection
+        if self.wrote_recently(current_partition_key.get(), self._window(policy)):
+            self._count(source, "primary")
+            return collection
+
+        self._count(source, policy.mode)
+        key = (id(collection.database.client), collection.full_name, policy)
+        routed = self._collections.get(key)
+        if routed is None:
+            routed = self._collections[key] = collection.with_options(
+                read_preference=policy.read_preference
+            )
+        return routed
+
+    def _count(self, source: str, mode: str) -> None:
+        key = (source, mode)
+        self.routed[key] = self.routed.get(key, 0) + 1
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP mongo_routed_reads_total Reads by service method and read preference",
+            "# TYPE mongo_routed_reads_total counter",
+        ]
+        for (source, mode), count in sorted(self.routed.items()):
+            lines.append(
+                f'mongo_routed_reads_total{{source="{source}",mode="{mode}"}} {count}'
+            )
+        return lines
+
+
+read_router = ReadRouter()
+metrics_registry.register_collector(read_router.render)
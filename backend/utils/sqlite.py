@@ -0,0 +1,675 @@
+"""
+Встроенное хранилище на SQLite с интерфейсом MotorCollection.
+
+Для небольших инсталляций одного продавца, где отдельная MongoDB не нужна.
+Каждая коллекция - таблица с документом в JSON-колонке doc и
+сгенерированными колонками (GENERATED_COLUMNS) под индексы запросов
+сервисов. Файл открывается в режиме WAL.
+
+Все обращения к SQLite выполняются в одном выделенном потоке
+(SQLiteClient), корутины коллекций только ждут результат, поэтому
+цикл событий не блокируется и соединение не делится между потоками.
+
+Фильтры переводятся в SQL там, где это возможно (равенство, $in,
+диапазоны, $exists, $type), и всегда перепроверяются тем же matches(),
+что и в хранилище в памяти. $text по messages выполняется через FTS5,
+агрегации - через run_pipeline из backend.utils.memory.
+"""
+
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from pymongo.errors import DuplicateKeyError
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
+import copy
+import functools
+import json
+import sqlite3
+
+from backend.utils.memory import (
+    MemoryCursor,
+    _is_operator,
+    _plain,
+    _update_result,
+    apply_update,
+    bulk_write,
+    matches,
+    run_pipeline,
+    sort_documents,
+)
+
+# Поля, которые вынесены в колонки таблицы и проиндексированы.
+# Считаются скалярными: массивы в них не ищутся поэлементно.
+GENERATED_COLUMNS = ("id", "user_id", "client_id", "timestamp", "status")
+TABLE_INDEXES = (
+    ("id",),
+    ("user_id", "timestamp"),
+    ("client_id", "timestamp"),
+    ("user_id", "status"),
+)
+
+# Коллекции с полнотекстовым поиском ($text) и поля, которые индексируются
+FTS_FIELDS: Dict[str, Tuple[str, ...]] = {"messages": ("content",)}
+
+
+# --- кодирование документов ---
+
+
+def _utc(value: datetime) -> datetime:
+    # Как и pymongo, хранит время в UTC без tzinfo
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": _utc(value).isoformat(timespec="microseconds")}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(value: Dict) -> Any:
+    if len(value) == 1:
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def dumps(document: Dict) -> str:
+    return json.dumps(
+        document, default=_encode, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def loads(text: str) -> Dict:
+    return json.loads(text, object_hook=_decode)
+
+
+def _param(value: Any) -> Any:
+    """Значение фильтра в том виде, в котором его возвращает _value_sql"""
+    if isinstance(value, datetime):
+        return _utc(value).isoformat(timespec="microseconds")
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, str):
+        return _plain(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+# --- перевод фильтров в SQL ---
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _json_path(field: str) -> str:
+    return "$" + "".join("." + _quote(part) for part in field.split(".")).replace(
+        "'", "''"
+    )
+
+
+def _extract_sql(field: str) -> str:
+    """Значение поля: время и ObjectId разворачиваются в сравнимые строки"""
+    path = _json_path(field)
+    return (
+        f"CASE json_type(doc, '{path}') WHEN 'object' THEN coalesce("
+        f"json_extract(doc, '{path}.\"$date\"'), "
+        f"json_extract(doc, '{path}.\"$oid\"')) "
+        f"ELSE json_extract(doc, '{path}') END"
+    )
+
+
+def _value_sql(field: str) -> str:
+    return _quote(field) if field in GENERATED_COLUMNS else _extract_sql(field)
+
+
+def _scalar(value: Any) -> bool:
+    return not isinstance(value, (list, dict, tuple))
+
+
+class _Translation:
+    """
+    SQL-условие, которое отбирает надмножество документов фильтра.
+    exact - условие совпадает с фильтром полностью (можно считать в SQL).
+    """
+
+    def __init__(self):
+        self.clauses: List[str] = []
+        self.params: List[Any] = []
+        self.exact = True
+        self.text: Optional[str] = None
+
+    def add(self, clause: str, params: List[Any], exact: bool = True) -> None:
+        self.clauses.append(clause)
+        self.params.extend(params)
+        self.exact = self.exact and exact
+
+    def where(self) -> str:
+        return " AND ".join(self.clauses) if self.clauses else "1"
+
+
+def _field_condition(translation: _Translation, field: str, condition: Any) -> None:
+    value_sql = _value_sql(field)
+    path = _json_path(field)
+    generated = field in GENERATED_COLUMNS
+
+    def add(clause: str, params: List[Any]) -> None:
+        # Массив в обычном поле может совпасть по любому элементу:
+        # такие документы отбираются все и проверяются в matches()
+        if not generated:
+            clause = f"({clause} OR json_type(doc, '{path}') = 'array')"
+        translation.add(clause, params, exact=generated)
+
+    if not _is_operator(condition):
+        condition = {"$eq": condition}
+
+    for op, arg in condition.items():
+        if op == "$eq" and arg is None:
+            add(f"{value_sql} IS NULL", [])
+        elif op == "$eq" and _scalar(arg):
+            add(f"{value_sql} = ?", [_param(arg)])
+        elif op == "$in" and all(_scalar(v) for v in arg):
+            values = [v for v in arg if v is not None]
+            clause = f"{value_sql} IN ({', '.join('?' * len(values))})"
+            if len(values) < len(arg):
+                clause = f"({clause} OR {value_sql} IS NULL)"
+            add(clause, [_param(v) for v in values])
+        elif op in ("$gt", "$gte", "$lt", "$lte") and arg is not None and _scalar(arg):
+            sign = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+            # SQLite сравнивает числа и строки между собой, MongoDB - нет
+            add(f"{value_sql} {sign} ?", [_param(arg)])
+            translation.exact = False
+        elif op == "$exists":
+            test = "IS NOT NULL" if arg else "IS NULL"
+            translation.add(f"json_type(doc, '{path}') {test}", [])
+        elif op == "$type" and arg == "string":
+            translation.add(f"json_type(doc, '{path}') = 'text'", [])
+        else:
+            translation.exact = False
+
+
+def translate(filter: Optional[Dict], text_search: bool = False) -> _Translation:
+    translation = _Translation()
+    for key, condition in (filter or {}).items():
+        if key == "$and":
+            for part in condition:
+                nested = translate(part, text_search)
+                translation.add(f"({nested.where()})", nested.params, nested.exact)
+                translation.text = translation.text or nested.text
+        elif key == "$text" and text_search:
+            translation.text = condition["$search"]
+        elif key.startswith("$"):
+            translation.exact = False
+        else:
+            _field_condition(translation, key, condition)
+    return translation
+
+
+def _fts_query(search: str) -> str:
+    # Как $text в MongoDB: любое из слов запроса; слова экранируются для FTS5
+    words = [word.replace('"', '""') for word in search.split()]
+    return " OR ".join(f'"{word}"' for word in words) or '""'
+
+
+def _without_text(filter: Optional[Dict]) -> Optional[Dict]:
+    if not filter or "$text" not in filter:
+        return filter
+    return {k: v for k, v in filter.items() if k != "$text"}
+
+
+# --- коллекции ---
+
+
+class SQLiteCursor(MemoryCursor):
+    """MemoryCursor, который вычисляет результаты в потоке SQLite"""
+
+    def __init__(self, client: "SQLiteClient", source, projection=None):
+        super().__init__(source, projection)
+        self._client = client
+        self._iterator = None
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        results = await self._client.run(self._evaluate)
+        return results[:length] if length is not None else list(results)
+
+    def __aiter__(self):
+        self._iterator = None
+        return self
+
+    async def __anext__(self) -> Dict:
+        if self._iterator is None:
+            self._iterator = iter(await self._client.run(self._evaluate))
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class SQLiteCollection:
+    def __init__(self, name: str, database: "SQLiteDatabase"):
+        self.name = name
+        self.database = database
+        self.client = database.client
+        self.table = _quote(name)
+        self.text_fields = FTS_FIELDS.get(name, ())
+        self.fts_table = _quote(f"{name}_fts")
+        self._ready = False
+        self._index_fields: List[str] = []
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = self.client.connection
+        if not self._ready:
+            self._create_table(connection)
+            self._ready = True
+        return connection
+
+    def _create_table(self, connection: sqlite3.Connection) -> None:
+        columns = ", ".join(
+            f"{_quote(field)} GENERATED ALWAYS AS ({_extract_sql(field)}) VIRTUAL"
+            for field in GENERATED_COLUMNS
+        )
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            f"(doc TEXT NOT NULL, {columns})"
+        )
+        for fields in TABLE_INDEXES:
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(self.name + '_' + '_'.join(fields))} "
+                f"ON {self.table} ({', '.join(_quote(f) for f in fields)})"
+            )
+        if self.text_fields:
+            connection.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                f"{', '.join(_quote(f) for f in self.text_fields)}, "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    # --- чтение ---
+
+    def _rows(
+        self,
+        filter: Optional[Dict],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+    ) -> List[Tuple[int, Dict]]:
+        """(rowid, документ) по фильтру, отсортированные и обрезанные до limit"""
+        sort = sort or []
+        translation = translate(filter, text_search=bool(self.text_fields))
+        where, params = translation.where(), list(translation.params)
+        if translation.text is not None:
+            where += f" AND rowid IN (SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH ?)"
+            params.append(_fts_query(translation.text))
+
+        # Сортировка по сгенерированным колонкам идет по индексу в SQLite,
+        # и чтение останавливается, как только набрано limit документов
+        ordered = all(field in GENERATED_COLUMNS for field, _ in sort)
+        query = f"SELECT rowid, doc FROM {self.table} WHERE {where}"
+        if sort and ordered:
+            query += " ORDER BY " + ", ".join(
+                f"{_quote(field)} {'DESC' if direction == -1 else 'ASC'}"
+                for field, direction in sort
+            )
+
+        check = _without_text(filter) if translation.text is not None else filter
+        selected = []
+        for rowid, text in self.connection.execute(query, params):
+            document = loads(text)
+            if check and not matches(document, check):
+                continue
+            selected.append((rowid, document))
+            if limit and (ordered or not sort) and len(selected) >= limit:
+                break
+
+        if sort and not ordered:
+            order = {id(d): rowid for rowid, d in selected}
+            selected = [
+                (order[id(d)], d)
+                for d in sort_documents([d for _, d in selected], sort)
+            ]
+        return selected[:limit] if limit else selected
+
+    def _select(self, filter: Optional[Dict], sort=None, limit: int = 0) -> List[Dict]:
+        return [document for _, document in self._rows(filter, sort, limit)]
+
+    @property
+    def documents(self) -> List[Dict]:
+        return self._select(None)
+
+    def has_index(self, field: str) -> bool:
+        return field in GENERATED_COLUMNS or field in self._index_fields
+
+    def find(
+        self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs
+    ) -> SQLiteCursor:
+        cursor = SQLiteCursor(
+            self.client,
+            lambda sort, limit: self._select(filter, sort, limit),
+            projection,
+        )
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(
+        self,
+        filter: Optional[Dict] = None,
+        projection: Optional[Dict] = None,
+        sort=None,
+    ) -> Optional[Dict]:
+        documents = await self.find(filter, projection, sort=sort, limit=1).to_list()
+        return documents[0] if documents else None
+
+    async def count_documents(self, filter: Dict, **kwargs) -> int:
+        return await self.client.run(self._count, filter)
+
+    def _count(self, filter: Dict) -> int:
+        translation = translate(filter)
+        if not translation.exact:
+            return len(self._rows(filter))
+        (count,) = self.connection.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {translation.where()}",
+            translation.params,
+        ).fetchone()
+        return count
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> SQLiteCursor:
+        def source(sort, limit):
+            return sort_documents(self._run_pipeline(pipeline), sort)
+
+        return SQLiteCursor(self.client, source)
+
+    def _run_pipeline(self, pipeline: List[Dict]) -> List[Dict]:
+        # Начальный $match выполняется в SQL, остальное - как в памяти
+        if pipeline and "$match" in pipeline[0]:
+            documents = self._select(pipeline[0]["$match"])
+            pipeline = pipeline[1:]
+        else:
+            documents = self._select(None)
+        return run_pipeline(documents, pipeline, self.database)
+
+    # --- запись ---
+
+    @contextmanager
+    def _writing(self) -> Iterator[sqlite3.Connection]:
+        self.connection  # таблица создается до начала транзакции
+        try:
+            with self.client.transaction() as connection:
+                yield connection
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error: {e}") from e
+
+    async def insert_one(self, document: Dict) -> Any:
+        await self.client.run(self._insert_many, [document])
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True) -> Any:
+        documents = list(documents)
+        ids = await self.client.run(self._insert_many, documents)
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def _insert_many(self, documents: List[Dict]) -> List[Any]:
+        with self._writing():
+            return [self._insert(document) for document in documents]
+
+    def _insert(self, document: Dict) -> Any:
+        # Как и Motor, добавляет _id в переданный документ
+        document.setdefault("_id", ObjectId())
+        with self._writing() as connection:
+            cursor = connection.execute(
+                f"INSERT INTO {self.table} (doc) VALUES (?)", (dumps(document),)
+            )
+            self._index_text(cursor.lastrowid, document)
+        return document["_id"]
+
+    def _index_text(self, rowid: int, document: Optional[Dict]) -> None:
+        if not self.text_fields:
+            return
+        connection = self.client.connection
+        connection.execute(f"DELETE FROM {self.fts_table} WHERE rowid = ?", (rowid,))
+        if document is not None:
+            values = [
+                document.get(f) if isinstance(document.get(f), str) else ""
+                for f in self.text_fields
+            ]
+            connection.execute(
+                f"INSERT INTO {self.fts_table} (rowid, "
+                f"{', '.join(_quote(f) for f in self.text_fields)}) "
+                f"VALUES (?, {', '.join('?' * len(values))})",
+                (rowid, *values),
+            )
+
+    def _write_row(self, rowid: int, document: Dict) -> None:
+        with self._writing() as connection:
+            connection.execute(
+                f"UPDATE {self.table} SET doc = ? WHERE rowid = ?",
+                (dumps(document), rowid),
+            )
+            self._index_text(rowid, document)
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> Any:
+        return await self.client.run(self._update, filter, update, upsert, False)
+
+    async def update_many(
+        self, filter: Dict, update: Dict, upsert: bool = False
+    ) -> Any:
+        return await self.client.run(self._update, filter, update, upsert, True)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool, multi: bool) -> Any:
+        matched = modified = 0
+        with self._writing():
+            for rowid, document in self._rows(filter, limit=0 if multi else 1):
+                matched += 1
+                updated = copy.deepcopy(document)
+                apply_update(updated, update)
+                if updated != document:
+                    modified += 1
+                    self._write_row(rowid, updated)
+
+            if matched or not upsert:
+                return _update_result(matched, modified)
+
+            document = {
+                k: v
+                for k, v in filter.items()
+                if not k.startswith("$") and not _is_operator(v)
+            }
+            apply_update(document, update, inserting=True)
+            return _update_result(0, 0, self._insert(document))
+
+    async def replace_one(
+        self, filter: Dict, replacement: Dict, upsert: bool = False
+    ) -> Any:
+        return await self.client.run(self._replace, filter, replacement, upsert)
+
+    def _replace(self, filter: Dict, replacement: Dict, upsert: bool) -> Any:
+        with self._writing():
+            for rowid, document in self._rows(filter, limit=1):
+                self._write_row(rowid, {"_id": document["_id"], **replacement})
+                return _update_result(1, 1)
+            if upsert:
+                return _update_result(0, 0, self._insert(dict(replacement)))
+            return _update_result(0, 0)
+
+    async def delete_one(self, filter: Dict) -> Any:
+        return await self.client.run(self._delete, filter, False)
+
+    async def delete_many(self, filter: Dict) -> Any:
+        return await self.client.run(self._delete, filter, True)
+
+    def _delete(self, filter: Dict, multi: bool) -> Any:
+        with self._writing() as connection:
+            rows = self._rows(filter, limit=0 if multi else 1)
+            for rowid, _ in rows:
+                connection.execute(
+                    f"DELETE FROM {self.table} WHERE rowid = ?", (rowid,)
+                )
+                self._index_text(rowid, None)
+        return SimpleNamespace(deleted_count=len(rows))
+
+    async def bulk_write(self, requests: List, ordered: bool = True) -> Any:
+        return await self.client.run(self._bulk_write, list(requests))
+
+    def _bulk_write(self, requests: List) -> Any:
+        # Весь пакет - одна транзакция
+        with self._writing():
+            return bulk_write(self, requests)
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return await self.client.run(self._create_index, keys, **kwargs)
+
+    def _create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = kwargs.get("name") or "_".join(
+            f"{field}_{direction}" for field, direction in keys
+        )
+        columns = ", ".join(
+            _value_sql(field) + (" DESC" if direction == -1 else "")
+            for field, direction in keys
+        )
+        query = (
+            f"CREATE {'UNIQUE ' if kwargs.get('unique') else ''}INDEX IF NOT EXISTS "
+            f"{_quote(self.name + '_' + name)} ON {self.table} ({columns})"
+        )
+
+        partial = kwargs.get("partialFilterExpression")
+        if partial:
+            translation = translate(partial)
+            if translation.exact:
+                query += f" WHERE {translation.where()}"
+                # Параметры в определении индекса недопустимы
+                for param in translation.params:
+                    query = query.replace("?", _literal(param), 1)
+            elif kwargs.get("unique"):
+                raise NotImplementedError(
+                    f"partialFilterExpression {partial} is not supported"
+                )
+
+        with self._writing() as connection:
+            connection.execute(query)
+        if not partial:
+            self._index_fields.append(keys[0][0])
+        return name
+
+
+def _literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class SQLiteDatabase:
+    """Коллекции-таблицы одного файла SQLite"""
+
+    def __init__(self, name: str, client: "SQLiteClient"):
+        self.name = name
+        self.client = client
+        self._collections: Dict[str, SQLiteCollection] = {}
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(name, self)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> SQLiteCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, **kwargs) -> Dict:
+        await self.client.run(lambda: self.client.connection.execute("SELECT 1"))
+        return {"ok": 1.0}
+
+
+class SQLiteClient:
+    """
+    Замена AsyncIOMotorClient поверх одного файла SQLite.
+
+    Соединение живет в единственном потоке исполнителя: все запросы
+    выполняются последовательно, как и положено SQLite с одной записью
+    за раз; в режиме WAL чтение из других процессов не блокируется.
+    Имя базы не разделяет данные - в файле одна база.
+    """
+
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        self.path = str(path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._depth = 0
+        self._databases: Dict[str, SQLiteDatabase] = {}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._connection = connection
+        return self._connection
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs)
+        )
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция; вложенные вызовы входят во внешнюю"""
+        connection = self.connection
+        if self._depth == 0:
+            connection.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield connection
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                connection.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            connection.execute("COMMIT")
+
+    def __getitem__(self, name: str) -> SQLiteDatabase:
+        if name not in self._databases:
+            self._databases[name] = SQLiteDatabase(name, self)
+        return self._databases[name]
+
+    def get_database(self, name: str) -> SQLiteDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> SQLiteDatabase:
+        return self["admin"]
+
+    def close(self) -> None:
+        def close_connection():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._executor.submit(close_connection).result()
+        self._executor.shutdown(wait=True)